@@ -11,27 +11,35 @@ Compare CIMIS, Ranch System, and Kosana's flux tower ETo data
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from kc_engine import KC_TABLES, apply_Kc_schemes
+from bowman_data import read_ranch_systems_daily
+from instrument import stage
 
 ###################
 ## Load OpenET data
 ###################
-openET = pd.read_csv('~/Documents/bowman_data_analysis/OPENET_SE_all_years.csv')
-openET.set_index(pd.to_datetime(openET['DateTime']),inplace=True)
+with stage('load','OpenET') as s:
+    openET = pd.read_csv('~/Documents/bowman_data_analysis/OPENET_SE_all_years.csv')
+    openET.set_index(pd.to_datetime(openET['DateTime']),inplace=True)
+    s.count(openET)
 
 ##########################
 ## Load Ranch Systems Data
 ##########################
-rsET = pd.read_csv('~/Downloads/widget-graph-export-2.csv')
-rsET['DateTime'] = rsET['Date'] + ' ' + rsET['Time']
-rsET.set_index(pd.to_datetime(rsET['DateTime'],format='%Y-%m-%d %H:%M'),
-               inplace=True)
-rsET = rsET[rsET.index>=pd.to_datetime('2022-04-26')]
+## Streamed in chunks into daily means (same as resample('1d').mean() on the
+## full export) so multi-year, multi-station exports fit in memory
+with stage('load','Ranch Systems') as s:
+    rsET = read_ranch_systems_daily('~/Downloads/widget-graph-export-2.csv',
+                                    start='2022-04-26')
+    s.count(rsET)
 
 #######################
 ## Load Flux Tower Data
 ####################### 
-fluxTower = pd.read_csv('~/Downloads/BowmanET_daily_2022_11_10.csv')
-fluxTower.set_index(pd.to_datetime(fluxTower['date'],format='%m/%d/%Y'),inplace=True)
+with stage('load','flux tower') as s:
+    fluxTower = pd.read_csv('~/Downloads/BowmanET_daily_2022_11_10.csv')
+    fluxTower.set_index(pd.to_datetime(fluxTower['date'],format='%m/%d/%Y'),inplace=True)
+    s.count(fluxTower)
 fluxTower['ETo'] = fluxTower['ETo']/10/2.54
 #fluxTower['Kc'] = fluxTower['Kc'].fillna(np.nanmean(fluxTower['Kc']))
 #fluxTower.loc[fluxTower['Kc']<0,'Kc'] = (np.nanmean(fluxTower['Kc']))
@@ -42,8 +50,10 @@ fluxTower['ETa'] = fluxTower['ETo'] * fluxTower['Kc']
 ## Load CIMIS Data
 ##################
 path = '~/Documents/Hydrus/python_scripts/cimis_daily.csv'
-cimis = pd.read_csv(path)
-cimis.set_index(pd.to_datetime(cimis['Date']),inplace=True)
+with stage('load','CIMIS') as s:
+    cimis = pd.read_csv(path)
+    cimis.set_index(pd.to_datetime(cimis['Date']),inplace=True)
+    s.count(cimis)
 cimis = cimis[cimis.index>min(rsET.index)]
 cimis['ETo'] = cimis['ETo (mm)']/10/2.54
 ## Applying a multiplier to match up CIMIS data to Ranch System
@@ -66,15 +76,15 @@ openET['Ensemble ET'].plot(ax=ax,color='orange',alpha=0.7,label='openET ETa')
 ax.set_ylabel('Inches of Water')
 ax.set_title('ETo from Ranch System, CIMIS, and Flux Tower\nETa from OpenET')
 ax.legend()
-plt.savefig('ET_compare.png',dpi=200)
+with stage('render','ET_compare.png'):
+    plt.savefig('ET_compare.png',dpi=200)
 
 ax.set_xlim([pd.to_datetime('2022/04/01',format='%Y/%m/%d'),
              pd.to_datetime('2022/11/01',format='%Y/%m/%d')])
 
 ###############################################################################
-## Resample the Ranch System data to match the daily data from CIMIS so that a 
-## cumulative sum comparison can be made
-rsET = rsET.resample('1d').mean()
+## Ranch System data is already daily to match CIMIS so that a cumulative sum
+## comparison can be made
 ax.grid()
 
 
@@ -86,99 +96,12 @@ def apply_Kc(ET_data,key,Kc='Shackle'):
     Apply the Kc values to the ETo data to calculate ETa
     """
     print('Applying Kc Values....')
-    ET_data['ETa_Kc'] = ET_data[key]
-    ## Kc values based on time of year and tree age
-    ## Values are from Doll and Shackel, 2015
-    ## '_15' refers to first 15 days of month and '_16' refers to 16th day and onwards
-    if Kc == 'Shackle':
-        Kc_vals = {'1':0.40,
-                   '2':0.41,
-                   '3_15':0.55,
-                   '3_16':0.67,
-                   '4_15':0.75,
-                   '4_16':0.84,
-                   '5_15':0.89,
-                   '5_16':0.98,
-                   '6_15':1.02,
-                   '6_16':1.07,
-                   '7':1.11,
-                   '8':1.11,
-                   '9_15':1.08,
-                   '9_16':1.04,
-                   '10_15':0.97,
-                   '10_16':0.88,
-                   '11':0.69,
-                   '12':0.43
-                   } 
-    elif Kc == 'itrc_norm':
-        Kc_vals = {'1':0.77/0.73,
-                       '2':0.9/2.12,
-                       '3':1.68/4.01,
-                       '4':2.75/5.56,
-                       '5':5.96/7.32,
-                       '6':6.39/7.58,
-                       '7':6.7/7.98,
-                       '8':5.7/6.76,
-                       '9':4.32/5.39,
-                       '10':2.82/3.47,
-                       '11':0.45/1.05,
-                       '12':0.87/0.99}
-    elif Kc == 'itrc_wet':
-        ############################
-        ## ITRC Kc Values - wet year
-        ############################
-        Kc_vals = {'1':0.38/0.39,
-                       '2':0.83/0.81,
-                       '3':2.35/2.76,
-                       '4':3.69/4.12,
-                       '5':4.15/4.08,
-                       '6':5.66/6.31,
-                       '7':6.14/7.49,
-                       '8':5.76/7.00,
-                       '9':3.83/4.78,
-                       '10':2.68/3.48,
-                       '11':1.00/1.05,
-                       '12':0.92/1.02}
-    elif Kc == 'itrc_dry':
-        ############################
-        ## ITRC Kc Values - dry year
-        ############################
-        Kc_vals = {'1':0.64/0.77,
-                        '2':1.31/1.24,
-                        '3':2.11/2.78,
-                        '4':3.78/5.34,
-                        '5':5.8/7.14,
-                        '6':6.08/7.23,
-                        '7':6.31/7.73,
-                        '8':5.27/6.38,
-                        '9':4.32/5.23,
-                        '10':2.47/3.62,
-                        '11':0.89/1.26,
-                        '12':0.76/1.36}
-    else:
+    ## Kc tables live in kc_engine --> compiled once into day-of-year arrays
+    if Kc not in KC_TABLES:
         print('****Invalid Choice for Kc*****')
         return
-    for month in Kc_vals.keys():
-        """
-        Go through the climate data and turn ETo to ETa
-        """
-        ## Check for 15-day split
-        if '_' not in month:
-            sub = ET_data.loc[ET_data.index.month == int(month),key] * Kc_vals[month]
-            ET_data.loc[ET_data.index.month == int(month),'ETa_Kc'] = sub
-        else:
-            m = month.split('_')[0]
-            d = month.split('_')[-1]
-            if d == '15':
-                sub = ET_data.loc[(ET_data.index.month == int(m))
-                                      & (ET_data.index.day <= int(d)),key] * Kc_vals[month]
-                ET_data.loc[(ET_data.index.month == int(m))
-                                      & (ET_data.index.day <= int(d)),'ETa_Kc'] = sub
-            else:
-                sub = ET_data.loc[(ET_data.index.month == int(m))
-                                      & (ET_data.index.day > int(d)),key] * Kc_vals[month]
-                ET_data.loc[(ET_data.index.month == int(m))
-                                      & (ET_data.index.day > int(d)),'ETa_Kc'] = sub
+    with stage('Kc',Kc,rows=len(ET_data)):
+        ET_data['ETa_Kc'] = apply_Kc_schemes(ET_data,key,[Kc])[Kc]
     return ET_data
 
 
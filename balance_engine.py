@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:12:40 2026
+
+Block water-balance engine for waterBalance
+
+The blocks, their areas and the seasons where blocks drop out of the orchard
+mean come from a config dict (or a JSON file with the same keys). The
+irrigation, precip and ET columns of the mass balance sheet are pulled out as
+(time x block) arrays so every block is balanced in one operation
+
+@author: spencerjordan
+"""
+
+import copy
+import json
+
+import numpy as np
+import pandas as pd
+
+
+## Blocks in massBalanceMainData and their relative areas. Equal areas give the
+## plain mean across blocks that the mass balance has used so far
+BLOCK_CONFIG = {'blocks':['NE1','NE2','NW','SW1','SW2','SE'],
+                'area':{'NE1':1.0,'NE2':1.0,'NW':1.0,'SW1':1.0,'SW2':1.0,'SE':1.0},
+                ## Blocks left out of the orchard mean/std for a growing season
+                ## --> NE blocks are not considered in 2022
+                'exclude':{2022:['NE1','NE2']},
+                'season_col':'G.season',
+                'precip_col':'Precip'}
+
+
+def load_block_config(path=None):
+    """
+    Block configuration, with any keys in the JSON file at path overriding the defaults
+    """
+    config = copy.deepcopy(BLOCK_CONFIG)
+    if path is not None:
+        with open(path) as f:
+            config.update(json.load(f))
+    ## JSON keys are always strings
+    config['exclude'] = {int(float(k)):list(v) for k,v in config.get('exclude',{}).items()}
+    missing = [b for b in config['blocks'] if b not in config['area']]
+    if missing:
+        raise ValueError(f'No area given for blocks {missing}')
+    return config
+
+
+def block_columns(config,term):
+    """
+    Sheet column names for one term, e.g. term='ET' --> ['NE1_ET','NE2_ET',...]
+    """
+    return [f'{block}_{term}' for block in config['blocks']]
+
+
+def area_weights(config):
+    """
+    Block areas as weights that sum to 1, in block order
+    """
+    area = np.array([config['area'][b] for b in config['blocks']],dtype=float)
+    return area / area.sum()
+
+
+def block_terms(mainDat,config):
+    """
+    Irrigation (time x block), precip (time,) and ET (time x block) arrays
+    """
+    I = mainDat[block_columns(config,'I')].to_numpy(dtype=float)
+    P = mainDat[config['precip_col']].to_numpy(dtype=float)
+    ET = mainDat[block_columns(config,'ET')].to_numpy(dtype=float)
+    return I,P,ET
+
+
+def block_balance(I,P,ET):
+    """
+    Irrigation + precip - ET for every block at once
+
+    Missing irrigation or precip count as zero, missing ET leaves the balance
+    missing (same as [I,Precip].sum(axis=1) - ET)
+    """
+    I = np.asarray(I,dtype=float)
+    P = np.asarray(P,dtype=float)
+    water_in = np.nan_to_num(I) + np.nan_to_num(P)[...,None]
+    return water_in - np.asarray(ET,dtype=float)
+
+
+def exclusion_mask(seasons,config):
+    """
+    (time x block) True where a block counts towards the orchard mean
+
+    seasons is the growing season of each period
+    """
+    seasons = np.asarray(seasons,dtype=float)
+    mask = np.ones((len(seasons),len(config['blocks'])),dtype=bool)
+    for season,blocks in config['exclude'].items():
+        cols = [config['blocks'].index(b) for b in blocks if b in config['blocks']]
+        mask[np.ix_(seasons == season,cols)] = False
+    return mask
+
+
+def orchard_stats(balance,weights,mask=None):
+    """
+    Area-weighted mean and standard deviation across blocks for each period
+
+    Blocks masked out or with a missing balance are dropped from that period.
+    The std uses the unbiased weighted estimator, which is the usual ddof=1
+    std when all the weights are equal
+    """
+    balance = np.asarray(balance,dtype=float)
+    use = ~np.isnan(balance)
+    if mask is not None:
+        use &= mask
+    w = np.where(use,weights,0.0)
+    x = np.where(use,balance,0.0)
+    V1 = w.sum(axis=-1)
+    V2 = (w**2).sum(axis=-1)
+    with np.errstate(invalid='ignore',divide='ignore'):
+        mean = (w*x).sum(axis=-1) / V1
+        dev = np.where(use,balance - mean[...,None],0.0)
+        denom = V1 - V2/V1
+        var = (w*dev**2).sum(axis=-1) / denom
+    ## Less than two blocks left --> no spread, same as pandas
+    var = np.where(denom > 1e-12*V1,var,np.nan)
+    return mean,np.sqrt(var)
+
+
+###############################################################################
+########################## ET multiplier sweeps ###############################
+###############################################################################
+def month_codes(index):
+    """
+    Month number of each timestamp counted from the first month, plus the
+    month-end labels resample('1M') would give, including empty months
+    """
+    index = pd.DatetimeIndex(index)
+    months = index.year.values*12 + index.month.values - 1
+    first = months.min()
+    periods = pd.period_range(index.min(),index.max(),freq='M')
+    labels = periods.to_timestamp(how='end').normalize()
+    return months - first,labels
+
+
+def row_terms(mainDat,config):
+    """
+    Water in, precip and ET (time x block) of each sheet row, ready to be summed
+
+    A row with missing ET has a missing balance, which the monthly sum skips,
+    so its water in and precip are zeroed too
+    """
+    I,P,ET = block_terms(mainDat,config)
+    water_in = block_balance(I,P,np.zeros_like(I))
+    precip = block_balance(np.zeros_like(I),P,np.zeros_like(I))
+    water_in[np.isnan(ET)] = 0.0
+    precip[np.isnan(ET)] = 0.0
+    return water_in,precip,np.nan_to_num(ET)
+
+
+class MonthlyTerms:
+    """
+    Monthly water in (irrigation + precip) and ET for every block
+
+    The monthly sums are linear in the ET multiplier, so the balance for any
+    multiplier is water_in - mult*ET on the (month x block) sums and a whole
+    sweep of multipliers is one broadcast instead of a calculate_balance run each
+    """
+    def __init__(self,index,water_in,ET,seasons,config,precip=None):
+        self.index = index
+        self.water_in = water_in
+        self.ET = ET
+        ## Precip part of water_in, so another precip source can be swapped in
+        self.precip = precip
+        self.seasons = seasons
+        self.config = config
+        self.mask = exclusion_mask(seasons,config)
+        self.weights = area_weights(config)
+
+    @classmethod
+    def from_sheet(cls,mainDat,config,start='09/01/2012',end='09/01/2022'):
+        """
+        Monthly terms of the mass balance sheet, cut to start <= Date < end
+        like calculate_balance
+        """
+        dates = pd.to_datetime(mainDat['Date'])
+        keep = ((dates >= pd.to_datetime(start,format='%m/%d/%Y')) &
+                (dates < pd.to_datetime(end,format='%m/%d/%Y'))).values
+        water_in,precip,ET = row_terms(mainDat.loc[keep],config)
+        codes,index = month_codes(dates[keep])
+        n = len(index)
+        ## One bincount per block for the monthly sums
+        def monthly(x):
+            return np.stack([np.bincount(codes,weights=col,minlength=n)
+                             for col in x.T],axis=1)
+        seasons = np.full(n,np.nan)
+        np.fmax.at(seasons,codes,mainDat.loc[keep,config['season_col']].to_numpy(dtype=float))
+        return cls(index,monthly(water_in),monthly(ET),seasons,config,precip=monthly(precip))
+
+    def balance(self,mult=1.0):
+        """
+        (month x block) balance for one multiplier (scalar or one per block)
+        """
+        return self.water_in - np.asarray(mult,dtype=float)*self.ET
+
+    def sweep(self,mults,dS=None):
+        """
+        Balance for a whole vector of ET multipliers at once
+
+        mults is (n,) for one multiplier per run or (n x block) for one per block.
+        Returns a dict of (multiplier x month x block) arrays 'balance' and
+        'cumulative', plus the orchard 'mean' and 'std' as (multiplier x month).
+        With dS, the monthly change in storage as (month,) or (month x block),
+        it also has 'recharge' (balance - dS)
+        """
+        mults = np.asarray(mults,dtype=float)
+        if mults.ndim == 1:
+            mults = mults[:,None,None]
+        else:
+            mults = mults[:,None,:]
+        balance = self.water_in[None] - mults*self.ET[None]
+        mean,std = orchard_stats(balance,self.weights,self.mask[None])
+        out = {'balance':balance,
+               'cumulative':np.cumsum(balance,axis=1),
+               'mean':mean,
+               'std':std}
+        ## No storage change --> no recharge, the balance is not recharge
+        if dS is not None:
+            dS = np.asarray(dS,dtype=float)
+            if dS.ndim == 1:
+                dS = dS[:,None]
+            out['recharge'] = balance - dS[None]
+        return out
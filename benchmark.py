@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:52:09 2026
+
+Stage-level benchmarks on synthetic data
+
+Each stage of the analysis scripts is timed on the engines they use, on the
+files written by synthetic_data at every requested scale:
+    load          --> reading the CSVs (Ranch Systems streamed into daily means)
+    clean         --> pore water and probe cleanup, well date parsing
+    balance       --> monthly block terms, a 1000 multiplier ET sweep, probe ΔS,
+                      5000 N budget scenarios
+    Kc            --> every Kc scheme on the CIMIS, Ranch Systems and flux tower ETo
+    spline        --> block recharge from the balance and ΔS splines
+    interpolation --> linear well interpolation and pooled kriging onto the model grid
+    render        --> pore water small multiples written to PNG
+
+Every step is run repeat times and the best time is kept. The results, with
+the versions and machine they were run on, are written to a JSON file.
+Passing an earlier results file with --compare prints the change per step
+
+    python benchmark.py --scales 1 10 100 --out benchmark_results.json
+
+@author: spencerjordan
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import synthetic_data
+
+
+STAGES = ['load','clean','balance','Kc','spline','interpolation','render']
+## Stages whose outputs each stage works on
+DEPENDS = {'load':[],
+           'clean':['load'],
+           'balance':['clean'],
+           'Kc':['clean'],
+           'spline':['balance'],
+           'interpolation':['clean'],
+           'render':['clean']}
+## Model grid used by interpolate_gw_contours
+GRID_SHAPE = (117,91)
+
+
+def _time(func,repeat):
+    """
+    Best and mean wall time of repeat calls, plus the last result
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return min(times),float(np.mean(times)),result
+
+
+class Benchmark:
+    """
+    Runs the stages on one folder of synthetic files and collects the timings
+
+    Stages hand their outputs to the later ones through self.data, so a stage
+    only times its own work
+    """
+    def __init__(self,paths,scale,repeat=3,workers=1,out_dir=None):
+        self.paths = paths
+        self.scale = scale
+        self.repeat = repeat
+        self.workers = workers
+        self.out_dir = out_dir or os.path.dirname(paths['pore_water'])
+        self.data = {}
+        self.results = []
+
+    def step(self,stage,name,func,rows=None):
+        """
+        Time func, keep its result under name and record the step
+        """
+        best,mean,result = _time(func,self.repeat)
+        self.data[name] = result
+        if rows is None:
+            rows = len(result) if hasattr(result,'__len__') else None
+        self.results.append({'scale':self.scale,'stage':stage,'step':name,
+                             'seconds':best,'mean_seconds':mean,
+                             'repeat':self.repeat,'rows':rows})
+        print(f'  {self.scale:>4}x {stage:14s}{name:22s}{best:9.4f} s')
+        return result
+
+    def run(self,stages=STAGES):
+        ## Stages that are only needed as inputs run without being timed
+        needed = set(stages)
+        for stage in reversed(STAGES):
+            if stage in needed:
+                needed.update(DEPENDS[stage])
+        for stage in STAGES:
+            if stage in needed:
+                getattr(self,f'stage_{stage}')(timed=stage in stages)
+        return self.results
+
+    def _maybe(self,timed,stage,name,func,rows=None):
+        if timed:
+            return self.step(stage,name,func,rows)
+        self.data[name] = func()
+        return self.data[name]
+
+    ###########################################################################
+    def stage_load(self,timed=True):
+        from bowman_data import (read_ranch_systems_daily, load_neutron_probe, load_wells,
+                                 load_n_balance)
+        p = self.paths
+        run = lambda name,func: self._maybe(timed,'load',name,func)
+        run('pore_water_csv',lambda: pd.read_csv(p['pore_water'],dtype={'Depth':str,'Al#':str}))
+        ## Typed loads, as the scripts read them
+        run('probe_csv',lambda: load_neutron_probe(p['neutron_probe']))
+        run('wells_csv',lambda: load_wells(p['wells_working']))
+        run('main_data_csv',lambda: pd.read_csv(p['main_data'],skiprows=1))
+        run('n_balance_csv',lambda: load_n_balance(p['n_balance']))
+        run('cimis_csv',lambda: pd.read_csv(p['cimis']))
+        run('flux_tower_csv',lambda: pd.read_csv(p['flux_tower']))
+        run('ranch_systems_daily',lambda: read_ranch_systems_daily(p['ranch_systems']))
+
+    def stage_clean(self,timed=True):
+        from bowman_data import clean_pore_water
+        from probe_storage import clean_probe_data
+        d = self.data
+        run = lambda name,func: self._maybe(timed,'clean',name,func)
+        ## clean_pore_water reads the CSV itself
+        run('pore_water',lambda: clean_pore_water(self.paths['pore_water']))
+        run('probe',lambda: clean_probe_data(d['probe_csv'].copy()))
+        def wells():
+            hds = d['wells_csv'][d['wells_csv']['NO3-N (mg/L)'].notna()].copy()
+            hds['Sampling Date'] = pd.to_datetime(hds['Sampling Date'],format='%m/%d/%Y')
+            return hds
+        run('wells',wells)
+        def dated(name,col,fmt):
+            frame = d[name].copy()
+            frame.index = pd.to_datetime(frame[col],format=fmt)
+            return frame
+        run('cimis',lambda: dated('cimis_csv','Date','%m/%d/%Y'))
+        run('flux_tower',lambda: dated('flux_tower_csv','date','%m/%d/%Y'))
+
+    def stage_balance(self,timed=True):
+        from balance_engine import load_block_config, MonthlyTerms
+        from probe_storage import ProbeStorage
+        d = self.data
+        run = lambda name,func,rows=None: self._maybe(timed,'balance',name,func,rows)
+        config = load_block_config(self.paths['block_config'])
+        d['config'] = config
+        terms = run('monthly_terms',lambda: MonthlyTerms.from_sheet(d['main_data_csv'],config),
+                    rows=len(d['main_data_csv']))
+        run('et_sweep_1000',lambda: terms.sweep(np.linspace(0.7,1.1,1000)),
+            rows=1000*terms.water_in.size)
+        site_dict = synthetic_data.synthetic_site_dict(self.scale)
+        probes = run('probe_storage',lambda: ProbeStorage(d['probe'],site_dict=site_dict),
+                     rows=len(d['probe']))
+        run('probe_changes',lambda: probes.changes(config['blocks']),rows=probes.wc.size)
+        from n_budget import NBudget
+        nb = d['n_balance_csv']
+        budget = NBudget.from_table(nb,blocks=list(pd.unique(nb['block'].astype(str))))
+        run('n_budget_5000',lambda: budget.sample(5000,{'Fert kg/ha':0.1,'Denit':0.5},
+                                                  seed=0).residual_leaching(),
+            rows=5000*budget.values[0,...,0].size)
+
+    def stage_Kc(self,timed=True):
+        from kc_engine import KC_TABLES, apply_Kc_schemes
+        d = self.data
+        schemes = list(KC_TABLES)
+        run = lambda name,func: self._maybe(timed,'Kc',name,func)
+        run('cimis_Kc',lambda: apply_Kc_schemes(d['cimis'],'ETo (mm)',schemes))
+        run('ranch_systems_Kc',lambda: apply_Kc_schemes(d['ranch_systems_daily'],
+                                                        'Daily ETo (inch) (294)',schemes))
+        run('flux_tower_Kc',lambda: apply_Kc_schemes(d['flux_tower'],'ETo',schemes))
+
+    def stage_spline(self,timed=True):
+        from recharge_ensemble import block_recharge
+        d = self.data
+        terms = d['monthly_terms']
+        blocks = d['config']['blocks']
+        balance = pd.DataFrame(terms.balance(0.92),index=terms.index,columns=blocks)
+        dS = d['probe_changes']['block'].fillna(0)
+        recharge = self._maybe(timed,'spline','block_recharge',
+                               lambda: block_recharge(balance,dS,dS.index[0]),rows=balance.size)
+        from leaching_flux import leaching_pipeline, covered_months
+        site_dict = synthetic_data.synthetic_site_dict(self.scale)
+        recharge = covered_months(recharge,balance.index,dS.index)
+        self._maybe(timed,'spline','leaching_flux',
+                    lambda: leaching_pipeline(recharge,d['pore_water'],site_dict=site_dict),
+                    rows=len(d['pore_water']))
+
+    def stage_interpolation(self,timed=True):
+        from gw_interp import RasterGrid, WellInterpolator, KrigingEngine
+        d = self.data
+        coords = pd.read_csv(self.paths['well_coordinates'])
+        coords['MW#'] = np.arange(1,len(coords)+1)
+        coords[['x','y','z']] = coords[['x','y','z']]*0.3048
+        x,y = coords['x'],coords['y']
+        grid = RasterGrid.from_bounds(x.min(),y.min(),x.max(),y.max(),*GRID_SHAPE)
+        xi = grid.xy
+        hds = d['wells']
+        N_all = hds.pivot_table(index='MW#',columns='Sampling Date',values='NO3-N (mg/L)')
+        N_all = N_all.reindex(coords['MW#'])
+        ## Fill the few unsampled wells so every date is interpolated
+        values = N_all.T.fillna(N_all.mean(axis=1)).T.values
+        points = coords[['x','y']].values
+        run = lambda name,func,rows: self._maybe(timed,'interpolation',name,func,rows)
+        interp = run('linear_weights',lambda: WellInterpolator(points,xi,method='linear'),
+                     rows=len(xi))
+        run('linear_dates',lambda: interp(values),rows=values.size)
+        krige = run('kriging_weights',
+                    lambda: KrigingEngine.fit(points,xi,values,model='gaussian'),rows=len(xi))
+        run('kriging_dates',lambda: krige(values),rows=values.size)
+
+    def stage_render(self,timed=True):
+        from figure_render import FigureJob, render_figures
+        pw = self.data['pore_water']
+        pw = pw[pw['Depth'] == '60']
+        NO3 = pd.to_numeric(pw['ppm NO3-N'],errors='coerce')
+        sites = sorted(pw['Al#'].unique(),key=int)
+        layout = {'nrows':3,'ncols':3,'figsize':(12,9),
+                  'suptitle':{'t':'Pore Water NO3-N - 60 cm'},
+                  'date_format':'%y','major_months':[1],'grid':{}}
+        folder = os.path.join(self.out_dir,'plots')
+        ## One figure per copy of the orchard, eight sites each
+        jobs = []
+        for k in range(0,len(sites),8):
+            panels = []
+            for site in sites[k:k+8]:
+                rows = (pw['Al#'] == site).values
+                panels.append({'title':f'Al-{site}',
+                               'series':[{'x':pw['datetime'].values[rows],
+                                          'y':NO3.values[rows],'marker':'o','ms':3}]})
+            jobs.append(FigureJob(os.path.join(folder,f'pw_NO3_{k//8+1}.png'),panels,layout,dpi=100))
+        self._maybe(timed,'render','pore_water_figures',
+                    lambda: render_figures(jobs,workers=self.workers,force=True),rows=len(jobs))
+
+
+###############################################################################
+############################## Run and report #################################
+###############################################################################
+def environment():
+    """
+    Versions and machine the benchmark ran on
+    """
+    import matplotlib
+    import scipy
+    try:
+        commit = subprocess.run(['git','rev-parse','HEAD'],capture_output=True,text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'time':pd.Timestamp.now().isoformat(timespec='seconds'),
+            'commit':commit or None,
+            'python':sys.version.split()[0],
+            'numpy':np.__version__,
+            'pandas':pd.__version__,
+            'scipy':scipy.__version__,
+            'matplotlib':matplotlib.__version__,
+            'platform':platform.platform(),
+            'cpus':os.cpu_count()}
+
+
+def run_benchmarks(scales=(1,10,100),stages=STAGES,repeat=3,workers=1,data_dir=None,seed=0):
+    """
+    Generate the synthetic files for every scale and time the stages
+
+    The files go to data_dir/scale_<n> when data_dir is given (and are reused
+    if already there), otherwise to a temporary folder removed afterwards
+    """
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = os.path.join(data_dir or tmp,f'scale_{scale}')
+            if data_dir is not None and os.path.exists(os.path.join(folder,synthetic_data.FILES['block_config'])):
+                paths = {name:os.path.join(folder,f) for name,f in synthetic_data.FILES.items()}
+            else:
+                print(f'Writing synthetic data at {scale}x...')
+                paths = synthetic_data.write_datasets(folder,scale=scale,seed=seed)
+            results += Benchmark(paths,scale,repeat=repeat,workers=workers).run(stages)
+    return {'environment':environment(),
+            'settings':{'scales':list(scales),'stages':list(stages),'repeat':repeat,
+                        'workers':workers,'seed':seed},
+            'results':results}
+
+
+def compare(new,old):
+    """
+    Print each step's best time next to the one in an earlier results file
+    """
+    before = {(r['scale'],r['stage'],r['step']):r['seconds'] for r in old['results']}
+    print(f"\n{'scale':>6} {'stage':14s}{'step':22s}{'old [s]':>10}{'new [s]':>10}{'ratio':>8}")
+    for r in new['results']:
+        key = (r['scale'],r['stage'],r['step'])
+        if key not in before:
+            continue
+        ratio = r['seconds']/before[key] if before[key] else np.nan
+        print(f"{r['scale']:>5}x {r['stage']:14s}{r['step']:22s}"
+              f"{before[key]:10.4f}{r['seconds']:10.4f}{ratio:8.2f}")
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Time the Bowman analysis stages on synthetic data')
+    parser.add_argument('--scales',type=int,nargs='+',default=[1,10,100])
+    parser.add_argument('--stages',nargs='+',default=STAGES,choices=STAGES)
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--workers',type=int,default=1,help='processes for rendering')
+    parser.add_argument('--data-dir',default=None,help='keep the synthetic files here')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--out',default='benchmark_results.json')
+    parser.add_argument('--compare',default=None,help='earlier results file')
+    args = parser.parse_args()
+
+    ## Figures are only ever written to file
+    import matplotlib
+    matplotlib.use('Agg')
+    report = run_benchmarks(args.scales,args.stages,args.repeat,args.workers,
+                            args.data_dir,args.seed)
+    with open(args.out,'w') as f:
+        json.dump(report,f,indent=1)
+    print(f'Results written to {args.out}')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report,json.load(f))
@@ -8,19 +8,25 @@ Bowman N Mass Balances
 @author: spencerjordan
 """
 
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
+from bowman_data import DIR
+from dataset_registry import dataset
+from n_budget import NBudget, BLOCKS
+from figure_render import figure_key, is_current, mark_current
+from instrument import stage
 
 ## Load Manual Mass Balance Data
-data = pd.read_csv('~/Documents/bowman_data_analysis/N_mass_balance/manual_mass_balance_2022.csv')
+data = dataset('n_balance',DIR+'/N_mass_balance/manual_mass_balance_2022.csv')
 
-## Add a data column for NUE
-data['NUE2'] = round((data['Uptake kg/ha']+data['Growth'])/data['Fert kg/ha'],2)
-
-## Define Nitrogen Inputs, Outputs, and leaching subsets
-inputs = data[['block','GS','Fert kg/ha','Min','Dep']].copy()
-outputs = data[['block','GS','Uptake kg/ha','Growth','Denit']].copy()
-leaching = data[['block','GS','leaching']].copy()
+## (scenario x year x block x term) budget, blocks in the order of Hanni's plots
+## and any other block in the table as extra bars after them
+budget = NBudget.from_table(data,blocks=BLOCKS + [b for b in pd.unique(data['block'].astype(str))
+                                                  if b not in BLOCKS])
+plots = budget.blocks
+## NUE for every year and block
+NUE2 = budget.nue()[0].round(2)
 
 ## Create the plot object, 3 rows with 9 columns
 fig, ax = plt.subplots(3,10,figsize=(18,10))
@@ -32,25 +38,15 @@ fig.tight_layout(w_pad=-2,h_pad=2)
 
 ################################ Inputs plot ##################################
 # Create a plot for each year in the input data
-for i,year in enumerate(inputs['GS'].unique()):
+Dep,Min,Fert = budget.term('Dep')[0],budget.term('Min')[0],budget.term('Fert kg/ha')[0]
+for i,year in enumerate(budget.years):
     ## Add a grid to the plot
     ax[0,i].grid(zorder=0)
-    
-    ## Create a dataset as a slice of the Inputs data based on the year of interest
-    inputs2 = inputs[inputs['GS']==year].copy()
-    
-    ## Reordering x-values to match Hanni's Plots
-    plots = ['NE','NW','SE','SW']
-    df_sort = pd.DataFrame({'block' : plots})
-    inputs2 = pd.merge(df_sort, inputs2,left_on='block',right_on='block',how='outer')
-    inputs2['fert_bot'] = inputs2['Dep'] + inputs2['Min']
     ## Add a bar plot for the Dep, Min, and Fert variables, specifying the bottom
     ## of each as the starting point for the next --> stacking them
-    ax[0,i].bar(inputs2['block'],inputs2['Dep'],label='Dep',zorder=3)
-    ax[0,i].bar(inputs2['block'],inputs2['Min'],label='Min',
-                bottom=inputs2['Dep'],zorder=3)
-    ax[0,i].bar(inputs2['block'],inputs2['Fert kg/ha'],label='Fert',
-                bottom=(inputs2['fert_bot']),zorder=3)
+    ax[0,i].bar(plots,Dep[i],label='Dep',zorder=3)
+    ax[0,i].bar(plots,Min[i],label='Min',bottom=Dep[i],zorder=3)
+    ax[0,i].bar(plots,Fert[i],label='Fert',bottom=Dep[i]+Min[i],zorder=3)
     
     ## Settting a limit for the y-axis
     ax[0,i].set_ylim([0,375])
@@ -71,20 +67,13 @@ ax[0,0].set_ylabel('N Inputs [kg/ha]',fontsize=16)
 ax[0,9].legend(loc=5,bbox_to_anchor=(1.2, 0.3, 0.5, 0.5),fontsize=13)
     
 ############################### Outputs Plot ##################################
-for i,year in enumerate(outputs['GS'].unique()):
+## Outputs drawn downwards
+Denit,Growth,Uptake = -budget.term('Denit')[0],-budget.term('Growth')[0],-budget.term('Uptake kg/ha')[0]
+for i,year in enumerate(budget.years):
     ax[1,i].grid(zorder=0)
-    outputs2 = outputs[outputs['GS']==year].copy()
-    outputs2[['Denit','Growth','Uptake kg/ha']] = -1 * outputs2[['Denit','Growth','Uptake kg/ha']]
-    plots = ['NE','NW','SE','SW']
-    df_sort = pd.DataFrame({'block' : plots})
-    outputs2 = pd.merge(df_sort, outputs2,left_on='block',right_on='block',how='outer')
-    outputs2['crop_bot'] = outputs2['Denit'] + outputs2['Growth']
-    
-    ax[1,i].bar(outputs2['block'],outputs2['Denit'],label='Denit',zorder=3)
-    ax[1,i].bar(outputs2['block'],outputs2['Growth'],label='Tree',
-                bottom=outputs2['Denit'],zorder=3)
-    ax[1,i].bar(outputs2['block'],outputs2['Uptake kg/ha'],label='Crop',
-                bottom=outputs2['crop_bot'],zorder=3)
+    ax[1,i].bar(plots,Denit[i],label='Denit',zorder=3)
+    ax[1,i].bar(plots,Growth[i],label='Tree',bottom=Denit[i],zorder=3)
+    ax[1,i].bar(plots,Uptake[i],label='Crop',bottom=Denit[i]+Growth[i],zorder=3)
     ax[1,i].set_ylim([0,-375])
     ax[1,i].set_title(f'{year}',fontsize=16,y=0.99)
     ax[1,i].invert_yaxis()
@@ -99,15 +88,10 @@ ax[1,0].set_ylabel('N Outputs [kg/ha]',fontsize=16)
 ax[1,9].legend(loc=5,bbox_to_anchor=(1.3, 0.3, 0.5, 0.5),fontsize=13)
 
 ############################## Leaching Plot ##################################
-for i,year in enumerate(outputs['GS'].unique()):
+leaching = -budget.term('leaching')[0]
+for i,year in enumerate(budget.years):
     ax[2,i].grid(zorder=0)
-    leaching2 = leaching[leaching['GS']==year].copy()
-    ## Reordering to Match Hanni's Plots
-    plots = ['NE','NW','SE','SW']
-    df_sort = pd.DataFrame({'block' : plots})
-    leaching2 = pd.merge(df_sort, leaching2,left_on='block',right_on='block',how='outer')
-    leaching2['leaching'] = -1 * leaching2['leaching']
-    ax[2,i].bar(leaching2['block'],leaching2['leaching'],zorder=3)
+    ax[2,i].bar(plots,leaching[i],zorder=3)
     ax[2,i].set_ylim([0,-375])
     ax[2,i].set_title(f'{year}',fontsize=16,y=0.99)
     ax[2,i].invert_yaxis()
@@ -120,20 +104,46 @@ for i,year in enumerate(outputs['GS'].unique()):
         
 ax[2,0].set_ylabel('Leaching [kg/ha]',fontsize=16)
 
-## Save the final figure
-plt.savefig('/Users/spencerjordan/Documents/bowman_data_analysis/N_mass_balance/combined_N_balance.png',
-            dpi=250, bbox_inches='tight')
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+## Save the final figure --> skipped when the data and this script are unchanged
+png = DIR+'/N_mass_balance/combined_N_balance.png'
+with open(__file__) as f:
+    key = figure_key(data.columns.tolist(),data,f.read())
+with stage('render','combined_N_balance.png'):
+    if not is_current(png,key):
+        plt.savefig(png,dpi=250, bbox_inches='tight')
+        mark_current(png,key)
+
+
+#%% Fertilizer and denitrification scenarios
+## 5000 budgets with the fertilizer rate +/-10% and denitrification +/-50%,
+## residual leaching (inputs - outputs) for all of them at once
+runs = budget.sample(5000,{'Fert kg/ha':0.1,'Denit':0.5},seed=0)
+q = runs.quantiles(runs.residual_leaching())
+scenario_leaching = pd.DataFrame({f'{int(100*p)}%':q[k].ravel() for k,p in enumerate((0.05,0.5,0.95))},
+                                 index=pd.MultiIndex.from_product([budget.years,budget.blocks],
+                                                                  names=['GS','block']))
+print(scenario_leaching.round(1))
+
+
+#%% Leaching from recharge x deep pore-water NO3-N
+## waterBalance writes leaching_flux.csv (leaching_flux.leaching_pipeline).
+## It replaces the manual leaching for the seasons it covers, and the budget
+## with the measured leaching is written next to the manual table. closure is
+## the N left unaccounted for, inputs - outputs - leaching
+flux_csv = DIR+'/N_mass_balance/leaching_flux.csv'
+if os.path.exists(flux_csv):
+    flux = pd.read_csv(flux_csv,index_col='GS')
+    ## Budget with the leaching flux for the seasons and blocks it covers
+    measured = budget.with_term('leaching',flux)
+    leaching_compare = pd.DataFrame({'budget':budget.term('leaching')[0].ravel(),
+                                     'flux':flux.reindex(index=budget.years,
+                                                         columns=budget.blocks).to_numpy().ravel(),
+                                     'inputs - outputs':budget.residual_leaching()[0].ravel()},
+                                    index=pd.MultiIndex.from_product([budget.years,budget.blocks],
+                                                                     names=['GS','block']))
+    closure = measured.net_balance()[0] - measured.term('leaching')[0]
+    leaching_compare['closure'] = closure.ravel()
+    print(leaching_compare.round(1))
+    balance_flux = measured.to_frame()
+    balance_flux['closure'] = closure.ravel()
+    balance_flux.round(2).to_csv(DIR+'/N_mass_balance/mass_balance_leaching_flux.csv',index=False)
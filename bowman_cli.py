@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 22:31:44 2026
+
+Headless command line entry point for the Bowman analyses
+
+    python bowman_cli.py water-balance [SHEET] [--et-mult 0.92] [--probe [NP_CSV]] [--out CSV]
+                                       [--leaching-out CSV]
+    python bowman_cli.py et-compare [--cimis CSV] [--ranch-systems CSV] [--flux-tower CSV] [--out CSV]
+    python bowman_cli.py gw-interp [--method linear|cubic|nearest|kriging] [--out NPZ]
+    python bowman_cli.py n-balance
+    python bowman_cli.py plots [--workers N]
+
+The default paths are the ones the scripts use. --data-dir (or BOWMAN_DIR)
+points everything in the data directory somewhere else.
+
+Only numpy and pandas are imported up front. matplotlib, scipy and geopandas
+are imported inside the subcommands that need them, and the backend is
+always Agg so nothing needs a display. water-balance without --probe or
+--plot only needs the balance engine. n-balance and plots run
+bowman_Nitrate_Balance.py and bowman_data_analysis.py headless, writing
+their PNGs. --profile prints the instrument stage table at the end
+
+@author: spencerjordan
+"""
+
+import argparse
+import os
+import sys
+
+## Never pick an interactive backend, whenever matplotlib ends up imported
+os.environ['MPLBACKEND'] = 'Agg'
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SHEET = '~/Documents/bowmanMassBalance/massBalanceMainData_92.csv'
+RANCH_SYSTEMS = '~/Downloads/widget-graph-export-2.csv'
+FLUX_TOWER = '~/Downloads/BowmanET_daily_2022_11_10.csv'
+CIMIS = '~/Documents/Hydrus/python_scripts/cimis_daily.csv'
+COORDINATES = '/Users/spencerjordan/Documents/Hydrus/mw_coordinates.csv'
+SHAPEFILE = ('/Users/spencerjordan/Documents/GW_modflow_Model-selected/Input data/'
+             'Model boundary shapefile/Bowman_N_1404x1092.shp')
+
+
+def _data_dir():
+    from bowman_data import DIR
+    return DIR
+
+
+def _write(frame,path):
+    """
+    Frame to CSV at path, or a short summary on stdout
+    """
+    if path:
+        frame.to_csv(os.path.expanduser(path))
+        print(f'Written to {path}')
+    else:
+        print(frame.describe().T.to_string())
+
+
+###############################################################################
+############################### water-balance #################################
+###############################################################################
+def water_balance(args):
+    import numpy as np
+    import pandas as pd
+    from balance_engine import load_block_config, MonthlyTerms
+    from instrument import stage
+    config = load_block_config(args.config)
+    with stage('load','mass balance sheet') as s:
+        mainDat = pd.read_csv(os.path.expanduser(args.sheet),skiprows=1)
+        s.count(mainDat)
+    with stage('balance','monthly terms',rows=len(mainDat)):
+        terms = MonthlyTerms.from_sheet(mainDat,config,start=args.start,end=args.end)
+        run = terms.sweep([args.et_mult])
+    ## Same columns calculate_balance gives in waterBalance
+    balance = pd.DataFrame(run['balance'][0],index=terms.index,
+                           columns=[f'{b}_balance' for b in config['blocks']])
+    balance['avgBalance'] = run['mean'][0]
+    balance['stdBalance'] = run['std'][0]
+    balance.index.name = 'Date'
+    _write(balance,args.out)
+    print(f"Cumulative orchard balance: {np.nansum(balance['avgBalance']):.2f} cm "
+          f"(ET multiplier {args.et_mult})")
+
+    if args.probe:
+        from dataset_registry import dataset
+        from probe_storage import ProbeStorage
+        from recharge_ensemble import block_recharge
+        with stage('load','neutron probe') as s:
+            np_data = dataset('neutron_probe',args.probe)
+            s.count(np_data)
+        with stage('balance','probe storage',rows=len(np_data)):
+            storage = ProbeStorage(np_data).changes(config['blocks'])
+        startDate = storage['orchard'].index[0]
+        with stage('spline','recharge',rows=len(config['blocks'])+1):
+            rch = block_recharge(balance[['avgBalance']],storage['orchard'].to_frame(),startDate)
+            blockRecharge = block_recharge(balance[[f'{b}_balance' for b in config['blocks']]],
+                                           storage['block'].fillna(0),startDate)
+        recharge = pd.concat([rch.set_axis(['recharge'],axis=1),
+                              blockRecharge.set_axis(config['blocks'],axis=1)],axis=1)
+        recharge.index.name = 'Date'
+        _write(recharge,args.recharge_out)
+
+        if args.leaching_out:
+            from leaching_flux import leaching_pipeline, covered_months
+            with stage('load','pore water') as s:
+                pw_data = dataset('pore_water',args.pore_water)
+                s.count(pw_data)
+            ## Only the months the balance and the probe record both cover
+            covered = covered_months(blockRecharge.set_axis(config['blocks'],axis=1),
+                                     balance.index,storage['block'].index)
+            leaching = leaching_pipeline(covered,pw_data,weights=config['area'])
+            _write(leaching['n_balance'],args.leaching_out)
+
+    if args.plot:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(15,10))
+        ax = fig.subplots()
+        ax.bar(balance.index,balance['avgBalance'],width=30,label='Water Balance',
+               edgecolor='black',linewidth=0.7)
+        ax.errorbar(balance.index,balance['avgBalance'],yerr=balance['stdBalance'],
+                    fmt='none',capsize=2,color='darkorange')
+        ax.set_title('Monthly Water Mass Balance\nMean +/- standard deviation across blocks',
+                     fontsize=20,loc='left')
+        ax.set_ylabel('Water Flux [cm]',fontsize=18)
+        with stage('render',os.path.basename(args.plot)):
+            fig.savefig(os.path.expanduser(args.plot),dpi=200)
+
+
+###############################################################################
+################################ et-compare ###################################
+###############################################################################
+def et_compare(args):
+    import pandas as pd
+    from bowman_data import read_ranch_systems_daily
+    from kc_engine import apply_Kc_schemes
+    from instrument import stage
+    with stage('load','Ranch Systems') as s:
+        rsET = read_ranch_systems_daily(os.path.expanduser(args.ranch_systems),start=args.start)
+        s.count(rsET)
+    with stage('load','flux tower') as s:
+        fluxTower = pd.read_csv(os.path.expanduser(args.flux_tower))
+        fluxTower.index = pd.to_datetime(fluxTower['date'],format='%m/%d/%Y')
+        s.count(fluxTower)
+    with stage('load','CIMIS') as s:
+        cimis = pd.read_csv(os.path.expanduser(args.cimis))
+        cimis.index = pd.to_datetime(cimis['Date'])
+        s.count(cimis)
+    cimis = cimis[cimis.index > min(rsET.index)]
+    ## All in inches like ET_comparisons
+    cimis_ETo = (cimis['ETo (mm)']/10/2.54).to_frame('ETo')
+    fluxTower['ETo'] = fluxTower['ETo']/10/2.54
+    with stage('Kc','all sources'):
+        ET = {'Ranch Systems ETc':apply_Kc_schemes(rsET,'Daily ETo (inch) (294)',
+                                                   [args.rs_kc])[args.rs_kc],
+              'CIMIS ETc':apply_Kc_schemes(cimis_ETo,'ETo',[args.cimis_kc])[args.cimis_kc],
+              'Model ETc':apply_Kc_schemes(cimis_ETo,'ETo',[args.model_kc])[args.model_kc],
+              'Flux tower ETa':fluxTower['ETo']*fluxTower['Kc']}
+    if args.openet:
+        openET = pd.read_csv(os.path.expanduser(args.openet))
+        openET.index = pd.to_datetime(openET['DateTime'])
+        ET['OpenET ETa'] = openET.loc[openET.index > pd.to_datetime(args.start),'Ensemble ET']
+    ## Cumulative ET in cm
+    cumulative = pd.DataFrame({k:(v*2.54).cumsum() for k,v in ET.items()})
+    cumulative.index.name = 'Date'
+    _write(cumulative,args.out)
+    print(cumulative.ffill().iloc[-1].round(1).to_string())
+
+    if args.plot:
+        from matplotlib.figure import Figure
+        fig = Figure()
+        ax = fig.subplots()
+        for col in cumulative:
+            series = cumulative[col].dropna()
+            ax.plot(series.index,series.values,label=col)
+        ax.set_ylabel('Cumulative ET [cm]')
+        ax.set_title('Cumulative ET Comparisons')
+        ax.legend()
+        ax.grid()
+        with stage('render',os.path.basename(args.plot)):
+            fig.savefig(os.path.expanduser(args.plot),dpi=200)
+
+
+###############################################################################
+################################# gw-interp ###################################
+###############################################################################
+def gw_interp(args):
+    import numpy as np
+    import pandas as pd
+    from gw_interp import RasterGrid, WellInterpolator, KrigingEngine, krige_dates
+    from instrument import stage
+    with stage('load','well coordinates'):
+        coords = pd.read_csv(os.path.expanduser(args.coords))
+    coords['MW#'] = np.arange(1,len(coords)+1)
+    coords[['x','y','z']] = coords[['x','y','z']]*0.3048
+    with stage('load','well chemistry') as s:
+        hds = pd.read_csv(os.path.expanduser(args.wells))
+        s.count(hds)
+    hds = hds[hds[args.value].notna()]
+    hds['Sampling Date'] = pd.to_datetime(hds['Sampling Date'])
+    ## Grid over the model boundary, or over the wells without a shapefile
+    if args.bounds:
+        bounds = args.bounds
+    elif args.shapefile and os.path.exists(os.path.expanduser(args.shapefile)):
+        import geopandas as gpd
+        bounds = gpd.read_file(os.path.expanduser(args.shapefile)).total_bounds
+    else:
+        bounds = [coords['x'].min(),coords['y'].min(),coords['x'].max(),coords['y'].max()]
+    grid = RasterGrid.from_bounds(*bounds,args.rows,args.cols)
+    xi = grid.xy
+    wells = coords.sort_values('MW#')
+    points = wells[['x','y']].values
+    ## Only dates where every well was sampled, like interpolate_gw_contours
+    N_all = hds.pivot_table(index='MW#',columns='Sampling Date',values=args.value)
+    N_all = N_all.reindex(wells['MW#'])
+    N_all = N_all.loc[:,N_all.notna().all()]
+    with stage('interpolation',args.method,rows=N_all.shape[1]):
+        if args.method == 'kriging':
+            Z = KrigingEngine.fit(points,xi,N_all.values,model=args.model)(N_all.values).T
+        elif args.method == 'kriging-per-date':
+            Z,_ = krige_dates(points,xi,N_all.values,model=args.model,workers=args.workers)
+        else:
+            Z = WellInterpolator(points,xi,method=args.method)(N_all.values).T
+    dates = N_all.columns
+    print(f'{len(dates)} dates interpolated onto a {args.rows} x {args.cols} grid')
+    if args.out:
+        np.savez(os.path.expanduser(args.out),surfaces=Z,dates=dates.values.astype('datetime64[ns]'),
+                 transform=np.asarray(grid.transform,dtype=float),shape=grid.shape)
+        print(f'Written to {args.out}')
+    if args.plot_dir:
+        from matplotlib.figure import Figure
+        folder = os.path.expanduser(args.plot_dir)
+        os.makedirs(folder,exist_ok=True)
+        with stage('render','surfaces',rows=len(dates)):
+            for date,z in zip(dates,Z):
+                fig = Figure()
+                ax = fig.subplots()
+                im = ax.imshow(grid.reshape(z))
+                fig.colorbar(im,ax=ax)
+                ax.set_title(f'{args.value} {date:%Y-%m-%d}')
+                fig.savefig(os.path.join(folder,f'{args.method}_{date:%Y%m%d}.png'),dpi=100)
+
+
+###############################################################################
+########################## Scripts run headless ###############################
+###############################################################################
+def run_script(name):
+    """
+    Run one of the analysis scripts as __main__ on the Agg backend
+    """
+    import runpy
+    sys.path.insert(0,HERE)
+    runpy.run_path(os.path.join(HERE,name),run_name='__main__')
+
+
+def n_balance(args):
+    run_script('bowman_Nitrate_Balance.py')
+
+
+def plots(args):
+    ## bowman_data_analysis writes PNGs instead of showing figures when set
+    os.environ['BOWMAN_WORKERS'] = str(args.workers)
+    if args.force:
+        import figure_render
+        figure_render.RENDER_ALL = True
+    run_script('bowman_data_analysis.py')
+
+
+###############################################################################
+def parser():
+    p = argparse.ArgumentParser(prog='bowman_cli.py',description='Bowman orchard analyses, headless')
+    p.add_argument('--data-dir',help='data directory (default: BOWMAN_DIR or bowman_data.DIR)')
+    p.add_argument('--profile',action='store_true',help='print the stage timing table')
+    p.add_argument('--trace',help='also write a Chrome trace JSON of the stages')
+    p.add_argument('--clean-report',action='store_true',
+                   help='print the rows rewritten, filled and rejected by the cleaning rules')
+    sub = p.add_subparsers(dest='command',required=True)
+
+    wb = sub.add_parser('water-balance',help='monthly block balance and recharge')
+    wb.add_argument('sheet',nargs='?',default=SHEET)
+    wb.add_argument('--config',help='block config JSON for balance_engine')
+    wb.add_argument('--et-mult',type=float,default=0.92)
+    wb.add_argument('--start',default='09/01/2012')
+    wb.add_argument('--end',default='09/01/2022')
+    wb.add_argument('--probe',nargs='?',const='',default=None,
+                    help='neutron probe CSV for ΔS and recharge (default file if no path)')
+    wb.add_argument('--out',help='monthly balance CSV')
+    wb.add_argument('--recharge-out',help='monthly recharge CSV')
+    wb.add_argument('--leaching-out',
+                    help='NO3-N leaching per growing season and N balance block CSV (needs --probe)')
+    wb.add_argument('--pore-water',help='pore water CSV for --leaching-out (default in the data dir)')
+    wb.add_argument('--plot',help='monthly balance PNG')
+    wb.set_defaults(func=water_balance)
+
+    et = sub.add_parser('et-compare',help='cumulative ET from every source')
+    et.add_argument('--cimis',default=CIMIS)
+    et.add_argument('--ranch-systems',default=RANCH_SYSTEMS)
+    et.add_argument('--flux-tower',default=FLUX_TOWER)
+    et.add_argument('--openet',nargs='?',const='',default=None)
+    et.add_argument('--start',default='2022-04-26')
+    et.add_argument('--rs-kc',default='itrc_wet')
+    et.add_argument('--cimis-kc',default='itrc_dry')
+    et.add_argument('--model-kc',default='Shackle')
+    et.add_argument('--out',help='cumulative ET CSV')
+    et.add_argument('--plot',help='cumulative ET PNG')
+    et.set_defaults(func=et_compare)
+
+    gw = sub.add_parser('gw-interp',help='interpolate well NO3-N onto the model grid')
+    gw.add_argument('--coords',default=COORDINATES)
+    gw.add_argument('--wells',default=None,help='compiled well CSV (default in the data dir)')
+    gw.add_argument('--value',default='NO3-N (mg/L)')
+    gw.add_argument('--shapefile',default=SHAPEFILE)
+    gw.add_argument('--bounds',type=float,nargs=4,metavar=('MINX','MINY','MAXX','MAXY'))
+    gw.add_argument('--rows',type=int,default=117)
+    gw.add_argument('--cols',type=int,default=91)
+    gw.add_argument('--method',default='linear',
+                    choices=['linear','cubic','nearest','kriging','kriging-per-date'])
+    gw.add_argument('--model',default='gaussian')
+    gw.add_argument('--workers',type=int,default=None)
+    gw.add_argument('--out',help='surfaces as NPZ')
+    gw.add_argument('--plot-dir',help='one PNG per date')
+    gw.set_defaults(func=gw_interp)
+
+    nb = sub.add_parser('n-balance',help='run bowman_Nitrate_Balance.py')
+    nb.set_defaults(func=n_balance)
+
+    pl = sub.add_parser('plots',help='run bowman_data_analysis.py, writing the PNGs')
+    pl.add_argument('--workers',type=int,default=1)
+    pl.add_argument('--force',action='store_true',help='redraw the PNGs that are already current')
+    pl.set_defaults(func=plots)
+    return p
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.data_dir:
+        os.environ['BOWMAN_DIR'] = os.path.abspath(os.path.expanduser(args.data_dir))
+    if args.command == 'water-balance' and args.probe == '':
+        args.probe = _data_dir()+'/np2018_2022_Spencer_Update.csv'
+    if args.command == 'water-balance' and args.pore_water is None:
+        args.pore_water = _data_dir()+'/ALL_PORE_WATER_COMPILED.CSV'
+    if args.command == 'et-compare' and args.openet == '':
+        args.openet = _data_dir()+'/OPENET_SE_all_years.csv'
+    if args.command == 'gw-interp' and args.wells is None:
+        args.wells = _data_dir()+'/BOW-MW-ALL-DATA-Compiled_working.csv'
+    import instrument
+    if args.profile or args.trace:
+        instrument.enable()
+    args.func(args)
+    if instrument.enabled() and not os.environ.get('BOWMAN_PROFILE'):
+        print(instrument.report())
+        if args.trace:
+            print(f'Trace written to {instrument.write_trace(args.trace)}')
+    if args.clean_report:
+        import bowman_data
+        print(bowman_data.cleaning_report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:03:52 2026
+
+Loaders for the Bowman data files
+
+The cleaned pore-water data is stored as an uncompressed Feather snapshot next
+to the source CSV. The snapshot is keyed on the CSV's size, mtime and content
+hash, so later runs memory-map it and skip the CSV parsing and cleanup
+
+@author: spencerjordan
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+## Top level directory with data files --> Set up for mac/linux
+## BOWMAN_DIR points the scripts somewhere else (e.g. synthetic data)
+DIR = os.environ.get('BOWMAN_DIR','/Users/spencerjordan/Documents/bowman_data_analysis')
+
+## Bump when the cleaning below changes so old snapshots get rebuilt
+SNAPSHOT_VERSION = 2
+
+## Entries in measurement columns that mean 'no value'
+SENTINELS = ['redo','#VALUE!','#DIV/0!','#N/A','#REF!']
+
+## Column types of each dataset
+##   'key'      --> categorical of the parsed values (e.g. MW# numbers)
+##   'key:str'  --> categorical of the text with whitespace stripped
+##   'float32'/'float64' --> measurement, sentinels and other text are NaN
+##   'date' or 'date:<format>' --> datetime64
+## Concentrations are float32; water content stays float64 since it feeds
+## the water balance
+SCHEMAS = {'pore_water':{'Date':'key:str',
+                         'Al#':'key:str',
+                         'Depth':'key:str',
+                         'ppm NH4-N':'float32',
+                         'ppm NO3-N':'float32'},
+           'neutron_probe':{'Site':'key:str',
+                            'Depth':'key',
+                            'date':'date:%m/%d/%y',
+                            'water content':'float64',
+                            'water content weighted':'float64'},
+           'mls':{'MW#':'key',
+                  'depth (m)':'key:str',
+                  'NO3-N mg/L':'float32',
+                  'EC dS/m':'float32',
+                  'NO3/EC':'float32'},
+           'wells':{'MW#':'key',
+                    'Sampling Date':'date:%m/%d/%Y',
+                    'DTW (feet)':'float32',
+                    'pH':'float32',
+                    'Temp C':'float32',
+                    'Eh(mV)':'float32',
+                    'NO3-N (mg/L)':'float32'},
+           'soil':{'Date':'date',
+                   'Block':'key:str',
+                   'lbs NH-N/acre-soil':'float32',
+                   'lbs NO3-N/acre-soil':'float32'},
+           'n_balance':{'block':'key:str',
+                        'GS':'key',
+                        'Fert kg/ha':'float64',
+                        'Min':'float64',
+                        'Dep':'float64',
+                        'Uptake kg/ha':'float64',
+                        'Growth':'float64',
+                        'Denit':'float64',
+                        'leaching':'float64'}}
+
+
+###############################################################################
+########################## Snapshot helpers ###################################
+###############################################################################
+def _file_hash(path,blocksize=1<<20):
+    """
+    sha256 of a file's contents, read in blocks
+    """
+    h = hashlib.sha256()
+    with open(path,'rb') as f:
+        for block in iter(lambda: f.read(blocksize),b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _snapshot_paths(csv_path,name,cache_dir=None):
+    """
+    Location of the Feather snapshot and its key file for a CSV
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(csv_path),'.bowman_cache')
+    base = os.path.join(cache_dir,f'{os.path.basename(csv_path)}.{name}')
+    return base+'.feather', base+'.json'
+
+
+def _read_key(key_path):
+    try:
+        with open(key_path) as f:
+            return json.load(f)
+    except (OSError,ValueError):
+        return None
+
+
+def _write_key(key_path,key):
+    with open(key_path,'w') as f:
+        json.dump(key,f)
+
+
+def cached_snapshot(csv_path,name,build,cache_dir=None,rebuild=False):
+    """
+    Return the frame built by build(csv_path), cached as a Feather snapshot
+
+    The snapshot is reused while the CSV's size and mtime match the stored
+    key. If only the mtime changed (e.g. the file was copied) the content hash
+    decides, and the key is refreshed without rebuilding
+    """
+    ## pyarrow is only needed for the snapshot, fall back to the plain build
+    try:
+        from pyarrow import feather
+    except ImportError:
+        return build(csv_path)
+    csv_path = os.path.expanduser(csv_path)
+    snap_path,key_path = _snapshot_paths(csv_path,name,cache_dir)
+    st = os.stat(csv_path)
+    key = {'version':SNAPSHOT_VERSION,
+           'size':st.st_size,
+           'mtime':st.st_mtime_ns}
+    old = _read_key(key_path)
+    if not rebuild and old is not None and os.path.exists(snap_path):
+        same_stat = all(old.get(k) == key[k] for k in key)
+        if not same_stat and old.get('version') == key['version'] and old.get('size') == key['size']:
+            key['sha256'] = _file_hash(csv_path)
+            if old.get('sha256') == key['sha256']:
+                _write_key(key_path,key)
+                same_stat = True
+        if same_stat:
+            return feather.read_table(snap_path,memory_map=True).to_pandas()
+    ## Build and store a fresh snapshot
+    data = build(csv_path)
+    key['sha256'] = key.get('sha256') or _file_hash(csv_path)
+    os.makedirs(os.path.dirname(snap_path),exist_ok=True)
+    feather.write_feather(data.reset_index(drop=True),snap_path,
+                          compression='uncompressed')
+    _write_key(key_path,key)
+    return data
+
+
+###############################################################################
+############################# Typed loading ###################################
+###############################################################################
+def recode(col,mapping):
+    """
+    Map the values of a categorical column (dict or function), merging
+    categories that end up the same
+
+    Only the categories are mapped, the rows just get new codes. Values not
+    in a dict mapping are kept
+    """
+    col = col if isinstance(col.dtype,pd.CategoricalDtype) else col.astype('category')
+    cats = col.cat.categories
+    if callable(mapping):
+        new = pd.Index([mapping(c) for c in cats])
+    else:
+        new = pd.Index([mapping.get(c,c) for c in cats])
+    codes,uniques = pd.factorize(new)
+    old = col.cat.codes.values
+    codes = np.where(old >= 0,codes[old],-1)
+    return pd.Series(pd.Categorical.from_codes(codes,uniques),index=col.index,name=col.name)
+
+
+def _strip(value):
+    return value.strip() if isinstance(value,str) else value
+
+
+def parse_dates(col,format=None):
+    """
+    datetime64 column, parsing each distinct value only once
+    """
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    col = col if isinstance(col.dtype,pd.CategoricalDtype) else col.astype('category')
+    dates = pd.to_datetime(col.cat.categories,format=format,errors='coerce')
+    codes = col.cat.codes.values
+    values = np.where(codes >= 0,dates.values[codes],np.datetime64('NaT'))
+    return pd.Series(values.astype('datetime64[ns]'),index=col.index,name=col.name)
+
+
+def apply_schema(data,schema,formats=None):
+    """
+    Convert the columns of data that are in schema to their types, in place
+
+    formats overrides the date format of a column, e.g. {'Sampling Date':'%m/%d/%y'}
+    """
+    formats = formats or {}
+    for column,kind in schema.items():
+        if column not in data.columns:
+            continue
+        col = data[column]
+        if kind.startswith('key'):
+            data[column] = recode(col,_strip) if kind == 'key:str' else col.astype('category')
+        elif kind.startswith('float'):
+            data[column] = pd.to_numeric(col,errors='coerce').astype(kind)
+        elif kind.startswith('date'):
+            data[column] = parse_dates(col,formats.get(column,kind[5:] or None))
+    return data
+
+
+def read_typed(csv_path,schema,formats=None,**kwargs):
+    """
+    Read a CSV straight into the column types of schema
+
+    Text keys are read as strings, and the sentinels are turned into NaN by
+    the parser itself so the measurements come in numeric
+    """
+    dtype = {c:str for c,kind in schema.items() if kind == 'key:str' or kind.startswith('date')}
+    na_values = {c:SENTINELS for c,kind in schema.items() if kind.startswith('float')}
+    data = pd.read_csv(csv_path,dtype=dtype,na_values=na_values,**kwargs)
+    return apply_schema(data,schema,formats)
+
+
+def fill_missing(data,value):
+    """
+    fillna that also fills the categorical columns, adding value as a category
+    """
+    data = data.copy()
+    ## Only touch the columns with gaps, pandas checks value against every categorical
+    for column in data.columns[data.isna().any().values]:
+        col = data[column]
+        if isinstance(col.dtype,pd.CategoricalDtype) and value not in col.cat.categories:
+            col = col.cat.add_categories([value])
+        data[column] = col.fillna(value)
+    return data
+
+
+###############################################################################
+############################ Cleaning rules ###################################
+###############################################################################
+## Depth typos in the compiled pore-water sheet
+PW_DEPTH_FIXES = {'30n':'30 N','30N':'30 N','30.1':'30 N',
+                  '30s':'30 S','30S':'30 S','30.2':'30 S',
+                  '188':'180'}
+## Neutron probe site names --> Al-#, ASSUMING the bare numbers are the same sites
+PROBE_SITE_FIXES = {'AL-1':'Al-1','AL-2':'Al-2'}
+PROBE_SITE_FIXES.update({str(n):f'Al-{n}' for n in range(1,9)})
+
+## Cleaning rules of each dataset, one (column, action, argument) row per rule
+##   'strip'  --> values as text with the whitespace stripped
+##   'map'    --> rewrite values {old:new}, later maps apply to the results of
+##                earlier ones (so '30n'-->'30 N' then '30 N'-->'30' gives '30')
+##   'fill'   --> fill the gaps with argument, column None fills every column
+##   'reject' --> drop the rows where column is missing ('missing') or in a list
+## The dataset rules run once at ingest (the loaders below). The other tables
+## are views used by single plots, e.g. the NO3 plots lump the 30 cm depths
+RULES = {'pore_water':[('Depth','strip',None),
+                       ('Depth','map',PW_DEPTH_FIXES)],
+         'neutron_probe':[('Site','strip',None),
+                          ('Site','map',PROBE_SITE_FIXES)],
+         'pore_water_no3':[('Depth','map',{'30 S':'30','30 N':'30','200':'180',
+                                           '290':'280','300':'280'})],
+         'mls_no3':[(None,'fill',0)],
+         'mls_ratio':[('NO3/EC','reject','missing')]}
+
+## Counts of the last clean() of each rules table, see cleaning_report()
+CLEANING_LOG = {}
+
+
+class CleaningRules:
+    """
+    A rules table compiled into one pass over the data
+
+    All the 'strip' and 'map' rules of a column become a single mapping that
+    is applied to the categories only (recode), the fills are one fillna per
+    column and the rejects one combined row mask
+    """
+    def __init__(self,table):
+        self.strip = set()
+        self.maps = {}
+        self.fills = {}
+        self.rejects = []
+        for column,action,arg in table:
+            if action == 'strip':
+                self.strip.add(column)
+            elif action == 'map':
+                ## Compose with the earlier maps of the column
+                composed = self.maps.setdefault(column,{})
+                for k,v in composed.items():
+                    composed[k] = arg.get(v,v)
+                for k,v in arg.items():
+                    composed.setdefault(k,v)
+            elif action == 'fill':
+                self.fills[column] = arg
+            elif action == 'reject':
+                self.rejects.append((column,arg))
+            else:
+                raise ValueError(f'Unknown cleaning action {action!r}')
+
+    def _mapper(self,column):
+        mapping = self.maps.get(column,{})
+        strip = column in self.strip
+        def mapper(value):
+            value = str(value).strip() if strip else value
+            return mapping.get(value,value)
+        return mapper
+
+    def apply(self,data):
+        """
+        Clean data (columns replaced in place, rejected rows dropped)
+
+        Returns the cleaned frame and the counts of each column:
+        {column:{'rewritten':rows,'filled':rows,'rejected':rows}}
+        """
+        counts = {}
+        for column in sorted(self.strip | set(self.maps),key=str):
+            if column not in data.columns:
+                continue
+            col = data[column]
+            col = col if isinstance(col.dtype,pd.CategoricalDtype) else col.astype('category')
+            mapper = self._mapper(column)
+            cats = col.cat.categories
+            changed = np.array([mapper(c) != c for c in cats],dtype=bool)
+            codes = col.cat.codes.values
+            per_cat = np.bincount(codes[codes >= 0],minlength=len(cats))
+            data[column] = recode(col,mapper)
+            counts.setdefault(column,{})['rewritten'] = int(per_cat[changed].sum())
+        for column,value in self.fills.items():
+            columns = data.columns if column is None else [column]
+            for c in columns:
+                if c not in data.columns:
+                    continue
+                gaps = int(data[c].isna().sum())
+                if gaps:
+                    data[c] = fill_missing(data[[c]],value)[c]
+                    counts.setdefault(c,{})['filled'] = gaps
+        if self.rejects:
+            keep = np.ones(len(data),dtype=bool)
+            for column,arg in self.rejects:
+                if column not in data.columns:
+                    continue
+                bad = (data[column].isna() if arg == 'missing'
+                       else data[column].isin(arg)).values
+                counts.setdefault(column,{})['rejected'] = int((bad & keep).sum())
+                keep &= ~bad
+            if not keep.all():
+                data = data[keep]
+        return data, counts
+
+
+_COMPILED = {}
+
+
+def clean(data,rules):
+    """
+    Run a rules table (a name in RULES or a list of rules) over data
+
+    The tables in RULES are compiled once per session. The counts of the pass
+    are kept in CLEANING_LOG under the table name
+    """
+    if isinstance(rules,str):
+        name = rules
+        if name not in _COMPILED:
+            _COMPILED[name] = CleaningRules(RULES[name])
+        compiled = _COMPILED[name]
+    else:
+        name = '<rules>'
+        compiled = CleaningRules(rules)
+    data,counts = compiled.apply(data)
+    CLEANING_LOG[name] = {'rows':len(data),'columns':counts}
+    return data
+
+
+def cleaning_report(log=None):
+    """
+    Text table of the rows rewritten, filled and rejected by each clean()
+    """
+    log = CLEANING_LOG if log is None else log
+    lines = [f"{'rules':18s}{'column':16s}{'rewritten':>11}{'filled':>9}{'rejected':>10}"]
+    for name,entry in log.items():
+        for column,c in entry['columns'].items():
+            lines.append(f"{name[:18]:18s}{str(column)[:16]:16s}{c.get('rewritten',0):11d}"
+                         f"{c.get('filled',0):9d}{c.get('rejected',0):10d}")
+    return '\n'.join(lines)
+
+
+###############################################################################
+############################# Dataset loaders #################################
+###############################################################################
+def load_neutron_probe(csv_path=DIR+'/np2018_2022_Spencer_Update.csv'):
+    """
+    Neutron probe readings, Site and Depth as categoricals and 'date' parsed
+
+    The site names are already fixed (AL-1, bare numbers --> Al-#)
+    """
+    return clean(read_typed(csv_path,SCHEMAS['neutron_probe']),'neutron_probe')
+
+
+def load_mls(csv_path=DIR+'/Bowman-MW-multilevel-sampling-ALL-DATA-2021-spencer.csv'):
+    """
+    Multi-level sampling, '#VALUE!' ratios are NaN
+    """
+    return read_typed(csv_path,SCHEMAS['mls'])
+
+
+def load_wells(csv_path=DIR+'/BOW-MW-ALL-DATA-Compiled.csv',date_format='%m/%d/%Y'):
+    """
+    Compiled monitoring well sampling, the _update file uses date_format='%m/%d/%y'
+    """
+    return read_typed(csv_path,SCHEMAS['wells'],formats={'Sampling Date':date_format})
+
+
+def load_soil(csv_path=DIR+'/soil-bwn-inorgan-N-2022_spencer.csv'):
+    return read_typed(csv_path,SCHEMAS['soil'])
+
+
+def load_n_balance(csv_path=DIR+'/N_mass_balance/manual_mass_balance_2022.csv'):
+    return read_typed(csv_path,SCHEMAS['n_balance'])
+
+
+###############################################################################
+############################### Pore Water ####################################
+###############################################################################
+def clean_pore_water(csv_path):
+    """
+    Read and clean ALL_PORE_WATER_COMPILED.CSV
+
+    Depth and Al# are categoricals of the stripped text, with the depth typos
+    fixed by the 'pore_water' rules, 'redo' entries are NaN, and the sampling date is parsed once into
+    a 'datetime' column
+    """
+    pw_data = read_typed(csv_path,SCHEMAS['pore_water'])
+    ## Cleaning the depth input
+    pw_data = clean(pw_data,'pore_water')
+    pw_data['datetime'] = parse_dates(pw_data['Date'],format='%m/%d/%y')
+    return pw_data
+
+
+def load_pore_water(csv_path=DIR+'/ALL_PORE_WATER_COMPILED.CSV',cache_dir=None,
+                    rebuild=False):
+    """
+    Cleaned pore-water data, memory-mapped from the snapshot when up to date
+    """
+    return cached_snapshot(csv_path,'pore_water',clean_pore_water,
+                           cache_dir=cache_dir,rebuild=rebuild)
+
+
+###############################################################################
+########################### Partition Index ###################################
+###############################################################################
+class SeriesIndex:
+    """
+    Partition index over a long-format frame (pore water, neutron probe)
+
+    Rows are sorted once by (depth, station, date) and the start/stop offset
+    of every (depth, station) and (depth, station, year) group is stored, so
+    pulling one series out is a dict lookup plus a slice instead of a scan
+    of the full frame
+    """
+    def __init__(self,data,depth='Depth',station='Al#',date='datetime'):
+        self.depth_col = depth
+        self.station_col = station
+        self.date_col = date
+        dates = data[date]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        ## Integer codes for the keys so the sort and the group breaks are numeric
+        depth_codes,depth_keys = pd.factorize(data[depth])
+        station_codes,station_keys = pd.factorize(data[station])
+        date_ns = dates.values.astype('datetime64[ns]').view('int64')
+        order = np.lexsort((date_ns,station_codes,depth_codes))
+        self.data = data.iloc[order].reset_index(drop=True)
+        self.data[date] = dates.values[order]
+        depth_codes = depth_codes[order]
+        station_codes = station_codes[order]
+        years = pd.DatetimeIndex(self.data[date]).year.values
+        years = np.where(np.isnan(years.astype(float)),-1,years).astype(int)
+
+        self.groups = {}
+        self.year_groups = {}
+        ## Offsets where either key changes
+        ## Missing keys (factorize code -1) are grouped under None
+        def key(keys,code):
+            return keys[code] if code >= 0 else None
+        self._fill(self.groups,[depth_codes,station_codes],
+                   lambda i: (key(depth_keys,depth_codes[i]),
+                              key(station_keys,station_codes[i])))
+        self._fill(self.year_groups,[depth_codes,station_codes,years],
+                   lambda i: (key(depth_keys,depth_codes[i]),
+                              key(station_keys,station_codes[i]),
+                              years[i] if years[i] >= 0 else None))
+        self.depths = list(depth_keys)
+        self.stations = list(station_keys)
+
+    @staticmethod
+    def _fill(groups,codes,key):
+        n = len(codes[0])
+        if n == 0:
+            return
+        change = np.zeros(n,dtype=bool)
+        change[0] = True
+        for c in codes:
+            change[1:] |= c[1:] != c[:-1]
+        starts = np.flatnonzero(change)
+        stops = np.append(starts[1:],n)
+        for start,stop in zip(starts,stops):
+            groups[key(start)] = (start,stop)
+
+    def slice(self,depth,station,year=None):
+        """
+        Rows for one depth and station (optionally one calendar year), sorted by date
+        """
+        if year is None:
+            start,stop = self.groups.get((depth,station),(0,0))
+        else:
+            start,stop = self.year_groups.get((depth,station,year),(0,0))
+        return self.data.iloc[start:stop]
+
+    def series(self,column,depth,station,year=None):
+        """
+        One measurement column as a date-indexed series
+        """
+        sub = self.slice(depth,station,year)
+        return pd.Series(sub[column].values,index=sub[self.date_col].values,
+                         name=column)
+
+
+###############################################################################
+######################## Ranch Systems ET exports #############################
+###############################################################################
+def _parse_date_time(date,time):
+    """
+    Vectorized Date + Time parse --> the ~96 distinct times of day are only parsed once
+    """
+    day = pd.to_datetime(date,format='%Y-%m-%d',cache=True).values
+    codes,times = pd.factorize(time)
+    offset = pd.to_timedelta(times+':00').values[codes]
+    return day + offset
+
+
+def read_ranch_systems_daily(csv_path,start=None,chunksize=100000):
+    """
+    Daily means of a Ranch Systems widget export, read in chunks
+
+    Same result as reading the whole export, joining Date and Time, and doing
+    resample('1d').mean(), but only one chunk is held in memory at a time.
+    Each chunk feeds running per-day sums and counts of the numeric columns.
+    The rows of a chunk's last day are carried into the next chunk so a day is
+    reduced in one piece, which keeps the means bit-for-bit identical to the
+    in-memory path for time-ordered exports
+    """
+    if start is not None:
+        start = np.datetime64(pd.Timestamp(start))
+    sums = []
+    counts = []
+    columns = None
+    carry = None
+    reader = pd.read_csv(csv_path,chunksize=chunksize)
+    for chunk in reader:
+        dt = _parse_date_time(chunk['Date'],chunk['Time'])
+        if start is not None:
+            keep = dt >= start
+            chunk,dt = chunk[keep],dt[keep]
+        if columns is None:
+            columns = [c for c in chunk.columns
+                       if c not in ('Date','Time') and pd.api.types.is_numeric_dtype(chunk[c])]
+        values = chunk[columns].apply(pd.to_numeric,errors='coerce')
+        values.index = dt.astype('datetime64[D]')
+        if carry is not None:
+            values = pd.concat([carry,values])
+        if len(values) == 0:
+            continue
+        ## Hold back the last day, it may continue in the next chunk
+        last = values.index[-1]
+        tail = values.index == last
+        carry = values[tail]
+        values = values[~tail]
+        grouped = values.groupby(level=0)
+        sums.append(grouped.sum())
+        counts.append(grouped.count())
+    if carry is not None and len(carry):
+        grouped = carry.groupby(level=0)
+        sums.append(grouped.sum())
+        counts.append(grouped.count())
+    if not sums:
+        return pd.DataFrame(columns=columns or [])
+    ## Days only repeat across chunks if the export is out of order
+    sums = pd.concat(sums).groupby(level=0).sum()
+    counts = pd.concat(counts).groupby(level=0).sum()
+    daily = sums / counts.where(counts > 0)
+    ## Fill in days with no readings, like resample does
+    daily.index = pd.DatetimeIndex(daily.index,name='DateTime')
+    return daily.asfreq('D')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:05:41 2026
+
+Registry of the parsed datasets, so each CSV is only parsed once per session
+
+    from dataset_registry import dataset
+    np_data = dataset('neutron_probe')
+    wl_data = dataset('wells',DIR+'/BOW-MW-ALL-DATA-Compiled.csv')
+
+Every dataset has a named loader from bowman_data. The parsed frames are kept
+in an LRU keyed on (name, path, loader arguments) and are re-read when the
+file's mtime or size changes. Callers get read-only views of the cached frame:
+adding or replacing columns and filtering rows is fine and never touches the
+cache, writing into the values raises (or copies, with pandas copy-on-write).
+
+The cached frames are capped at a memory budget, the least recently used
+ones are dropped first. Set it with DatasetRegistry(budget=bytes) or for the
+default registry with the environment variable BOWMAN_CACHE_MB
+
+@author: spencerjordan
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import bowman_data
+from instrument import stage
+
+## Default memory budget of the cached frames
+BUDGET_MB = float(os.environ.get('BOWMAN_CACHE_MB',1024))
+
+
+def _freeze(frame):
+    """
+    Mark the numpy blocks of frame read-only so in-place writes raise
+    """
+    for arr in getattr(frame._mgr,'arrays',[]):
+        if isinstance(arr,np.ndarray):
+            arr.flags.writeable = False
+    return frame
+
+
+class DatasetRegistry:
+    """
+    Named dataset loaders with an LRU of the parsed frames, see the module docstring
+    """
+    def __init__(self,budget=BUDGET_MB*2**20):
+        self.budget = budget
+        self.loaders = {}
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+
+    def register(self,name,loader,path=None,**kwargs):
+        """
+        Add a named loader, loader(path,**kwargs) returns a DataFrame
+
+        path and kwargs are the defaults, get() can override both
+        """
+        self.loaders[name] = (loader,path,kwargs)
+
+    def _key(self,name,path,kwargs):
+        loader,default_path,defaults = self.loaders[name]
+        path = os.path.abspath(os.path.expanduser(path or default_path))
+        kwargs = {**defaults,**kwargs}
+        return (name,path,tuple(sorted(kwargs.items()))), loader, path, kwargs
+
+    def get(self,name,path=None,**kwargs):
+        """
+        Read-only view of a dataset, parsed on the first call and when the file changes
+        """
+        key,loader,path,kwargs = self._key(name,path,kwargs)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns,st.st_size)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry['stamp'] == stamp:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return entry['frame'].copy(deep=False)
+            self.misses += 1
+            with stage('load',name) as s:
+                frame = _freeze(loader(path,**kwargs))
+                s.count(frame)
+            self.cache[key] = {'frame':frame,'stamp':stamp,
+                               'nbytes':int(frame.memory_usage(deep=True).sum())}
+            self.cache.move_to_end(key)
+            self._evict(keep=key)
+            return frame.copy(deep=False)
+
+    def _evict(self,keep=None):
+        """
+        Drop the least recently used frames until the cache fits the budget
+
+        The frame just loaded (keep) stays even if it is larger than the budget
+        """
+        if self.budget is None:
+            return
+        while self.nbytes() > self.budget:
+            key = next((k for k in self.cache if k != keep),None)
+            if key is None:
+                break
+            del self.cache[key]
+            self.evictions += 1
+
+    def nbytes(self):
+        return sum(entry['nbytes'] for entry in self.cache.values())
+
+    def invalidate(self,name=None):
+        """
+        Forget the cached frames of one dataset, or all of them
+        """
+        with self._lock:
+            for key in [k for k in self.cache if name is None or k[0] == name]:
+                del self.cache[key]
+
+    def info(self):
+        """
+        Text summary of the cached frames and the hit/miss counts
+        """
+        lines = [f"{'dataset':16s}{'MB':>9}  file"]
+        for (name,path,_),entry in self.cache.items():
+            lines.append(f"{name[:16]:16s}{entry['nbytes']/2**20:9.1f}  {os.path.basename(path)}")
+        lines.append(f'{len(self.cache)} cached, {self.nbytes()/2**20:.1f} MB, '
+                     f'{self.hits} hits, {self.misses} misses, {self.evictions} evicted')
+        return '\n'.join(lines)
+
+
+def default_registry(data_dir=None):
+    """
+    Registry with the bowman_data loaders under their usual file names
+    """
+    d = data_dir or bowman_data.DIR
+    reg = DatasetRegistry()
+    reg.register('pore_water',bowman_data.load_pore_water,d+'/ALL_PORE_WATER_COMPILED.CSV')
+    reg.register('neutron_probe',bowman_data.load_neutron_probe,d+'/np2018_2022_Spencer_Update.csv')
+    reg.register('mls',bowman_data.load_mls,
+                 d+'/Bowman-MW-multilevel-sampling-ALL-DATA-2021-spencer.csv')
+    reg.register('wells',bowman_data.load_wells,d+'/BOW-MW-ALL-DATA-Compiled.csv')
+    ## The _update file writes two-digit years
+    reg.register('wells_update',bowman_data.load_wells,d+'/BOW-MW-ALL-DATA-Compiled_update.csv',
+                 date_format='%m/%d/%y')
+    reg.register('soil',bowman_data.load_soil,d+'/soil-bwn-inorgan-N-2022_spencer.csv')
+    reg.register('n_balance',bowman_data.load_n_balance,
+                 d+'/N_mass_balance/manual_mass_balance_2022.csv')
+    return reg
+
+
+## Shared by every script and cell in the process
+REGISTRY = default_registry()
+
+
+def dataset(name,path=None,**kwargs):
+    """
+    Read-only view of a dataset from the shared registry
+    """
+    return REGISTRY.get(name,path,**kwargs)
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:26:05 2026
+
+Figure rendering for the small-multiple panels in bowman_data_analysis
+
+A figure is described by a FigureJob: the data slice for every panel plus the
+shared layout. Jobs can be drawn interactively with pyplot, or written to PNG
+either serially or across a process pool. Both PNG paths draw on a bare Agg
+canvas with the same code, so the files are identical whichever is used
+
+The default drawing (draw_batched) puts all the lines of a panel into one
+LineCollection. The grid of axes is kept between PNGs, so a run of jobs with
+the same layout (e.g. the well panels for each variable) only swaps the data
+of the collections and the text instead of building a new figure
+
+Every PNG is keyed by a hash of its panel data, layout, dpi and the drawing
+code (figure_key). The key is stored next to the PNG in .bowman_cache and
+render_figures skips the jobs whose PNG is already current. BOWMAN_RENDER_ALL=1
+(or force=True) draws everything again
+
+@author: spencerjordan
+"""
+
+import hashlib
+import inspect
+import os
+
+import numpy as np
+import matplotlib as mpl
+import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import FixedLocator, MaxNLocator
+
+from parallel_pool import n_workers, process_pool
+
+
+class FigureJob:
+    """
+    Everything needed to draw and save one figure
+
+    panels is a list with one dict per axes:
+        'title'  : panel title
+        'series' : list of dicts with 'x', 'y' and any ax.plot keyword arguments
+        'xlim'   : (left, right) or a dict of set_xlim keyword arguments
+        'axhline': dict of ax.axhline keyword arguments
+    layout holds what is shared by the whole figure, see draw_small_multiples.
+    draw defaults to draw_batched, pass draw_small_multiples for one
+    ax.plot per series. save=False only shows the figure, render_figures
+    never writes it
+    """
+    def __init__(self,path,panels,layout,dpi=200,draw=None,save=True):
+        self.path = path
+        self.panels = panels
+        self.layout = layout
+        self.dpi = dpi
+        self.draw = draw_batched if draw is None else draw
+        self.save = save
+
+
+def _month_locator(months):
+    if months is None:
+        return mdates.MonthLocator()
+    return mdates.MonthLocator(bymonth=months)
+
+
+def draw_small_multiples(fig,panels,layout):
+    """
+    Draw a grid of panels onto fig
+
+    layout keys:
+        'nrows','ncols'                  : panel grid
+        'suptitle','supxlabel','supylabel': dicts of keyword arguments
+        'title_kw'                       : keyword arguments for every set_title
+        'grid'                           : keyword arguments for ax.grid
+        'date_format'                    : DateFormatter string for the x-axis
+        'major_months','minor_months'    : MonthLocator months (None for every month)
+        'max_y_ticks'                    : MaxNLocator on the y-axis
+        'legend'                         : {'panel': index or 'all', ...legend kwargs}
+        'hide_last'                      : turn off the last (unused) panel
+    """
+    ax = fig.subplots(layout['nrows'],layout['ncols'],squeeze=False)
+    fig.tight_layout()
+    for key in ['suptitle','supxlabel','supylabel']:
+        if key in layout:
+            getattr(fig,key)(**layout[key])
+    axes = ax.ravel()
+    for i,panel in enumerate(panels):
+        a = axes[i]
+        for series in panel.get('series',[]):
+            kw = {k:v for k,v in series.items() if k not in ('x','y')}
+            a.plot(series['x'],series['y'],**kw)
+        if 'axhline' in panel:
+            a.axhline(**panel['axhline'])
+        if 'xlim' in panel:
+            ## Categorical axes raise when the limit is not one of the categories
+            try:
+                if isinstance(panel['xlim'],dict):
+                    a.set_xlim(**panel['xlim'])
+                else:
+                    a.set_xlim(panel['xlim'])
+            except (ValueError,KeyError,TypeError):
+                pass
+        if 'title' in panel:
+            a.set_title(panel['title'],**layout.get('title_kw',{}))
+        if 'max_y_ticks' in layout:
+            a.yaxis.set_major_locator(MaxNLocator(layout['max_y_ticks']))
+        if 'grid' in layout:
+            a.grid(**layout['grid'])
+        ## Tickmark and Label Formatting
+        if 'date_format' in layout:
+            a.xaxis.set_major_formatter(mdates.DateFormatter(layout['date_format']))
+        if 'minor_months' in layout:
+            a.xaxis.set_minor_locator(_month_locator(layout['minor_months']))
+        if 'major_months' in layout:
+            a.xaxis.set_major_locator(_month_locator(layout['major_months']))
+    legend = dict(layout.get('legend',{}))
+    if legend:
+        which = legend.pop('panel')
+        targets = axes[:len(panels)] if which == 'all' else [axes[which]]
+        for a in targets:
+            a.legend(**legend)
+    if layout.get('hide_last'):
+        axes[-1].set_title('')
+        axes[-1].axis('off')
+    return fig
+
+
+###############################################################################
+########################### Batched small multiples ###########################
+###############################################################################
+SUP_KEYS = ['suptitle','supxlabel','supylabel']
+## Series keywords a LineCollection can take, anything else (markers...) is plotted
+LINE_KEYS = {'color','c','lw','linewidth','ls','linestyle','alpha','label'}
+
+
+def layout_key(layout):
+    """
+    Everything in a layout except the text of the sup-titles
+
+    Jobs with the same key can be drawn on the same grid of axes
+    """
+    shared = {k:({kk:vv for kk,vv in v.items() if kk != 't'} if k in SUP_KEYS else v)
+              for k,v in layout.items()}
+    return repr(sorted(shared.items()))
+
+
+def _numeric_x(x):
+    """
+    x as floats (dates as Matplotlib date numbers), None for categorical x
+    """
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype,np.datetime64):
+        return mdates.date2num(x), True
+    if np.issubdtype(x.dtype,np.number):
+        return x.astype(float), False
+    return None, False
+
+
+def _segments(x,y):
+    """
+    (n x 2) pieces of a series, split at missing values like a plotted line
+    """
+    ok = np.isfinite(x) & np.isfinite(y)
+    idx = np.flatnonzero(ok)
+    if len(idx) == 0:
+        return []
+    runs = np.split(idx,np.flatnonzero(np.diff(idx) > 1)+1)
+    return [np.column_stack([x[r],y[r]]) for r in runs]
+
+
+class SmallMultiples:
+    """
+    A grid of panels drawing each panel's lines as one LineCollection
+
+    The axes, sup-titles and tick setup are made once. update() swaps the
+    data, colours and text in place, so the same layout can be drawn again
+    for another variable without rebuilding the figure. Series that a
+    LineCollection cannot draw (markers, categorical x) fall back to ax.plot
+    """
+    def __init__(self,fig,layout):
+        self.fig = fig
+        self.key = layout_key(layout)
+        ax = fig.subplots(layout['nrows'],layout['ncols'],squeeze=False)
+        fig.tight_layout()
+        self.axes = ax.ravel()
+        self.texts = {key:getattr(fig,key)(**layout[key]) for key in SUP_KEYS if key in layout}
+        self.collections = [None]*len(self.axes)
+        ## Artists redrawn on every update (fallback lines, axhlines, legends)
+        self.extras = []
+        ## False once a categorical axis was drawn, its categories would pile up
+        self.reusable = True
+        self.major = self.minor = None
+        ## Tickmark and Label Formatting, set once for every panel
+        if 'major_months' in layout:
+            self.major = _month_locator(layout['major_months'])
+        if 'minor_months' in layout:
+            self.minor = _month_locator(layout['minor_months'])
+        for a in self.axes:
+            if 'max_y_ticks' in layout:
+                a.yaxis.set_major_locator(MaxNLocator(layout['max_y_ticks']))
+            if 'grid' in layout:
+                a.grid(**layout['grid'])
+            if 'date_format' in layout:
+                a.xaxis.set_major_formatter(mdates.DateFormatter(layout['date_format']))
+            if self.minor is not None:
+                a.xaxis.set_minor_locator(_month_locator(layout['minor_months']))
+            if self.major is not None:
+                a.xaxis.set_major_locator(_month_locator(layout['major_months']))
+        if layout.get('hide_last'):
+            self.axes[-1].axis('off')
+
+    def update(self,panels,layout,fixed_ticks=False):
+        """
+        Draw panels onto the grid, replacing whatever was drawn before
+
+        fixed_ticks swaps the month locators for the tick positions of the
+        final limits, so the date rules are evaluated once per distinct
+        x-range instead of on every draw (used for the PNGs)
+        """
+        for key,text in self.texts.items():
+            text.set_text(layout[key].get('t',''))
+        for artist in self.extras:
+            artist.remove()
+        self.extras = []
+        cycle = mpl.rcParams['axes.prop_cycle'].by_key().get('color',['C0'])
+        handles = []
+        for i,a in enumerate(self.axes):
+            panel = panels[i] if i < len(panels) else {}
+            segs,colors,widths,styles,points,labels = [],[],[],[],[],[]
+            for k,series in enumerate(panel.get('series',[])):
+                kw = {key:v for key,v in series.items() if key not in ('x','y')}
+                color = kw.pop('c',kw.pop('color',cycle[k % len(cycle)]))
+                x,is_date = _numeric_x(series['x'])
+                if x is None or set(kw) - LINE_KEYS:
+                    self.reusable = self.reusable and x is not None
+                    line, = a.plot(series['x'],series['y'],color=color,**kw)
+                    self.extras.append(line)
+                    labels.append(line)
+                    continue
+                if is_date:
+                    a.xaxis.update_units(np.asarray(series['x'])[:1])
+                y = np.asarray(series['y'],dtype=float)
+                width = kw.get('lw',kw.get('linewidth',mpl.rcParams['lines.linewidth']))
+                style = kw.get('ls',kw.get('linestyle','-'))
+                pieces = _segments(x,y)
+                segs += pieces
+                colors += [to_rgba(color,kw.get('alpha'))]*len(pieces)
+                widths += [width]*len(pieces)
+                styles += [style]*len(pieces)
+                ok = np.isfinite(x) & np.isfinite(y)
+                points.append(np.column_stack([x[ok],y[ok]]))
+                ## Legend entry standing in for the collection
+                if not str(kw.get('label','_')).startswith('_'):
+                    labels.append(Line2D([],[],color=color,lw=width,ls=style,
+                                         alpha=kw.get('alpha'),label=kw['label']))
+            coll = self.collections[i]
+            if coll is None:
+                coll = LineCollection(segs,zorder=2)
+                a.add_collection(coll,autolim=False)
+                self.collections[i] = coll
+            else:
+                coll.set_segments(segs)
+            if segs:
+                coll.set_color(colors)
+                coll.set_linewidth(widths)
+                coll.set_linestyle(styles)
+            if 'axhline' in panel:
+                self.extras.append(a.axhline(**panel['axhline']))
+            ## Data limits from scratch --> the lines, then the collection
+            a.relim()
+            if points:
+                a.update_datalim(np.vstack(points))
+            a.set_autoscale_on(True)
+            a.autoscale_view()
+            if 'xlim' in panel:
+                ## Categorical axes raise when the limit is not one of the categories
+                try:
+                    if isinstance(panel['xlim'],dict):
+                        a.set_xlim(**panel['xlim'])
+                    else:
+                        a.set_xlim(panel['xlim'])
+                except (ValueError,KeyError,TypeError):
+                    pass
+            if 'title' in panel or a.get_title():
+                a.set_title(panel.get('title',''),**layout.get('title_kw',{}))
+            handles.append(labels)
+        legend = dict(layout.get('legend',{}))
+        if legend:
+            which = legend.pop('panel')
+            targets = range(len(panels)) if which == 'all' else [range(len(self.axes))[which]]
+            for t in targets:
+                a = self.axes[t]
+                leg = a.legend(handles=handles[t],**legend) if handles[t] else a.legend(**legend)
+                self.extras.append(leg)
+        if layout.get('hide_last'):
+            self.axes[-1].set_title('')
+        if fixed_ticks:
+            self._fix_ticks()
+        return self
+
+    def _fix_ticks(self):
+        """
+        Month ticks for the current x-limits as FixedLocators, shared between
+        panels with the same limits
+        """
+        ticks = {}
+        for a in self.axes:
+            lim = a.get_xlim()
+            for which,loc in (('major',self.major),('minor',self.minor)):
+                if loc is None:
+                    continue
+                if (which,lim) not in ticks:
+                    ticks[(which,lim)] = loc.tick_values(*mdates.num2date(lim))
+                getattr(a.xaxis,f'set_{which}_locator')(FixedLocator(ticks[(which,lim)]))
+
+
+def draw_batched(fig,panels,layout):
+    """
+    Same figure as draw_small_multiples, one LineCollection per panel
+    """
+    SmallMultiples(fig,layout).update(panels,layout)
+    return fig
+
+
+## Grid of the last batched job in this process, reused by the next one
+## with the same layout
+_last_grid = {}
+
+
+def _grid_for(layout):
+    key = layout_key(layout)
+    grid = _last_grid.get(key)
+    if grid is None or not grid.reusable:
+        fig = Figure(figsize=layout.get('figsize'))
+        FigureCanvasAgg(fig)
+        grid = SmallMultiples(fig,layout)
+        _last_grid.clear()
+        _last_grid[key] = grid
+    return grid
+
+
+def _render(job):
+    """
+    Draw one job on a bare Agg canvas and write the PNG
+    """
+    if job.draw is draw_batched:
+        fig = _grid_for(job.layout).update(job.panels,job.layout,fixed_ticks=True).fig
+    else:
+        fig = Figure(figsize=job.layout.get('figsize'))
+        FigureCanvasAgg(fig)
+        job.draw(fig,job.panels,job.layout)
+    folder = os.path.dirname(job.path)
+    if folder:
+        os.makedirs(folder,exist_ok=True)
+    fig.savefig(job.path,dpi=job.dpi,bbox_inches='tight')
+    return job.path
+
+
+###############################################################################
+############################### Figure cache ##################################
+###############################################################################
+## Bump to re-render every cached figure (the source of this module is hashed too)
+CACHE_VERSION = 1
+## Draw every figure even if its PNG is current
+RENDER_ALL = os.environ.get('BOWMAN_RENDER_ALL','').strip().lower() not in ('','0','false','no')
+
+_code_versions = {}
+
+
+def _code_version(draw=None):
+    """
+    Hash of this module, the Matplotlib version and the source of draw
+    """
+    name = getattr(draw,'__qualname__',repr(draw))
+    if name not in _code_versions:
+        h = hashlib.sha256(f'{CACHE_VERSION} {mpl.__version__} {name}'.encode())
+        for obj in (inspect.getmodule(_code_version),draw):
+            try:
+                h.update(inspect.getsource(obj).encode())
+            except (TypeError,OSError):
+                pass
+        _code_versions[name] = h.hexdigest()
+    return _code_versions[name]
+
+
+def _hash_value(h,value):
+    """
+    Feed a panel value (arrays, dicts, lists, scalars) into the hash h
+    """
+    if isinstance(value,dict):
+        h.update(b'{')
+        for k in sorted(value,key=str):
+            h.update(repr(k).encode())
+            _hash_value(h,value[k])
+        h.update(b'}')
+    elif isinstance(value,(list,tuple)):
+        h.update(b'[')
+        for v in value:
+            _hash_value(h,v)
+        h.update(b']')
+    elif hasattr(value,'__array__') and not np.isscalar(value):
+        arr = np.asarray(value)
+        h.update(f'{arr.dtype}{arr.shape}'.encode())
+        if arr.dtype == object:
+            h.update(repr(arr.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(arr).tobytes())
+    else:
+        h.update(repr(value).encode())
+
+
+def figure_key(*parts,draw=None):
+    """
+    Content hash of everything a figure is drawn from, plus the code version
+    """
+    h = hashlib.sha256(_code_version(draw).encode())
+    for part in parts:
+        _hash_value(h,part)
+    return h.hexdigest()
+
+
+def job_key(job):
+    return figure_key(job.panels,job.layout,job.dpi,draw=job.draw)
+
+
+def _key_path(path):
+    folder,name = os.path.split(path)
+    return os.path.join(folder,'.bowman_cache',name+'.key')
+
+
+def is_current(path,key):
+    """
+    True if the PNG at path exists and was drawn from key
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(_key_path(path)) as f:
+            return f.read().strip() == key
+    except OSError:
+        return False
+
+
+def mark_current(path,key):
+    """
+    Record that the PNG at path was drawn from key
+    """
+    key_path = _key_path(path)
+    os.makedirs(os.path.dirname(key_path),exist_ok=True)
+    with open(key_path,'w') as f:
+        f.write(key)
+
+
+def _init_worker():
+    ## Workers never need an interactive backend
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_figures(jobs,workers=None,force=None):
+    """
+    Write every job to its PNG, skipping the ones that are already current
+    and the ones with save=False
+
+    workers sets the size of the process pool (default: one per CPU).
+    workers=1 renders serially in this process. force=True (default
+    RENDER_ALL) draws all of them. Returns the paths of the saved jobs
+    """
+    jobs = [job for job in jobs if job.save]
+    force = RENDER_ALL if force is None else force
+    keys = [job_key(job) for job in jobs]
+    todo = [(job,key) for job,key in zip(jobs,keys) if force or not is_current(job.path,key)]
+    workers = min(n_workers(workers),len(todo))
+    if workers <= 1:
+        for job,_ in todo:
+            _render(job)
+    else:
+        with process_pool(workers,initializer=_init_worker) as pool:
+            list(pool.map(_render,[job for job,_ in todo]))
+    for job,key in todo:
+        mark_current(job.path,key)
+    return [job.path for job in jobs]
+
+
+def show_figure(job):
+    """
+    Draw a job into a pyplot figure for interactive use
+    """
+    import matplotlib.pyplot as plt
+    fig = plt.figure(figsize=job.layout.get('figsize'))
+    job.draw(fig,job.panels,job.layout)
+    return fig
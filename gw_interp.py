@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:40:17 2026
+
+Tools for interpolating the monitoring well data onto the MODFLOW grid
+
+@author: spencerjordan
+"""
+
+import numpy as np
+
+
+###############################################################################
+############################### Model Grid ####################################
+###############################################################################
+class RasterGrid:
+    """
+    Regular model grid defined by an affine transform and a (rows, cols) shape
+
+    The transform follows the usual (a, b, c, d, e, f) raster convention:
+        x = a*col + b*row + c
+        y = d*col + e*row + f
+    so a north-up grid with its origin at the upper left corner has
+    b = d = 0 and a negative e. Cells are numbered row by row from the top
+    left, matching the order the old shapely-box grid used.
+
+    Centroids are plain NumPy vectors computed once; polygons are only built
+    when geometry() is called
+    """
+    def __init__(self,transform,shape):
+        self.transform = tuple(float(v) for v in transform)
+        self.shape = (int(shape[0]),int(shape[1]))
+        self._xy = None
+
+    @classmethod
+    def from_bounds(cls,minx,miny,maxx,maxy,N_rows,N_cols):
+        """
+        North-up grid covering a bounding box
+        """
+        cell_width = (maxx-minx)/N_cols
+        cell_height = (maxy-miny)/N_rows
+        return cls((cell_width,0,minx,0,-cell_height,maxy),(N_rows,N_cols))
+
+    @property
+    def n_cells(self):
+        return self.shape[0]*self.shape[1]
+
+    @property
+    def bounds(self):
+        corners = self._corners()
+        return (corners[0].min(),corners[1].min(),corners[0].max(),corners[1].max())
+
+    def _corners(self):
+        a,b,c,d,e,f = self.transform
+        cols = np.array([0,self.shape[1],0,self.shape[1]])
+        rows = np.array([0,0,self.shape[0],self.shape[0]])
+        return a*cols+b*rows+c, d*cols+e*rows+f
+
+    def _cell_xy(self,col_offset,row_offset):
+        a,b,c,d,e,f = self.transform
+        rows,cols = np.indices(self.shape,dtype=float)
+        cols = cols.ravel() + col_offset
+        rows = rows.ravel() + row_offset
+        return a*cols+b*rows+c, d*cols+e*rows+f
+
+    @property
+    def xy(self):
+        """
+        (cells x 2) array of cell centroids
+        """
+        if self._xy is None:
+            x,y = self._cell_xy(0.5,0.5)
+            self._xy = np.column_stack([x,y])
+            self._xy.setflags(write=False)
+        return self._xy
+
+    @property
+    def centroid_x(self):
+        return self.xy[:,0]
+
+    @property
+    def centroid_y(self):
+        return self.xy[:,1]
+
+    def reshape(self,values):
+        """
+        Reshape a flat (cells,) or (dates x cells) array onto the grid
+        """
+        values = np.asarray(values)
+        return values.reshape(values.shape[:-1]+self.shape)
+
+    def cell_index(self,x,y):
+        """
+        Flat index of the cell holding each point, -1 if outside the grid
+        """
+        a,b,c,d,e,f = self.transform
+        det = a*e - b*d
+        x = np.asarray(x,dtype=float) - c
+        y = np.asarray(y,dtype=float) - f
+        col = np.floor((e*x - b*y)/det).astype(int)
+        row = np.floor((-d*x + a*y)/det).astype(int)
+        inside = (row >= 0) & (row < self.shape[0]) & (col >= 0) & (col < self.shape[1])
+        return np.where(inside,row*self.shape[1]+col,-1)
+
+    def geometry(self,crs=None):
+        """
+        Build the cell polygons as a GeoDataFrame (only when geometry is needed)
+        """
+        import geopandas as gpd
+        import shapely
+        ## Corners of every cell, going around the polygon
+        corners = [self._cell_xy(0,0),self._cell_xy(1,0),
+                   self._cell_xy(1,1),self._cell_xy(0,1)]
+        rings = np.stack([np.column_stack(c) for c in corners],axis=1)
+        return gpd.GeoDataFrame(geometry=shapely.polygons(rings),crs=crs)
+
+
+###############################################################################
+####################### Fixed-geometry interpolation ##########################
+###############################################################################
+def _rescale(points,xi):
+    """
+    Same rescaling griddata does with rescale=True
+    """
+    offset = np.nanmean(points,axis=0)
+    scale = np.nanmax(points,axis=0) - np.nanmin(points,axis=0)
+    scale[scale == 0] = 1
+    return (points-offset)/scale, (xi-offset)/scale
+
+
+class WellInterpolator:
+    """
+    griddata-style interpolation from fixed well locations onto fixed targets
+
+    The triangulation and the point location are done once in __init__ and
+    stored as a (cells x wells) weight matrix, so interpolating any number of
+    sampling dates is one matrix product on a (wells x dates) value matrix.
+
+    'linear' and 'nearest' weights are sparse (3 and 1 nonzeros per cell).
+    'cubic' pushes each well's unit vector through a Clough-Tocher
+    interpolator built on the cached triangulation; Clough-Tocher is linear in
+    the data values, so the resulting dense matrix reproduces it (to the
+    tolerance of its gradient estimate) for any values. Cells outside the
+    convex hull are NaN for 'linear' and 'cubic', as with griddata
+    """
+    def __init__(self,points,xi,method='linear',rescale=True):
+        from scipy.spatial import Delaunay
+        import scipy.sparse as sp
+        points = np.asarray(points,dtype=float)
+        xi = np.asarray(xi,dtype=float)
+        if rescale:
+            points,xi = _rescale(points,xi)
+        self.method = method
+        n_cells,n_wells = len(xi),len(points)
+        self.shape = (n_cells,n_wells)
+        if method == 'nearest':
+            from scipy.spatial import cKDTree
+            _,nearest = cKDTree(points).query(xi)
+            self.weights = sp.csr_matrix((np.ones(n_cells),(np.arange(n_cells),nearest)),
+                                         shape=self.shape)
+            self.outside = np.zeros(n_cells,dtype=bool)
+            return
+        self.tri = Delaunay(points)
+        simplex = self.tri.find_simplex(xi)
+        self.outside = simplex < 0
+        if method == 'linear':
+            ## Barycentric coordinates from the affine transform of each simplex
+            T = self.tri.transform[simplex]
+            bary = np.einsum('nij,nj->ni',T[:,:2],xi-T[:,2])
+            bary = np.column_stack([bary,1-bary.sum(axis=1)])
+            bary[self.outside] = 0
+            rows = np.repeat(np.arange(n_cells),3)
+            cols = self.tri.simplices[simplex].ravel()
+            self.weights = sp.csr_matrix((bary.ravel(),(rows,cols)),shape=self.shape)
+            self.weights.eliminate_zeros()
+        elif method == 'cubic':
+            from scipy.interpolate import CloughTocher2DInterpolator
+            self.weights = CloughTocher2DInterpolator(self.tri,np.eye(n_wells),
+                                                      fill_value=0)(xi)
+        else:
+            raise ValueError(f'Unknown interpolation method: {method}')
+
+    def __call__(self,values):
+        """
+        Interpolate (wells,) or (wells x dates) values onto every target point
+        """
+        values = np.asarray(values,dtype=float)
+        Z = self.weights @ values
+        Z[self.outside] = np.nan
+        return Z
+
+
+###############################################################################
+################################# Kriging #####################################
+###############################################################################
+## Variogram models with the same parameterization as skgstat:
+## effective range r, sill c0 and nugget b
+def spherical(h,r,c0,b=0):
+    h = np.minimum(np.asarray(h,dtype=float)/r,1)
+    return b + c0*(1.5*h - 0.5*h**3)
+
+def exponential(h,r,c0,b=0):
+    return b + c0*(1 - np.exp(-np.asarray(h,dtype=float)/(r/3)))
+
+def gaussian(h,r,c0,b=0):
+    return b + c0*(1 - np.exp(-(np.asarray(h,dtype=float)/(r/2))**2))
+
+def linear(h,r,c0,b=0):
+    return b + c0*np.minimum(np.asarray(h,dtype=float)/r,1)
+
+VARIOGRAM_MODELS = {'spherical':spherical,
+                    'exponential':exponential,
+                    'gaussian':gaussian,
+                    'linear':linear}
+
+
+def _distances(a,b):
+    return np.sqrt(((a[:,None,:]-b[None,:,:])**2).sum(axis=-1))
+
+
+def _semivariance(gamma,h,params):
+    ## The nugget is a jump away from zero lag, coincident points have gamma = 0
+    return np.where(h > 0,gamma(h,*params),0)
+
+
+def empirical_variogram(points,values,n_lags=10,maxlag=None):
+    """
+    Binned semivariance of (wells,) or (wells x dates) values
+
+    With several dates the squared differences of every date are pooled into
+    the same lag bins, giving one variogram for the whole record
+    """
+    points = np.asarray(points,dtype=float)
+    values = np.asarray(values,dtype=float)
+    if values.ndim == 1:
+        values = values[:,None]
+    i,j = np.triu_indices(len(points),1)
+    d = np.sqrt(((points[i]-points[j])**2).sum(axis=1))
+    if maxlag is None:
+        maxlag = d.max()
+    sq = 0.5*(values[i]-values[j])**2
+    ## Pool every date's pairs (NaN where a well was not sampled)
+    d = np.repeat(d,sq.shape[1])
+    sq = sq.ravel()
+    keep = ~np.isnan(sq) & (d <= maxlag)
+    d,sq = d[keep],sq[keep]
+    edges = np.linspace(0,maxlag,n_lags+1)
+    bins = np.clip(np.digitize(d,edges)-1,0,n_lags-1)
+    count = np.bincount(bins,minlength=n_lags)
+    lags = np.bincount(bins,weights=d,minlength=n_lags)
+    gamma = np.bincount(bins,weights=sq,minlength=n_lags)
+    full = count > 0
+    return lags[full]/count[full], gamma[full]/count[full]
+
+
+def fit_variogram(points,values,model='gaussian',n_lags=10,maxlag=None):
+    """
+    Least-squares fit of a variogram model, returns (range, sill, nugget)
+    """
+    from scipy.optimize import curve_fit
+    lags,gamma = empirical_variogram(points,values,n_lags=n_lags,maxlag=maxlag)
+    ## Range limited to the largest lag, sill and nugget to the largest semivariance
+    upper = [lags.max(),gamma.max(),gamma.max()]
+    p0 = [0.5*upper[0],0.5*upper[1],0]
+    params,_ = curve_fit(VARIOGRAM_MODELS[model],lags,gamma,p0=p0,
+                         bounds=([1e-9,0,0],upper))
+    return tuple(params)
+
+
+class KrigingEngine:
+    """
+    Ordinary kriging with the well geometry and variogram held fixed
+
+    The (wells+1) kriging system is LU-factorized once and solved for every
+    target point in chunks, giving a cached (cells x wells) weight matrix and
+    the kriging variance. Surfaces for any number of dates then come from one
+    matrix product with a (wells x dates) value matrix. All wells are used for
+    every cell (no search neighbourhood). params is the variogram (range,
+    sill, nugget), KrigingEngine.fit fits it to the well values
+    """
+    def __init__(self,points,xi,params,model='gaussian',chunk=100000):
+        from scipy.linalg import lu_factor, lu_solve
+        self.points = np.asarray(points,dtype=float)
+        xi = np.asarray(xi,dtype=float)
+        self.model = model
+        self.params = tuple(params)
+        gamma = VARIOGRAM_MODELS[model]
+        n = len(self.points)
+        ## Semivariance between wells, bordered for the unbiasedness constraint
+        A = np.ones((n+1,n+1))
+        A[:n,:n] = _semivariance(gamma,_distances(self.points,self.points),self.params)
+        A[n,n] = 0
+        lu = lu_factor(A)
+        self.weights = np.empty((len(xi),n))
+        self.variance = np.empty(len(xi))
+        for start in range(0,len(xi),chunk):
+            stop = start+chunk
+            b = np.ones((n+1,len(xi[start:stop])))
+            b[:n] = _semivariance(gamma,_distances(self.points,xi[start:stop]),self.params)
+            sol = lu_solve(lu,b)
+            self.weights[start:stop] = sol[:n].T
+            ## sigma^2 = sum(lambda_i * gamma_i0) + mu
+            self.variance[start:stop] = (sol*b).sum(axis=0)
+
+    @classmethod
+    def fit(cls,points,xi,values,model='gaussian',n_lags=10,maxlag=None,**kwargs):
+        """
+        Engine with one variogram fitted to all dates of (wells x dates) values
+        """
+        params = fit_variogram(points,values,model=model,n_lags=n_lags,maxlag=maxlag)
+        return cls(points,xi,model=model,params=params,**kwargs)
+
+    def __call__(self,values):
+        """
+        Krige (wells,) or (wells x dates) values onto every target point
+        """
+        return self.weights @ np.asarray(values,dtype=float)
+
+
+###############################################################################
+###################### Per-date kriging across processes ######################
+###############################################################################
+## Arrays attached from shared memory in each worker
+_shared = {}
+
+
+def _share(array):
+    """
+    Copy an array into a new shared memory block
+    """
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(create=True,size=max(array.nbytes,1))
+    view = np.ndarray(array.shape,dtype=array.dtype,buffer=shm.buf)
+    view[...] = array
+    return shm,(shm.name,array.shape,array.dtype.str)
+
+
+def _attach(specs):
+    """
+    Pool initializer --> map the shared blocks once per worker
+    """
+    from multiprocessing import shared_memory, util
+    for key,(name,shape,dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _shared[key] = (shm,np.ndarray(shape,dtype=dtype,buffer=shm.buf))
+    ## Close the blocks when the worker exits, the parent unlinks them
+    util.Finalize(None,_detach,exitpriority=10)
+
+
+def _detach():
+    """
+    Drop the views of the shared blocks and close them
+    """
+    blocks = [shm for shm,_ in _shared.values() if shm is not None]
+    _shared.clear()
+    for shm in blocks:
+        shm.close()
+
+
+def _krige_date(k,model='gaussian',n_lags=10,maxlag=None,chunk=100000):
+    """
+    Fit date k's variogram and write its kriged surface into row k of the output
+    """
+    points = _shared['points'][1]
+    xi = _shared['xi'][1]
+    values = _shared['values'][1][:,k]
+    out = _shared['out'][1]
+    ## Only the wells sampled on this date
+    sampled = ~np.isnan(values)
+    params = fit_variogram(points[sampled],values[sampled],model=model,
+                           n_lags=n_lags,maxlag=maxlag)
+    engine = KrigingEngine(points[sampled],xi,model=model,params=params,chunk=chunk)
+    out[k] = engine(values[sampled])
+    return params
+
+
+def krige_dates(points,xi,values,model='gaussian',workers=None,n_lags=10,
+                maxlag=None,chunk=100000):
+    """
+    Krige every date with its own fitted variogram
+
+    values is a (wells x dates) matrix. Each date's variogram fit and kriging
+    runs as one task on a process pool. The grid centroids, well coordinates
+    and values are put in shared memory once instead of being pickled per task,
+    and the workers write straight into a preallocated (dates x cells) array.
+    workers=1 runs in this process. Returns the surfaces and the fitted
+    (range, sill, nugget) of every date
+    """
+    from functools import partial
+    from parallel_pool import n_workers, process_pool
+    arrays = {'points':np.ascontiguousarray(points,dtype=float),
+              'xi':np.ascontiguousarray(xi,dtype=float),
+              'values':np.ascontiguousarray(values,dtype=float)}
+    n_dates = arrays['values'].shape[1]
+    arrays['out'] = np.zeros((n_dates,len(arrays['xi'])))
+    task = partial(_krige_date,model=model,n_lags=n_lags,maxlag=maxlag,chunk=chunk)
+    workers = min(n_workers(workers),n_dates)
+    if workers <= 1:
+        _shared.update({key:(None,val) for key,val in arrays.items()})
+        try:
+            params = [task(k) for k in range(n_dates)]
+            return arrays['out'],params
+        finally:
+            _shared.clear()
+    blocks,specs = [],{}
+    try:
+        for key,val in arrays.items():
+            shm,specs[key] = _share(val)
+            blocks.append(shm)
+        with process_pool(workers,initializer=_attach,initargs=(specs,)) as pool:
+            params = list(pool.map(task,range(n_dates)))
+        out = np.ndarray(arrays['out'].shape,buffer=blocks[-1].buf).copy()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    return out,params
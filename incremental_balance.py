@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:31:08 2026
+
+Incremental water balance, ΔS and recharge for nightly updates
+
+The derived state is kept on disk next to the mass balance sheet:
+    - monthly block sums of water in, precip and ET (balance for the ET
+      multiplier and its cumulative sum follow from these)
+    - per survey and site sums and counts of water content x thickness
+      (storage, site/block ΔS follow from these)
+    - spline fits of the recharge in overlapping day windows
+Both CSVs are only ever appended to, so an update reads the bytes past the
+stored offset, adds the new rows to the sums, and refits only the windows
+that hold an affected month or survey. Anything that is not a plain append
+(rewritten rows, a new header, other settings) rebuilds from scratch
+
+The windowed fits are local, so the recharge is close to but not the same as
+the single spline over the whole record in recharge_ensemble.block_recharge
+
+@author: spencerjordan
+"""
+
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from balance_engine import BLOCK_CONFIG, row_terms, month_codes
+from probe_storage import (DEPTH_DICT, SITE_DICT, SITE_FALLBACK, clean_probe_data,
+                           block_matrix, block_change, diff_available)
+from recharge_ensemble import spline_recharge, monthly_mean
+
+## Bump when the stored state changes meaning so old state gets rebuilt
+STATE_VERSION = 1
+## Bytes hashed per read when checking the rows before the stored offset
+HASH_CHUNK = 1<<20
+
+
+###############################################################################
+########################## Appended CSV rows ##################################
+###############################################################################
+def _prefix_hash(f,offset):
+    """
+    sha256 of the first offset bytes of the open file f, left at offset
+    """
+    h = hashlib.sha256()
+    f.seek(0)
+    left = offset
+    while left > 0:
+        chunk = f.read(min(HASH_CHUNK,left))
+        if not chunk:
+            break
+        h.update(chunk)
+        left -= len(chunk)
+    return h
+
+
+def read_appended(path,key=None,skiprows=0):
+    """
+    Rows added to a CSV since key was taken, and the new key
+
+    key holds the header, the byte offset of the end of the last full line
+    read and a hash of every byte before it, so a change to any earlier row
+    is caught. Returns (rows, key, appended), where appended is False (and
+    rows is every row) when the file is not an append of what key describes
+    """
+    size = os.path.getsize(path)
+    with open(path,'rb') as f:
+        head = [f.readline() for _ in range(skiprows+1)]
+        data_start = f.tell()
+        header = head[-1].decode()
+        appended = False
+        if key is not None and key['header'] == header and key['offset'] <= size:
+            h = _prefix_hash(f,key['offset'])
+            appended = h.hexdigest() == key.get('prefix')
+        start = key['offset'] if appended else data_start
+        if not appended:
+            h = _prefix_hash(f,data_start)
+        f.seek(start)
+        raw = f.read()
+    ## A last line without its newline is read again next time
+    raw = raw[:raw.rfind(b'\n') + 1]
+    ## The new key hashes everything up to the new offset
+    h.update(raw)
+    text = raw.decode()
+    offset = start + len(raw)
+    rows = pd.read_csv(io.StringIO(header + text)) if text.strip() else None
+    new_key = {'header':header,'offset':offset,'prefix':h.hexdigest(),'size':size}
+    return rows,new_key,appended
+
+
+###############################################################################
+########################### Incremental state #################################
+###############################################################################
+def _month_number(dates):
+    dates = pd.DatetimeIndex(dates)
+    return dates.year.values*12 + dates.month.values - 1
+
+
+def _grow(arr,n_before,n_after,fill=0.0):
+    """
+    Pad arr along axis 0 with n_before rows in front and n_after behind
+    """
+    pad = [(n_before,n_after)] + [(0,0)]*(arr.ndim - 1)
+    return np.pad(arr,pad,constant_values=fill)
+
+
+class IncrementalBalance:
+    """
+    Monthly balances, ΔS and recharge kept up to date from appended rows
+
+    sheet_path is massBalanceMainData and np_path the neutron probe CSV.
+    Call update() after new rows land. ET_mult is applied to the sheet ET,
+    window_days/overlap_days set the local spline windows. The state lives in
+    cache_dir (default .bowman_cache next to the sheet)
+    """
+    def __init__(self,sheet_path,np_path,ET_mult=0.92,config=BLOCK_CONFIG,
+                 depth_dict=DEPTH_DICT,site_dict=SITE_DICT,fallback=SITE_FALLBACK,
+                 start='09/01/2012',window_days=730,overlap_days=180,cache_dir=None,
+                 sheet_skiprows=1):
+        self.sheet_path = os.path.expanduser(sheet_path)
+        self.np_path = os.path.expanduser(np_path)
+        self.ET_mult = ET_mult
+        self.config = config
+        self.depth_dict = depth_dict
+        self.site_dict = site_dict
+        self.fallback = fallback
+        self.start = pd.to_datetime(start,format='%m/%d/%Y')
+        self.window_days = window_days
+        self.overlap_days = overlap_days
+        self.sheet_skiprows = sheet_skiprows
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(self.sheet_path),'.bowman_cache')
+        base = os.path.join(cache_dir,os.path.basename(self.sheet_path)+'.incremental')
+        self.state_path = base+'.npz'
+        self.key_path = base+'.json'
+        self._reset()
+
+    def _settings(self):
+        """
+        Everything the state depends on besides the data
+        """
+        return json.dumps({'version':STATE_VERSION,'ET_mult':self.ET_mult,
+                           'config':self.config,'depth_dict':self.depth_dict,
+                           'site_dict':self.site_dict,'fallback':self.fallback,
+                           'start':str(self.start),'window':self.window_days,
+                           'overlap':self.overlap_days},sort_keys=True,default=str)
+
+    def _reset(self):
+        nb = len(self.config['blocks'])
+        self.month0 = None
+        self.water_in = np.zeros((0,nb))
+        self.precip = np.zeros((0,nb))
+        self.ET = np.zeros((0,nb))
+        self.seasons = np.zeros(0)
+        self.surveys = np.zeros(0,dtype='datetime64[ns]')
+        self.sites = []
+        self.sums = np.zeros((0,0))
+        self.counts = np.zeros((0,0))
+        self.fits = {}
+        self.refit = []
+        self.keys = {'sheet':None,'np':None}
+
+    ###########################################################################
+    ######## Disk state
+    ###########################################################################
+    def load(self):
+        """
+        Read the stored state, returns False if there is none for these settings
+        """
+        try:
+            with open(self.key_path) as f:
+                key = json.load(f)
+            state = np.load(self.state_path)
+        except (OSError,ValueError):
+            return False
+        if key.get('settings') != self._settings():
+            return False
+        self.keys = key['files']
+        self.month0 = key['month0']
+        for name in ['water_in','precip','ET','seasons','surveys','sums','counts']:
+            setattr(self,name,state[name])
+        self.sites = list(state['sites'])
+        self.fits = {(int(lo),int(hi)):state[f'fit_{lo}_{hi}']
+                     for lo,hi in state['windows']}
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path),exist_ok=True)
+        arrays = {name:getattr(self,name) for name in
+                  ['water_in','precip','ET','seasons','surveys','sums','counts']}
+        arrays['sites'] = np.array(self.sites,dtype=str)
+        arrays['windows'] = np.array(sorted(self.fits),dtype=int).reshape(-1,2)
+        for (lo,hi),fit in self.fits.items():
+            arrays[f'fit_{lo}_{hi}'] = fit
+        ## Write next to the old file and swap, so a crash never leaves half a state
+        tmp = self.state_path+'.tmp.npz'
+        np.savez(tmp,**arrays)
+        os.replace(tmp,self.state_path)
+        with open(self.key_path,'w') as f:
+            json.dump({'settings':self._settings(),'files':self.keys,
+                       'month0':self.month0},f)
+
+    ###########################################################################
+    ######## Adding rows
+    ###########################################################################
+    def _add_sheet_rows(self,rows):
+        """
+        Add sheet rows to the monthly sums, returns the first month touched
+        """
+        dates = pd.to_datetime(rows['Date'])
+        keep = (dates >= self.start).values
+        if not keep.any():
+            return None
+        rows = rows.loc[keep]
+        months = _month_number(dates[keep])
+        water_in,precip,ET = row_terms(rows,self.config)
+        lo,hi = months.min(),months.max()
+        if self.month0 is None:
+            self.month0 = int(lo)
+        n_before = max(self.month0 - lo,0)
+        n_after = max(hi - (self.month0 + len(self.seasons) - 1),0)
+        if n_before or n_after:
+            for name in ['water_in','precip','ET']:
+                setattr(self,name,_grow(getattr(self,name),n_before,n_after))
+            self.seasons = _grow(self.seasons,n_before,n_after,np.nan)
+            self.month0 = int(self.month0 - n_before)
+        codes = months - self.month0
+        n = len(self.seasons)
+        for name,vals in [('water_in',water_in),('precip',precip),('ET',ET)]:
+            total = getattr(self,name)
+            for b in range(total.shape[1]):
+                total[:,b] += np.bincount(codes,weights=vals[:,b],minlength=n)
+        np.fmax.at(self.seasons,codes,rows[self.config['season_col']].to_numpy(dtype=float))
+        return int(lo)
+
+    def _add_probe_rows(self,rows):
+        """
+        Add probe readings to the survey sums, returns the first survey touched
+        """
+        rows = clean_probe_data(rows)
+        rows = rows[rows['Depth'].isin(list(self.depth_dict))]
+        value = rows['water content']*rows['Depth'].map(self.depth_dict)
+        rows = rows.assign(value=value)[value.notna()]
+        if len(rows) == 0:
+            return None
+        grouped = rows.groupby(['date','Site'])['value']
+        sums = grouped.sum().unstack()
+        counts = grouped.count().unstack()
+        surveys = np.union1d(self.surveys,sums.index.values.astype('datetime64[ns]'))
+        sites = sorted(set(self.sites) | set(sums.columns))
+        old = pd.DataFrame(self.sums,index=self.surveys,columns=self.sites)
+        old_n = pd.DataFrame(self.counts,index=self.surveys,columns=self.sites)
+        self.sums = (old.reindex(index=surveys,columns=sites,fill_value=0.0) +
+                     sums.reindex(index=surveys,columns=sites).fillna(0.0)).values
+        self.counts = (old_n.reindex(index=surveys,columns=sites,fill_value=0) +
+                       counts.reindex(index=surveys,columns=sites).fillna(0)).values
+        self.surveys = surveys
+        self.sites = sites
+        return sums.index.min()
+
+    ###########################################################################
+    ######## Derived series
+    ###########################################################################
+    @property
+    def months(self):
+        """
+        Month-end labels of the monthly sums
+        """
+        if self.month0 is None:
+            return pd.DatetimeIndex([])
+        first = pd.Period(year=self.month0//12,month=self.month0 % 12 + 1,freq='M')
+        periods = pd.period_range(first,periods=len(self.seasons),freq='M')
+        return periods.to_timestamp(how='end').normalize()
+
+    def monthly_balance(self):
+        """
+        (month x block) balance with the ET multiplier
+        """
+        return pd.DataFrame(self.water_in - self.ET_mult*self.ET,index=self.months,
+                            columns=self.config['blocks'])
+
+    def cumulative(self):
+        return self.monthly_balance().cumsum()
+
+    def site_storage(self):
+        with np.errstate(invalid='ignore',divide='ignore'):
+            return np.where(self.counts > 0,self.sums/self.counts,np.nan)
+
+    def storage_change(self):
+        """
+        (survey x block) ΔS, missing where a block's site was not read
+        """
+        M = block_matrix(self.sites,self.config['blocks'],self.site_dict,self.fallback)
+        dS = block_change(diff_available(self.site_storage()),M)
+        return pd.DataFrame(dS,index=pd.DatetimeIndex(self.surveys,name='date'),
+                            columns=self.config['blocks'])
+
+    def _origin(self):
+        return pd.Timestamp(self.surveys[0])
+
+    def _series(self):
+        """
+        Day offsets and values of the mass balance and ΔS fed to the splines
+        """
+        origin = self._origin()
+        balance = self.monthly_balance()
+        x_mb = ((balance.index - origin).days).values
+        use = x_mb > 0
+        dS = self.storage_change().fillna(0)
+        x_np = ((dS.index - origin).days).values
+        return x_mb[use],balance.values[use],x_np,dS.values
+
+    def _windows(self,end):
+        """
+        Overlapping (lo, hi) day windows covering 0..end. The regular windows
+        stay put as the record grows, only the last one follows the end
+        """
+        if end <= self.window_days:
+            return [(0,int(end))]
+        step = self.window_days - self.overlap_days
+        windows = [(lo,lo+self.window_days) for lo in range(0,end - self.window_days,step)]
+        windows.append((int(end - self.window_days),int(end)))
+        return windows
+
+    def _fit_windows(self,first_changed):
+        """
+        Refit the windows that reach the first changed day, keep the rest
+        """
+        x_mb,mb,x_np,dS = self._series()
+        end = max(x_mb.max(),x_np.max())
+        windows = self._windows(end)
+        fits = {}
+        for lo,hi in windows:
+            if (lo,hi) in self.fits and hi < first_changed:
+                fits[(lo,hi)] = self.fits[(lo,hi)]
+                continue
+            sel_mb = (x_mb >= lo) & (x_mb <= hi)
+            sel_np = (x_np >= lo) & (x_np <= hi)
+            if sel_mb.sum() < 4 or sel_np.sum() < 4:
+                raise ValueError(f'Fewer than 4 points in the {lo}-{hi} day window, '
+                                 'increase window_days')
+            xs = np.arange(lo,hi+1,dtype=float)
+            fits[(lo,hi)] = spline_recharge(x_mb[sel_mb],mb[sel_mb],x_np[sel_np],
+                                            dS[sel_np],xs)
+        self.refit = [w for w in windows if w not in self.fits or w[1] >= first_changed]
+        self.fits = fits
+
+    def daily_recharge(self):
+        """
+        (day x block) recharge from the window fits, blended linearly across overlaps
+        """
+        windows = sorted(self.fits)
+        end = windows[-1][1]
+        days = np.arange(end+1)
+        total = np.zeros((end+1,len(self.config['blocks'])))
+        weight = np.zeros(end+1)
+        for i,(lo,hi) in enumerate(windows):
+            x = days[lo:hi+1]
+            w = np.ones(len(x))
+            if i > 0:
+                w = np.minimum(w,(x - lo + 1)/(self.overlap_days + 1))
+            if i < len(windows) - 1:
+                w = np.minimum(w,(hi - x + 1)/(self.overlap_days + 1))
+            total[lo:hi+1] += w[:,None]*self.fits[(lo,hi)]
+            weight[lo:hi+1] += w
+        index = self._origin() + pd.to_timedelta(days,unit='D')
+        return pd.DataFrame(total/weight[:,None],index=index,columns=self.config['blocks'])
+
+    def recharge(self):
+        """
+        (month x block) mean recharge
+        """
+        daily = self.daily_recharge()
+        codes,months = month_codes(daily.index)
+        return pd.DataFrame(monthly_mean(daily.values,codes,len(months)),index=months,
+                            columns=daily.columns)
+
+    ###########################################################################
+    ######## Update
+    ###########################################################################
+    def update(self,rebuild=False):
+        """
+        Bring the state up to date with both CSVs and save it
+
+        Sets self.refit to the windows that were refitted
+        """
+        loaded = not rebuild and self.load()
+        if not loaded:
+            self._reset()
+        sheet_rows,sheet_key,sheet_append = read_appended(self.sheet_path,self.keys['sheet'],
+                                                          skiprows=self.sheet_skiprows)
+        np_rows,np_key,np_append = read_appended(self.np_path,self.keys['np'])
+        if loaded and not (sheet_append and np_append):
+            ## Not a plain append of both files --> start over from every row
+            return self.update(rebuild=True)
+        origin = self.surveys[0] if len(self.surveys) else None
+        changed = []
+        if sheet_rows is not None:
+            month = self._add_sheet_rows(sheet_rows)
+            if month is not None:
+                changed.append(self.months[month - self.month0])
+        if np_rows is not None:
+            survey = self._add_probe_rows(np_rows)
+            if survey is not None:
+                changed.append(pd.Timestamp(survey))
+        self.keys = {'sheet':sheet_key,'np':np_key}
+        self.refit = []
+        if changed and len(self.surveys) and self.month0 is not None:
+            ## The windows are in days from the first survey, an earlier survey
+            ## moves every window
+            if origin is None or self.surveys[0] != origin:
+                self.fits = {}
+            self._fit_windows((min(changed) - self._origin()).days)
+        self.save()
+        return self
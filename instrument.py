@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:40:18 2026
+
+Opt-in stage instrumentation for the analysis scripts
+
+The hot stages of the scripts are wrapped in
+
+    with stage('load','pore water') as s:
+        pw_data = load_pore_water(...)
+        s.count(pw_data)
+
+When instrumentation is off (the default) stage() hands back one shared
+do-nothing context, so the wrapped code runs as before. When it is on, every
+stage records its wall time, CPU time, peak traced memory (tracemalloc) and
+row count. Stages can be nested; the peak memory of a stage includes its
+children. The records come out as a text table (report) and as a Chrome
+trace JSON (write_trace, open in chrome://tracing or Perfetto).
+
+Turn it on with enable(), or for a whole run with the environment variable
+BOWMAN_PROFILE:
+    BOWMAN_PROFILE=1       wall, CPU and memory
+    BOWMAN_PROFILE=time    wall and CPU only (tracemalloc slows Python code down)
+The table is printed when the run exits, and the trace is written to
+BOWMAN_TRACE if that is set
+
+@author: spencerjordan
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class _NullStage:
+    """
+    Stage used when instrumentation is off
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        return False
+
+    def count(self,rows):
+        pass
+
+
+_NULL = _NullStage()
+
+
+class Stage:
+    """
+    One timed stage, see stage()
+    """
+    def __init__(self,recorder,cat,name,rows=None):
+        self.recorder = recorder
+        self.cat = cat
+        self.name = name
+        self.rows = rows
+        self.peak = None
+        ## Highest peak of any child stage, they reset the tracemalloc peak
+        self._child_peak = 0
+
+    def count(self,rows):
+        """
+        Row count of the stage, from a number or anything with a len()
+        """
+        self.rows = len(rows) if hasattr(rows,'__len__') else int(rows)
+
+    def __enter__(self):
+        rec = self.recorder
+        self.depth = len(rec.stack)
+        if rec.memory:
+            current,peak = tracemalloc.get_traced_memory()
+            if rec.stack:
+                parent = rec.stack[-1]
+                parent._child_peak = max(parent._child_peak,peak)
+            self._mem0 = current
+            tracemalloc.reset_peak()
+        rec.stack.append(self)
+        self.start = time.perf_counter()
+        self._cpu0 = time.process_time()
+        return self
+
+    def __exit__(self,*exc):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.process_time() - self._cpu0
+        rec = self.recorder
+        rec.stack.pop()
+        if rec.memory:
+            peak = max(tracemalloc.get_traced_memory()[1],self._child_peak)
+            self.peak = peak - self._mem0
+            ## The parent sees this stage's peak too
+            if rec.stack:
+                parent = rec.stack[-1]
+                parent._child_peak = max(parent._child_peak,peak)
+        rec.records.append(self)
+        return False
+
+
+class Recorder:
+    """
+    Collects the finished stages of one run
+    """
+    def __init__(self,memory=True):
+        self.memory = memory
+        self.records = []
+        self.stack = []
+        self.t0 = time.perf_counter()
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+
+
+_recorder = None
+
+
+def enable(memory=True):
+    """
+    Start recording stages (memory=False skips tracemalloc)
+    """
+    global _recorder
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _recorder = Recorder(memory=memory)
+    return _recorder
+
+
+def disable():
+    """
+    Stop recording and return the records collected so far
+    """
+    global _recorder
+    records = [] if _recorder is None else _recorder.records
+    if _recorder is not None and _recorder.memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _recorder = None
+    return records
+
+
+def enabled():
+    return _recorder is not None
+
+
+def stage(cat,name=None,rows=None):
+    """
+    Context manager timing one stage of a script, e.g. stage('load','pore water')
+
+    cat groups the stages (load, clean, balance, Kc, spline, interpolation,
+    render) and name says which one it is
+    """
+    if _recorder is None:
+        return _NULL
+    return Stage(_recorder,cat,name or cat,rows)
+
+
+def records():
+    return [] if _recorder is None else list(_recorder.records)
+
+
+def report(recs=None):
+    """
+    Text table of the recorded stages in the order they started, nested
+    stages indented
+    """
+    recs = sorted(records() if recs is None else recs,key=lambda r: r.start)
+    lines = [f"{'stage':44s}{'wall [s]':>10}{'cpu [s]':>10}{'peak [MB]':>11}{'rows':>10}"]
+    for r in recs:
+        label = r.cat if r.name == r.cat else f'{r.cat}: {r.name}'
+        label = '  '*r.depth + label
+        peak = '' if r.peak is None else f'{r.peak/2**20:.1f}'
+        rows = '' if r.rows is None else str(r.rows)
+        lines.append(f'{label[:44]:44s}{r.wall:10.3f}{r.cpu:10.3f}{peak:>11}{rows:>10}')
+    return '\n'.join(lines)
+
+
+def trace_events(recs=None):
+    """
+    The stages as Chrome trace complete ('X') events, times in microseconds
+    """
+    if recs is None:
+        recs = records()
+    t0 = _recorder.t0 if _recorder is not None else min((r.start for r in recs),default=0)
+    events = []
+    for r in recs:
+        args = {'cpu_s':round(r.cpu,6)}
+        if r.peak is not None:
+            args['peak_bytes'] = r.peak
+        if r.rows is not None:
+            args['rows'] = r.rows
+        events.append({'name':r.name,'cat':r.cat,'ph':'X',
+                       'ts':(r.start - t0)*1e6,'dur':r.wall*1e6,
+                       'pid':r.recorder.pid,'tid':r.recorder.tid,'args':args})
+    return events
+
+
+def write_trace(path,recs=None):
+    """
+    Write the stages to a Chrome trace JSON file
+    """
+    with open(os.path.expanduser(path),'w') as f:
+        json.dump({'traceEvents':trace_events(recs),'displayTimeUnit':'ms'},f)
+    return path
+
+
+def _report_at_exit():
+    if _recorder is None or not _recorder.records:
+        return
+    print(report())
+    if os.environ.get('BOWMAN_TRACE'):
+        print(f"Trace written to {write_trace(os.environ['BOWMAN_TRACE'])}")
+
+
+## Opt in for a whole run from the environment
+if os.environ.get('BOWMAN_PROFILE','').strip().lower() not in ('','0','false','no'):
+    enable(memory=os.environ['BOWMAN_PROFILE'].strip().lower() != 'time')
+    atexit.register(_report_at_exit)
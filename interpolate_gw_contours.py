@@ -11,12 +11,15 @@ Look into
 import pandas as pd
 import numpy as np
 import geopandas as gpd
-from scipy.interpolate import griddata
-from shapely.geometry import box
 import matplotlib.pyplot as plt
+from gw_interp import RasterGrid, WellInterpolator, KrigingEngine, krige_dates
+from instrument import stage
+from parallel_pool import script_workers
 
 
-mw_coordinates = pd.read_csv('/Users/spencerjordan/Documents/Hydrus/mw_coordinates.csv')
+with stage('load','well coordinates') as s:
+    mw_coordinates = pd.read_csv('/Users/spencerjordan/Documents/Hydrus/mw_coordinates.csv')
+    s.count(mw_coordinates)
 mw_coordinates['MW#'] = np.arange(1,21)
 mw_coordinates[['x','y','z']] = mw_coordinates[['x','y','z']]*0.3048
 ## Create spatial data out of mw location using california state plane datum
@@ -25,7 +28,9 @@ MW = gpd.GeoDataFrame(mw_coordinates,
                      geometry=gpd.points_from_xy(x=mw_coordinates['x'],y=mw_coordinates['y'],crs=crs))
 
 #Get WL depth measurements (ft)
-hds = pd.read_csv('/Users/spencerjordan/Documents/bowman_data_analysis//BOW-MW-ALL-DATA-Compiled_working.csv')
+with stage('load','well chemistry') as s:
+    hds = pd.read_csv('/Users/spencerjordan/Documents/bowman_data_analysis//BOW-MW-ALL-DATA-Compiled_working.csv')
+    s.count(hds)
 #Get rid of nans
 hds = hds[hds['NO3-N (mg/L)'].notna()]
 hds = hds.merge(mw_coordinates, on='MW#', how='left')
@@ -39,30 +44,12 @@ hds = hds.set_index('Sampling Date')
 def create_grid(minx_grid,miny_grid,maxx_grid,maxy_grid,N_rows,N_cols):
     """
     Create the spatial grid to represent the top layer of the MODFLOW mesh
+
+    Returns a RasterGrid (affine transform + shape) with origin at the upper
+    left grid corner. Use grid.xy for the centroids and grid.geometry() if
+    the cell polygons are actually needed
     """
-    # Grid size
-    grid_width = maxx_grid-minx_grid
-    grid_height = maxy_grid-miny_grid
-    # Cell size
-    cell_width = grid_width/N_cols
-    cell_height = grid_height/N_rows
-    # Define grid origin as upper left grid corner
-    origin_y = maxy_grid
-    origin_x = minx_grid
-    # Create grid cells
-    grid_cells = []
-    for i in range(N_rows): # For each row
-        cell_origin_y = origin_y - i * cell_height # Calculate the current y coordinate
-        for j in range(N_cols): # Create all cells in row
-            cell_origin_x = origin_x + j * cell_width # Calculate the current x coordinate
-            minx_cell = cell_origin_x
-            miny_cell = cell_origin_y - cell_height
-            maxx_cell = cell_origin_x + cell_width
-            maxy_cell = cell_origin_y
-            grid_cells.append(box(minx_cell, miny_cell, maxx_cell, maxy_cell)) # Store the new cell
-    # Create a GeoDataFrame containing the grid
-    grid = gpd.GeoDataFrame(geometry=grid_cells)
-    return grid
+    return RasterGrid.from_bounds(minx_grid,miny_grid,maxx_grid,maxy_grid,N_rows,N_cols)
 
 def generate_grid(N_ROWS=117,N_COLS=91):
     """
@@ -75,48 +62,54 @@ def generate_grid(N_ROWS=117,N_COLS=91):
     grid = create_grid(orch_bounds[0],orch_bounds[1],orch_bounds[2],orch_bounds[3],N_ROWS,N_COLS)
     return grid
 
-## DataFrame that will hold all the interpolated Z values
-Z_df = pd.DataFrame()
-
 grid = generate_grid()
+## Grid centroids only need to be computed once
+xi = grid.xy
 method = 'cubic'
-## For each date want to create a contour
-for date in hds.index.unique():
-    sub = hds[hds.index==date]
-    ## Don't plot if not all wells were sampled on that date
-    if len(sub) < 20:
-        pass
+
+## Well locations are fixed, so the triangulation and interpolation weights
+## are built once and reused for every sampling date
+wells = mw_coordinates.sort_values('MW#')
+with stage('interpolation',f'{method} weights',rows=len(xi)):
+    interp = WellInterpolator(wells[['x','y']].values,xi,method=method,rescale=True)
+
+## (wells x dates) matrix of NO3-N
+## Don't plot if not all wells were sampled on that date
+N_all = hds.pivot_table(index='MW#',columns=hds.index,values='NO3-N (mg/L)')
+N_all = N_all.reindex(wells['MW#'])
+N_all = N_all.loc[:,N_all.notna().all()]
+## DataFrame that will hold all the interpolated Z values --> one sparse product for all dates
+with stage('interpolation',f'{method} surfaces',rows=N_all.shape[1]):
+    Z_df = pd.DataFrame(interp(N_all.values),columns=N_all.columns)
+
+## Kriging
+## 'pooled'   --> one variogram fitted across all sampling dates. The kriging
+##                weights then only depend on the well geometry, so the system is
+##                factorized once and every date is one matrix product
+## 'per_date' --> a variogram fitted to each date, with the dates spread across
+##                WORKERS processes (None = one per CPU, serial where workers are
+##                spawned, e.g. macOS --> use bowman_cli.py gw-interp there)
+variogram = 'pooled'
+WORKERS = script_workers(None)
+with stage('interpolation',f'{variogram} kriging',rows=N_all.shape[1]):
+    if variogram == 'pooled':
+        krige = KrigingEngine.fit(wells[['x','y']].values,xi,N_all.values,model='gaussian')
+        K_df = pd.DataFrame(krige(N_all.values),columns=N_all.columns)
+        ## Kriging variance is the same for every date
+        K_var = krige.variance
     else:
-        N = sub[['MW#','NO3-N (mg/L)','x','y']]
-        points = np.vstack((N['x'],N['y'])).T
-        X,Y = np.meshgrid(N['x'],N['y'])
-        xi = np.vstack((grid.centroid.x,grid.centroid.y)).T
-        Z = griddata(points,N['NO3-N (mg/L)'],xi,
-                     method=method,
-                     rescale=True)
-        plt.imshow(Z.reshape(117,91))
-        plt.show()
-        Z_df[date] = Z
-        
-        ## Try Kriging from skgstat
-        from skgstat import OrdinaryKriging,Variogram
-        fig,ax = plt.subplots()
-        V = Variogram(coordinates=points,
-                      values=N['NO3-N (mg/L)'],
-                      model='gaussian',
-                      normalize=False)
-        ok = OrdinaryKriging(V,
-                             min_points=5,
-                             max_points=40)
-        kriging = ok.transform(xi)
-        im = ax.imshow(kriging.reshape(117,91))
-        #plt.colorbar(im,ax)
-        
-        ## Try kriging from pyKrige
-        from pykrige import OrdinaryKriging as OK
-        xi = np.vstack((grid.centroid.x,grid.centroid.y))
-        krig = OK(xi[0],xi[1],N['NO3-N (mg/L)'],
-                  variogram_model='linear')
+        K,K_params = krige_dates(wells[['x','y']].values,xi,N_all.values,
+                                 model='gaussian',workers=WORKERS)
+        K_df = pd.DataFrame(K.T,columns=N_all.columns)
+
+## For each date want to create a contour
+for date in Z_df.columns:
+    plt.imshow(grid.reshape(Z_df[date].values))
+    plt.show()
+    
+    fig,ax = plt.subplots()
+    im = ax.imshow(grid.reshape(K_df[date].values))
+    #plt.colorbar(im,ax)
     
 
     
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:57:12 2026
+
+Nitrate leaching flux below the root zone
+
+The deep pore-water NO3-N samples (180 and 280 cm) are irregular in time and
+per Al# site. They are aligned to the monthly recharge of each block with an
+as-of join: linear interpolation between the samples on either side of a
+month, the last sample carried forward for at most MAX_AGE days after the
+final one. The leaching mass flux is then recharge x concentration for every
+block and month at once
+
+    1 cm of water over 1 ha = 1e5 L  -->  kg N/ha = 0.1 x cm x mg/L
+
+Upward flux (negative recharge) carries no nitrate down, so it counts as zero.
+Only the recharge months inside both the balance and the probe records should
+go in (covered_months), block_recharge extrapolates past them. The monthly
+flux summed over complete growing seasons feeds the 'leaching' term of the
+N budget (n_budget.NBudget.with_term)
+
+@author: spencerjordan
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrument import stage
+from probe_storage import SITE_DICT, SITE_FALLBACK
+
+## kg N/ha per cm of water at 1 mg/L NO3-N
+KG_HA_PER_CM_MG_L = 0.1
+## Pore-water depths below the root zone
+DEEP_DEPTHS = ['180','280']
+## Days the last deep sample is carried forward, about one sampling interval
+MAX_AGE = 45
+## Growing seasons start in November, as G.season in the mass balance sheet
+SEASON_START = 11
+## Water balance blocks in each N balance block
+N_BLOCKS = {'NE':['NE1','NE2'],
+            'NW':['NW'],
+            'SE':['SE'],
+            'SW':['SW1','SW2']}
+
+
+def deep_samples(pw_data,depths=DEEP_DEPTHS,site_col='Al#',value='ppm NO3-N',date='datetime'):
+    """
+    Deep pore-water samples as (site, depth, time, NO3-N), missing values dropped
+    """
+    depth = np.asarray(pw_data['Depth'].astype(str))
+    conc = pw_data[value].to_numpy(dtype=float)
+    time = pd.to_datetime(pw_data[date]).values
+    keep = np.isin(depth,depths) & ~np.isnan(conc) & ~pd.isna(time)
+    return pd.DataFrame({'site':np.asarray(pw_data[site_col].astype(str))[keep],
+                         'depth':depth[keep],
+                         'time':time[keep],
+                         'NO3':conc[keep]})
+
+
+def asof_interpolate(codes,times,values,n_series,at,max_age=None):
+    """
+    (len(at) x n_series) values of many irregular series at the times in at
+
+    codes says which series each sample belongs to and times are in days.
+    Between two samples the value is interpolated linearly, after the last
+    one it is carried forward (for at most max_age days), before the first
+    it is missing. Samples on the same day are averaged. All the series go
+    through one sort and one searchsorted
+    """
+    codes = np.asarray(codes,dtype=np.int64)
+    times = np.asarray(times,dtype=float)
+    values = np.asarray(values,dtype=float)
+    at = np.asarray(at,dtype=float)
+    out = np.full((len(at),n_series),np.nan)
+    if len(times) == 0:
+        return out
+    ## One sorted key for every series --> series code * span + time
+    t0 = min(times.min(),at.min())
+    span = max(times.max(),at.max()) - t0 + 1
+    key = codes*span + (times - t0)
+    ## Average the samples that share a series and day
+    key,inverse = np.unique(key,return_inverse=True)
+    values = np.bincount(inverse,weights=values)/np.bincount(inverse)
+    series = (key // span).astype(np.int64)
+    t = key - series*span
+
+    ## Last sample at or before each (series, time), and the one after it
+    query = (np.arange(n_series)[None,:]*span + (at[:,None] - t0)).ravel()
+    i = np.searchsorted(key,query,side='right') - 1
+    s = np.repeat(np.arange(n_series)[None,:],len(at),axis=0).ravel()
+    q = np.tile(at - t0,n_series).reshape(n_series,-1).T.ravel()
+    has_prev = (i >= 0) & (series[np.clip(i,0,None)] == s)
+    j = np.clip(i + 1,0,len(key) - 1)
+    has_next = has_prev & (i + 1 < len(key)) & (series[j] == s)
+    i = np.clip(i,0,None)
+    result = np.where(has_prev,values[i],np.nan)
+    ## Linear between the bracketing samples
+    between = has_next & (q > t[i])
+    with np.errstate(invalid='ignore',divide='ignore'):
+        w = (q - t[i]) / (t[j] - t[i])
+        result = np.where(between,values[i] + w*(values[j] - values[i]),result)
+    ## As-of only --> drop values carried forward for too long
+    if max_age is not None:
+        result = np.where(has_prev & ~between & (q - t[i] > max_age),np.nan,result)
+    return result.reshape(len(at),n_series)
+
+
+def _days(dates):
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(float)
+
+
+def block_concentration(samples,dates,blocks,site_dict=SITE_DICT,fallback=SITE_FALLBACK,
+                        max_age=MAX_AGE):
+    """
+    (date x block) deep NO3-N [mg/L] at the given dates
+
+    Each site and depth is interpolated on its own, the depths are averaged
+    per site and the sites per block (blocks without a site use fallback)
+    """
+    pairs = samples['site'] + '|' + samples['depth']
+    codes,series = pd.factorize(pairs)
+    conc = asof_interpolate(codes,_days(samples['time']),samples['NO3'].values,
+                            len(series),_days(dates),max_age=max_age)
+    sites = np.array([s.split('|')[0] for s in series])
+    out = np.full((len(dates),len(blocks)),np.nan)
+    with np.errstate(invalid='ignore'):
+        for k,block in enumerate(blocks):
+            names = [str(n) for n in (site_dict.get(block) or fallback.get(block,[]))]
+            cols = np.isin(sites,names)
+            if cols.any():
+                ## nanmean over every depth of every site in the block
+                c = conc[:,cols]
+                n = (~np.isnan(c)).sum(axis=1)
+                out[:,k] = np.where(n > 0,np.nansum(c,axis=1)/np.maximum(n,1),np.nan)
+    return pd.DataFrame(out,index=pd.DatetimeIndex(dates),columns=list(blocks))
+
+
+def covered_months(recharge,*records):
+    """
+    recharge cut to the months inside every record (dates or date indexes,
+    e.g. the monthly balance and the probe survey dates), where the recharge
+    is interpolated rather than extrapolated
+    """
+    start = max(pd.DatetimeIndex(r).min() for r in records)
+    end = min(pd.DatetimeIndex(r).max() for r in records)
+    months = pd.DatetimeIndex(recharge.index)
+    return recharge[(months >= start) & (months <= end)]
+
+
+def leaching_flux(recharge,concentration):
+    """
+    Monthly leaching [kg N/ha] from recharge [cm] and concentration [mg/L],
+    both (month x block) with the same index and columns
+    """
+    down = np.clip(recharge.to_numpy(dtype=float),0,None)
+    flux = KG_HA_PER_CM_MG_L * down * concentration.to_numpy(dtype=float)
+    return pd.DataFrame(flux,index=recharge.index,columns=recharge.columns)
+
+
+def seasonal_leaching(flux,season_start=SEASON_START):
+    """
+    (season x block) total leaching, seasons labelled by the year they end in
+
+    season_start is the first month of a season (1 = calendar years). Only
+    complete seasons are summed, a block missing a month of a season is
+    missing for that season and seasons missing for every block are dropped
+    """
+    index = pd.DatetimeIndex(flux.index)
+    season = np.asarray(index.year + (index.month >= season_start).astype(int)*(season_start > 1))
+    table = flux.groupby(season).sum(min_count=12)
+    ## The same month twice would pass as a complete season
+    months = pd.Series(index.month,index=season).groupby(level=0).nunique()
+    table = table[months.reindex(table.index) == 12].dropna(how='all')
+    table.index.name = 'GS'
+    return table
+
+
+def to_n_blocks(table,groups=N_BLOCKS,weights=None):
+    """
+    Water balance blocks --> N balance blocks, (area) weighted mean of the members
+    """
+    out = {}
+    for block,members in groups.items():
+        members = [m for m in members if m in table.columns]
+        if not members:
+            continue
+        w = np.array([1.0 if weights is None else weights[m] for m in members])
+        v = table[members].to_numpy(dtype=float)
+        use = ~np.isnan(v)
+        with np.errstate(invalid='ignore',divide='ignore'):
+            out[block] = (np.where(use,v,0)*w).sum(axis=1) / (use*w).sum(axis=1)
+    return pd.DataFrame(out,index=table.index)
+
+
+def leaching_pipeline(recharge,pw_data,depths=DEEP_DEPTHS,site_dict=SITE_DICT,
+                      fallback=SITE_FALLBACK,max_age=MAX_AGE,season_start=SEASON_START,weights=None):
+    """
+    Recharge (month x block) and pore-water data --> the leaching terms
+
+    recharge should already be cut to the covered months (covered_months)
+
+    Returns a dict with the (month x block) 'concentration' and 'flux', the
+    (season x block) 'seasonal' totals and the same on the N balance blocks
+    ('n_balance', ready for NBudget.with_term('leaching',...))
+    """
+    with stage('balance','leaching flux') as s:
+        samples = deep_samples(pw_data,depths)
+        s.count(samples)
+        conc = block_concentration(samples,recharge.index,list(recharge.columns),
+                                   site_dict=site_dict,fallback=fallback,max_age=max_age)
+        flux = leaching_flux(recharge,conc)
+        seasonal = seasonal_leaching(flux,season_start)
+    return {'concentration':conc,'flux':flux,'seasonal':seasonal,
+            'n_balance':to_n_blocks(seasonal,weights=weights)}
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:48:10 2026
+
+Nitrogen budget engine for bowman_Nitrate_Balance
+
+The manual mass balance table (one row per block and growing season) is held
+as a (scenario x year x block x term) array. Net balance, NUE and residual
+leaching are computed for every scenario at once by broadcasting, so
+thousands of fertilizer or denitrification scenarios cost about as much as
+the one manual table
+
+    budget = NBudget.from_table(data)
+    runs = budget.scenarios({'Fert kg/ha':np.linspace(0.5,1.5,1000)})
+    runs.residual_leaching()    # (1000 x year x block)
+
+@author: spencerjordan
+"""
+
+import numpy as np
+import pandas as pd
+
+
+## Block order of the plots (matches Hanni's figures)
+BLOCKS = ['NE','NW','SE','SW']
+INPUTS = ['Fert kg/ha','Min','Dep']
+OUTPUTS = ['Uptake kg/ha','Growth','Denit']
+TERMS = INPUTS + OUTPUTS + ['leaching']
+
+
+class NBudget:
+    """
+    N budget terms as a (scenario x year x block x term) array
+
+    Block/year combinations missing from the table are NaN
+    """
+    def __init__(self,values,years,blocks=BLOCKS,terms=TERMS):
+        self.values = np.asarray(values,dtype=float)
+        self.years = list(years)
+        self.blocks = list(blocks)
+        self.terms = list(terms)
+        if self.values.ndim == 3:
+            self.values = self.values[None]
+
+    @classmethod
+    def from_table(cls,data,blocks=BLOCKS,terms=TERMS,block_col='block',year_col='GS'):
+        """
+        One scenario from the manual mass balance table
+
+        Years are kept in the order they first appear, blocks in plot order.
+        Raises for blocks not in blocks and for repeated (block, year) rows
+        """
+        year = np.asarray(data[year_col])
+        years = pd.unique(year)
+        y = pd.Index(years).get_indexer(year)
+        names = np.asarray(data[block_col]).astype(str)
+        b = pd.Index(blocks).get_indexer(names)
+        if (b < 0).any():
+            raise ValueError(f'Blocks {sorted(set(names[b < 0]))} are not in {list(blocks)}')
+        dup = pd.Index(y*len(blocks) + b).duplicated()
+        if dup.any():
+            raise ValueError(f'Repeated (block, {year_col}) rows: '
+                             f'{sorted(set(zip(names[dup],year[dup])))}')
+        values = np.full((1,len(years),len(blocks),len(terms)),np.nan)
+        values[0,y,b] = data[terms].to_numpy(dtype=float)
+        return cls(values,years,blocks,terms)
+
+    def term(self,name):
+        """
+        (scenario x year x block) values of one term
+        """
+        return self.values[...,self.terms.index(name)]
+
+    def _sum(self,names):
+        idx = [self.terms.index(n) for n in names]
+        return self.values[...,idx].sum(axis=-1)
+
+    def inputs(self):
+        """
+        Fert + Min + Dep
+        """
+        return self._sum(INPUTS)
+
+    def outputs(self):
+        """
+        Uptake + Growth + Denit
+        """
+        return self._sum(OUTPUTS)
+
+    def net_balance(self):
+        """
+        Inputs - outputs, the N left over in the root zone
+        """
+        return self.inputs() - self.outputs()
+
+    def residual_leaching(self):
+        """
+        Leaching closing the budget --> same as net_balance
+        """
+        return self.net_balance()
+
+    def nue(self):
+        """
+        Nitrogen use efficiency, (Uptake + Growth) / Fert
+        """
+        with np.errstate(invalid='ignore',divide='ignore'):
+            return (self.term('Uptake kg/ha') + self.term('Growth')) / self.term('Fert kg/ha')
+
+    def scenarios(self,multipliers):
+        """
+        New budget with one scenario per multiplier
+
+        multipliers maps a term to an array of multipliers, (scenario,) or
+        anything broadcasting to (scenario x year x block). All the arrays
+        must have the same number of scenarios. Built from the first scenario
+        of this budget
+        """
+        base = self.values[0]
+        mult = {t:np.asarray(m,dtype=float) for t,m in multipliers.items()}
+        mult = {t:(m[:,None,None] if m.ndim == 1 else m) for t,m in mult.items()}
+        n = np.broadcast_shapes(*[m.shape for m in mult.values()])[0]
+        values = np.broadcast_to(base,(n,)+base.shape).copy()
+        for t,m in mult.items():
+            values[...,self.terms.index(t)] *= m
+        return NBudget(values,self.years,self.blocks,self.terms)
+
+    def sample(self,n,cv,seed=None):
+        """
+        n random scenarios, each term in cv scaled by a normal multiplier
+        with mean 1 and that coefficient of variation (clipped at zero)
+
+        e.g. budget.sample(5000,{'Fert kg/ha':0.1,'Denit':0.5})
+        """
+        rng = np.random.default_rng(seed)
+        return self.scenarios({t:np.clip(rng.normal(1,c,n),0,None) for t,c in cv.items()})
+
+    def with_term(self,name,table):
+        """
+        New budget with one term replaced by a (year x block) table, e.g. the
+        leaching from leaching_flux. Years and blocks missing from the table
+        keep their values
+        """
+        values = self.values.copy()
+        table = table.reindex(index=self.years,columns=self.blocks)
+        new = table.to_numpy(dtype=float)
+        k = self.terms.index(name)
+        values[...,k] = np.where(np.isnan(new),values[...,k],new)
+        return NBudget(values,self.years,self.blocks,self.terms)
+
+    def quantiles(self,values,q=(0.05,0.5,0.95)):
+        """
+        (quantile x year x block) of a (scenario x year x block) result
+        """
+        return np.nanquantile(values,q,axis=0)
+
+    def to_frame(self,scenario=0):
+        """
+        Long table (block, GS, terms, NUE) of one scenario, in plot order
+        """
+        v = self.values[scenario]
+        frame = pd.DataFrame(v.reshape(-1,len(self.terms)),columns=self.terms)
+        frame.insert(0,'GS',np.repeat(self.years,len(self.blocks)))
+        frame.insert(0,'block',np.tile(self.blocks,len(self.years)))
+        frame['NUE'] = self.nue()[scenario].ravel()
+        return frame
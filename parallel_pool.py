@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:02:31 2026
+
+Process pools shared by the analysis scripts
+
+@author: spencerjordan
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def n_workers(workers=None):
+    """
+    Number of worker processes, defaulting to one per CPU
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(int(workers),1)
+
+
+def forks():
+    """
+    True if new processes are forked, so workers do not re-run the __main__ script
+    """
+    return multiprocessing.get_context().get_start_method() == 'fork'
+
+
+def script_workers(workers=None):
+    """
+    Pool size for a pool started from the cells of an analysis script
+
+    The scripts run their cells at module level and a spawned worker (the
+    default on macOS and Windows) re-runs the __main__ script when it starts,
+    so there they stay serial (1). The __main__-guarded entry points
+    (bowman_cli gw-interp, benchmark) can use workers on every platform
+    """
+    return workers if forks() else 1
+
+
+def process_pool(workers=None,initializer=None,initargs=()):
+    """
+    ProcessPoolExecutor with the platform's default start method
+
+    Forking after matplotlib and Accelerate are loaded can hang on macOS, so
+    fork is never forced. Where workers are spawned the caller needs a
+    __main__ guard (see script_workers)
+    """
+    return ProcessPoolExecutor(max_workers=n_workers(workers),initializer=initializer,
+                               initargs=initargs)
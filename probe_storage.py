@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:20:47 2026
+
+Neutron probe storage and ΔS for waterBalance
+
+The probe readings are pivoted once into a (survey date x site x depth) array.
+Storage at a site is the mean over its depths of the water content times the
+soil thickness each depth represents (depthDict), done as one contraction
+over the depth axis. Site ΔS, block ΔS (sites averaged per block with
+fallbacks for blocks without a probe) and the orchard ΔS all come from that
+array
+
+@author: spencerjordan
+"""
+
+import numpy as np
+import pandas as pd
+
+from bowman_data import clean
+
+
+## Soil depth [cm] represented by each probe depth
+DEPTH_DICT = {30:45,
+              60:30,
+              90:60,
+              180:95,
+              280:50}
+## Probe sites (Al-#) averaged into each block
+SITE_DICT = {'NE1':[1],
+             'NE2':[2],
+             'SE':[7,8],
+             'SW1':[],
+             'SW2':[6],
+             'NW':[3,4]}
+## Sites used for blocks without a monitoring site
+## --> no probe in SW1, Al-6 (SW2) stands in
+SITE_FALLBACK = {'SW1':[6]}
+
+
+def site_name(site):
+    return site if isinstance(site,str) else f'Al-{site}'
+
+
+def probe_array(np_data,sites=None,depths=None,value='water content'):
+    """
+    Survey dates, sites, depths and the (date x site x depth) array of
+    readings, NaN where a reading is missing
+    """
+    if sites is None:
+        sites = list(np.unique(np_data['Site']))
+    if depths is None:
+        depths = list(np.unique(np_data['Depth']))
+    sub = np_data[np_data['Site'].isin(sites) & np_data['Depth'].isin(depths)]
+    dates = pd.DatetimeIndex(np.sort(sub['date'].unique()))
+    full = pd.MultiIndex.from_product([dates,sites,depths])
+    wc = sub.groupby(['date','Site','Depth'],observed=True)[value].mean().reindex(full)
+    return dates,sites,depths,wc.to_numpy(dtype=float).reshape(len(dates),len(sites),len(depths))
+
+
+def diff_available(S,axis=0):
+    """
+    Change since the previous available survey along axis, 0 at the first one
+
+    Same as differencing each site over only the dates it was read on
+    """
+    S = np.moveaxis(np.asarray(S,dtype=float),axis,0)
+    valid = ~np.isnan(S)
+    pos = np.arange(S.shape[0]).reshape((-1,)+(1,)*(S.ndim-1))
+    last = np.maximum.accumulate(np.where(valid,pos,0),axis=0)
+    filled = np.take_along_axis(S,last,axis=0)
+    prev = np.concatenate([np.full_like(S[:1],np.nan),filled[:-1]],axis=0)
+    dS = S - prev
+    dS[valid & np.isnan(prev)] = 0.0
+    return np.moveaxis(dS,0,axis)
+
+
+def clean_probe_data(np_data):
+    """
+    Fix the site names (AL-1, AL-2 and bare numbers --> Al-#) and parse the survey date
+
+    Runs the 'neutron_probe' rules of bowman_data, Site comes back categorical.
+    load_neutron_probe already does this, it is for frames read some other way
+    """
+    np_data = clean(np_data,'neutron_probe')
+    np_data['date'] = pd.to_datetime(np_data['date'])
+    return np_data
+
+
+def block_matrix(sites,blocks,site_dict=SITE_DICT,fallback=SITE_FALLBACK):
+    """
+    (block x site) averaging weights, falling back for blocks without a site
+    """
+    M = np.zeros((len(blocks),len(sites)))
+    for i,block in enumerate(blocks):
+        names = [site_name(s) for s in (site_dict.get(block) or fallback.get(block,[]))]
+        names = [s for s in names if s in sites]
+        for s in names:
+            M[i,list(sites).index(s)] = 1/len(names)
+    return M
+
+
+def block_change(site_change,M):
+    """
+    (... x date x block) ΔS averaged over each block's sites, missing if any
+    of them is missing that day
+    """
+    missing = np.isnan(site_change).astype(float) @ (M.T > 0)
+    ## Blocks without any probe site have no ΔS at all
+    missing += M.sum(axis=1) == 0
+    dS = np.nan_to_num(site_change) @ M.T
+    return np.where(missing > 0,np.nan,dS)
+
+
+class ProbeStorage:
+    """
+    Storage and ΔS for every site, block and the orchard from one pivot
+
+    thickness in the methods is the soil depth for each probe depth, either
+    (depth,) or (realization x depth) to get a leading realization axis on
+    the results. slope and offset calibrate the water content (slope*wc + offset)
+    and can also be per realization
+    """
+    def __init__(self,np_data,depth_dict=DEPTH_DICT,site_dict=SITE_DICT,
+                 fallback=SITE_FALLBACK,value='water content'):
+        self.depth_dict = depth_dict
+        self.site_dict = site_dict
+        self.fallback = fallback
+        self.dates,self.sites,self.depths,self.wc = probe_array(np_data,value=value,
+                                                                depths=sorted(depth_dict))
+        self.valid = ~np.isnan(self.wc)
+        self._wc0 = np.where(self.valid,self.wc,0.0)
+
+    def thickness(self):
+        return np.array([self.depth_dict[d] for d in self.depths],dtype=float)
+
+    def _contract(self,thickness,slope,offset,axes):
+        """
+        Mean of (slope*wc + offset)*thickness over the readings along axes
+        """
+        thickness = self.thickness() if thickness is None else np.asarray(thickness,dtype=float)
+        spec = {(2,):'dsz,...z->...ds',(1,2):'dsz,...z->...d'}[axes]
+        total = np.einsum(spec,self._wc0,thickness)
+        weight = np.einsum(spec,self.valid.astype(float),thickness)
+        count = self.valid.sum(axis=axes)
+        slope = np.asarray(slope,dtype=float)
+        offset = np.asarray(offset,dtype=float)
+        ## Per realization calibration lines up with the leading axis
+        extra = (1,)*(total.ndim - slope.ndim)
+        total = slope.reshape(slope.shape+extra)*total + offset.reshape(offset.shape+extra)*weight
+        with np.errstate(invalid='ignore',divide='ignore'):
+            return np.where(count > 0,total/count,np.nan)
+
+    def site_storage(self,thickness=None,slope=1.0,offset=0.0):
+        """
+        (... x date x site) storage, the depth mean of water content x thickness
+        """
+        return self._contract(thickness,slope,offset,(2,))
+
+    def orchard_storage(self,thickness=None,slope=1.0,offset=0.0):
+        """
+        (... x date) storage averaged over every site and depth read that day
+        """
+        return self._contract(thickness,slope,offset,(1,2))
+
+    def block_change(self,site_change,blocks=None):
+        """
+        (... x date x block) ΔS averaged over each block's sites
+        """
+        blocks = list(self.site_dict) if blocks is None else list(blocks)
+        return block_change(site_change,block_matrix(self.sites,blocks,self.site_dict,
+                                                     self.fallback))
+
+    def changes(self,blocks=None,thickness=None,slope=1.0,offset=0.0):
+        """
+        Site, block and orchard storage change for one parameter set in one call
+
+        Returns a dict of DataFrames 'site' (date x site), 'block' (date x block)
+        and Series 'orchard' ΔS and 'orchard_storage', all indexed by survey date
+        """
+        blocks = list(self.site_dict) if blocks is None else list(blocks)
+        site = diff_available(self.site_storage(thickness,slope,offset),axis=-2)
+        block = self.block_change(site,blocks)
+        orchard = self.orchard_storage(thickness,slope,offset)
+        idx = pd.DatetimeIndex(self.dates,name='date')
+        return {'site':pd.DataFrame(site,index=idx,columns=self.sites),
+                'block':pd.DataFrame(block,index=idx,columns=blocks),
+                'orchard':pd.Series(diff_available(orchard),index=idx,name='water content'),
+                'orchard_storage':pd.Series(orchard,index=idx,name='water content')}
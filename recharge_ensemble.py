@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:05:22 2026
+
+Predicted recharge for waterBalance and its Monte Carlo ensemble
+
+Recharge is the mass balance spline minus the neutron probe ΔS spline for each
+block. block_recharge does every block in one call: the dates become day
+offsets once, all splines are evaluated on one day grid and the months are a
+single grouped reduction.
+
+For the ensemble each realization draws the uncertain inputs: the ET
+multiplier, the depthDict layer thicknesses, the probe calibration (slope and
+offset on the water content) and which precip source is used. The balances
+and probe storage for all realizations are computed as arrays in one go. Only
+the spline fits are done one series at a time, and those are spread over a
+process pool in chunks of realizations
+
+@author: spencerjordan
+"""
+
+import numpy as np
+import pandas as pd
+
+from balance_engine import month_codes
+from parallel_pool import n_workers, process_pool
+from probe_storage import DEPTH_DICT, SITE_DICT, ProbeStorage, diff_available
+
+
+###############################################################################
+############################# Spline fits #####################################
+###############################################################################
+def day_offsets(index,start):
+    """
+    Whole days from start to each timestamp, as floats for the spline fits
+    """
+    index = np.asarray(pd.DatetimeIndex(index).values,dtype='datetime64[ns]')
+    return ((index - np.datetime64(pd.Timestamp(start),'ns'))
+            // np.timedelta64(1,'D')).astype(float)
+
+
+def spline_recharge(x_mb,balance,x_np,dS,xs):
+    """
+    (day x block) recharge on the grid xs: the mass balance spline minus the
+    ΔS spline for every column of balance (month x block) and dS (date x block)
+    """
+    from scipy.interpolate import UnivariateSpline as spline
+    balance = np.asarray(balance,dtype=float)
+    dS = np.asarray(dS,dtype=float)
+    out = np.empty((len(xs),balance.shape[1]))
+    for b in range(balance.shape[1]):
+        out[:,b] = spline(x_mb,balance[:,b])(xs) - spline(x_np,dS[:,b])(xs)
+    return out
+
+
+def monthly_mean(values,codes,n_months):
+    """
+    Month means of a (day x block) array as one grouped reduction
+    """
+    n_blocks = values.shape[1]
+    counts = np.bincount(codes,minlength=n_months).astype(float)
+    counts[counts == 0] = np.nan
+    groups = (codes[:,None]*n_blocks + np.arange(n_blocks)).ravel()
+    sums = np.bincount(groups,weights=values.ravel(),minlength=n_months*n_blocks)
+    return sums.reshape(n_months,n_blocks) / counts[:,None]
+
+
+def block_recharge(balance,dS,startDate,start='2018/03/06',end='2022/12/08',n_days=1800):
+    """
+    Monthly predicted recharge for every block in one call
+
+    balance is the monthly mass balance (month x block) and dS the probe change
+    in storage (date x block, columns in the same order), both date indexed.
+    The balance is fitted between start and end, both series on days since
+    startDate, and the recharge is evaluated on n_days days from startDate
+    and averaged per month. Returns a (month x block) DataFrame with balance's
+    columns
+    """
+    window = ((balance.index > pd.to_datetime(start,format='%Y/%m/%d')) &
+              (balance.index < pd.to_datetime(end,format='%Y/%m/%d')))
+    xs = np.linspace(0,n_days,n_days)
+    codes,months = month_codes(startDate + pd.to_timedelta(xs,unit='D'))
+    daily = spline_recharge(day_offsets(balance.index[window],startDate),
+                            balance.values[window],
+                            day_offsets(dS.index,startDate),dS.values,xs)
+    return pd.DataFrame(monthly_mean(daily,codes,len(months)),index=months,
+                        columns=balance.columns)
+
+
+def _fit_chunk(balance,dS,x_mb,x_np,xs,codes,n_months):
+    """
+    Monthly mean recharge for a chunk of realizations, (realization x month x block)
+    """
+    return np.stack([monthly_mean(spline_recharge(x_mb,balance[r],x_np,dS[r],xs),
+                                  codes,n_months)
+                     for r in range(balance.shape[0])])
+
+
+def _fit_task(args):
+    return _fit_chunk(*args)
+
+
+def draw_parameters(n,rng,thickness,et_range=(0.78,1.0),depth_sd=0.1,
+                    slope_sd=0.05,offset_sd=0.0,n_precip=1):
+    """
+    n parameter sets
+
+    ET multiplier is uniform over et_range. Layer thicknesses and the
+    calibration slope are normal around the depthDict values and 1 with
+    relative sd depth_sd and slope_sd. The calibration offset is normal around
+    0 (water content units) and the precip source is picked uniformly
+    """
+    thickness = np.asarray(thickness,dtype=float)
+    return {'ET_mult':rng.uniform(et_range[0],et_range[1],n),
+            'thickness':np.clip(thickness*(1 + depth_sd*rng.standard_normal((n,len(thickness)))),0,None),
+            'slope':1 + slope_sd*rng.standard_normal(n),
+            'offset':offset_sd*rng.standard_normal(n),
+            'precip':rng.integers(0,n_precip,n)}
+
+
+def recharge_ensemble(terms,np_data,n=1000,q=(0.05,0.25,0.5,0.75,0.95),
+                      precip_sources=None,depth_dict=DEPTH_DICT,site_dict=SITE_DICT,
+                      seed=None,workers=None,
+                      start='2018/03/06',end='2022/12/08',n_days=1800,**draw_kw):
+    """
+    Quantiles of the monthly recharge for each block across n realizations
+
+    terms is the balance_engine.MonthlyTerms of the unadjusted sheet and
+    np_data the cleaned probe data with the raw water content.
+    precip_sources is a list of (month x block) monthly precip, e.g. the
+    .precip of MonthlyTerms built from sheets with other precip values. The
+    sheet's own precip is used when not given. workers sets the pool size
+    (None = one per CPU, 1 = serial). Returns a dict with the (quantile x month x
+    block) 'quantiles', the 'months', 'blocks', 'q' and the drawn 'params'
+    """
+    rng = np.random.default_rng(seed)
+    blocks = terms.config['blocks']
+    if precip_sources is None:
+        precip_sources = [terms.precip]
+    probes = ProbeStorage(np_data,depth_dict=depth_dict,site_dict=site_dict)
+    params = draw_parameters(n,rng,probes.thickness(),n_precip=len(precip_sources),
+                             **draw_kw)
+
+    ## Mass balance for every realization (realization x month x block)
+    precip = np.stack(precip_sources)[params['precip']]
+    balance = (terms.water_in - terms.precip)[None] + precip \
+              - params['ET_mult'][:,None,None]*terms.ET[None]
+    ## Probe ΔS for every realization (realization x date x block), a block
+    ## with a site missing on a survey counts as no change like in waterBalance
+    site = probes.site_storage(params['thickness'],params['slope'],params['offset'])
+    dS = np.nan_to_num(probes.block_change(diff_available(site,axis=-2),blocks))
+    dates = probes.dates
+
+    ## Day offsets from the first probe date, as in waterBalance
+    startDate = dates[0]
+    window = ((terms.index > pd.to_datetime(start,format='%Y/%m/%d')) &
+              (terms.index < pd.to_datetime(end,format='%Y/%m/%d')))
+    x_mb = day_offsets(terms.index[window],startDate)
+    balance = balance[:,window]
+    x_np = day_offsets(dates,startDate)
+    xs = np.linspace(0,n_days,n_days)
+    codes,months = month_codes(startDate + pd.to_timedelta(xs,unit='D'))
+
+    ## Spline fits in chunks of realizations
+    workers = min(n_workers(workers),n)
+    bounds = np.linspace(0,n,min(n,workers*4)+1).astype(int)
+    tasks = [(balance[i:j],dS[i:j],x_mb,x_np,xs,codes,len(months))
+             for i,j in zip(bounds[:-1],bounds[1:])]
+    if workers <= 1:
+        recharge = [_fit_task(t) for t in tasks]
+    else:
+        with process_pool(workers) as pool:
+            recharge = list(pool.map(_fit_task,tasks))
+    recharge = np.concatenate(recharge)
+    return {'quantiles':np.nanquantile(recharge,q,axis=0),
+            'months':months,
+            'blocks':blocks,
+            'q':np.asarray(q),
+            'params':params}
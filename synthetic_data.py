@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:14:36 2026
+
+Synthetic stand-ins for the Bowman data files
+
+Writes every file the analysis scripts read, with the same file names, columns,
+date formats and the known quirks of the real files (depth typos, 'redo' and
+'#VALUE!' entries, mixed site names), filled with random but plausible values.
+The files are only meant for timing the scripts and engines without the
+private data, not for any analysis.
+
+scale grows the data the way the real files would grow:
+    - more monitoring stations for the station data (pore water lysimeters,
+      neutron probe sites, monitoring wells, CIMIS stations), with each
+      replicate of the orchard getting its own copy of the sites
+    - more blocks in the mass balance sheet and the N balance, so the
+      (time x block) engines get wider
+    - a longer record for the single-station flux tower and Ranch Systems
+      exports (extended back in time)
+
+@author: spencerjordan
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+BLOCKS = ['NE1','NE2','NW','SW1','SW2','SE']
+N_BLOCKS = ['NE','NW','SE','SW']
+## Pore water depths as they are typed in the compiled sheet
+PW_DEPTHS = ['30n','30S','60','90','188','280','300']
+NP_DEPTHS = [30,60,90,180,280]
+MLS_DEPTHS = ['1','2','3','4','5','6','7a','7b','GW all']
+## Base number of stations in one copy of the orchard
+N_LYSIMETERS = 8
+N_PROBES = 8
+N_WELLS = 20
+## Ranch Systems readings every 15 minutes
+RS_FREQ = '15min'
+
+## File names relative to the output folder, same as the scripts use
+FILES = {'pore_water':'ALL_PORE_WATER_COMPILED.CSV',
+         'neutron_probe':'np2018_2022_Spencer_Update.csv',
+         'mls':'Bowman-MW-multilevel-sampling-ALL-DATA-2021-spencer.csv',
+         'wells':'BOW-MW-ALL-DATA-Compiled.csv',
+         'wells_update':'BOW-MW-ALL-DATA-Compiled_update.csv',
+         'wells_working':'BOW-MW-ALL-DATA-Compiled_working.csv',
+         'well_coordinates':'mw_coordinates.csv',
+         'soil':'soil-bwn-inorgan-N-2022_spencer.csv',
+         'main_data':'massBalanceMainData_92.csv',
+         'block_config':'block_config.json',
+         'n_balance':'N_mass_balance/manual_mass_balance_2022.csv',
+         'cimis':'cimis_daily.csv',
+         'ranch_systems':'widget-graph-export-2.csv',
+         'flux_tower':'BowmanET_daily_2022_11_10.csv',
+         'openet':'OPENET_SE_all_years.csv'}
+
+
+def replicate_names(names,scale):
+    """
+    names for the first copy of the orchard, names_2, names_3, ... for the others
+    """
+    return [n if k == 0 else f'{n}_{k+1}' for k in range(scale) for n in names]
+
+
+def synthetic_site_dict(scale=1):
+    """
+    probe_storage SITE_DICT for the replicated blocks of a scaled dataset
+
+    Copy k of the orchard uses probe sites Al-(n + 8k)
+    """
+    from probe_storage import SITE_DICT
+    names = np.reshape(replicate_names(BLOCKS,scale),(scale,len(BLOCKS))).tolist()
+    return {names[k][i]:[s + N_PROBES*k for s in SITE_DICT[b]]
+            for k in range(scale) for i,b in enumerate(BLOCKS)}
+
+
+def _seasonal(index,amplitude=1.0,peak_doy=190):
+    """
+    Smooth annual cycle peaking in early July, between 0 and 2*amplitude
+    """
+    doy = pd.DatetimeIndex(index).dayofyear.values
+    return amplitude*(1 + np.cos(2*np.pi*(doy - peak_doy)/365.25))
+
+
+###############################################################################
+############################## Station data ###################################
+###############################################################################
+def pore_water(rng,scale=1):
+    """
+    ALL_PORE_WATER_COMPILED.CSV --> Date (%m/%d/%y), Al#, Depth, ppm NH4-N, ppm NO3-N
+    """
+    dates = pd.date_range('2017-03-01','2022-10-01',freq='14D')
+    sites = np.arange(1,N_LYSIMETERS*scale+1).astype(str)
+    date,site,depth = (a.ravel() for a in np.meshgrid(dates.strftime('%m/%d/%y'),sites,
+                                                      PW_DEPTHS,indexing='ij'))
+    n = len(date)
+    NO3 = np.round(rng.gamma(2,8,n),2).astype(object)
+    NO3[rng.random(n) < 0.02] = 'redo'
+    return pd.DataFrame({'Date':date,
+                         'Al#':site,
+                         'Depth':depth,
+                         'ppm NH4-N':np.round(rng.gamma(1,0.5,n),2),
+                         'ppm NO3-N':NO3})
+
+
+def neutron_probe(rng,scale=1):
+    """
+    np2018_2022_Spencer_Update.csv --> Site, Depth, date, water content,
+    water content weighted. Sites are typed as Al-#, AL-# or a bare number
+    """
+    dates = pd.date_range('2018-03-06','2022-08-01',freq='30D')
+    n_sites = N_PROBES*scale
+    date,number,depth = (a.ravel() for a in np.meshgrid(dates.strftime('%m/%d/%y'),
+                                                        np.arange(1,n_sites+1),
+                                                        NP_DEPTHS,indexing='ij'))
+    ## Same spelling mix as the real file, which only has the odd spellings
+    ## for the original eight sites (AL- only for 1 and 2)
+    site = np.char.add('Al-',number.astype(str)).astype(object)
+    odd = rng.random(len(number))
+    bare = (number <= 8) & (odd < 0.1)
+    upper = (number <= 2) & (odd > 0.9)
+    site[bare] = number[bare].astype(str)
+    site[upper] = np.char.add('AL-',number[upper].astype(str))
+    season = np.repeat(_seasonal(dates,0.04),n_sites*len(NP_DEPTHS))
+    wc = 0.18 + season + 0.03*rng.random(len(date))
+    return pd.DataFrame({'Site':site,
+                         'Depth':depth,
+                         'date':date,
+                         'water content':np.round(wc,4),
+                         'water content weighted':np.round(wc*depth/100,4)})
+
+
+def mls(rng,scale=1):
+    """
+    Multi-level sampling --> MW#, depth (m), NO3-N mg/L, EC dS/m, NO3/EC
+    with '#VALUE!' where the sheet's ratio failed
+    """
+    wells = np.arange(1,N_WELLS*scale+1)
+    well,depth = (a.ravel() for a in np.meshgrid(wells,MLS_DEPTHS,indexing='ij'))
+    NO3 = np.round(rng.gamma(2,5,len(well)),2)
+    EC = np.round(rng.uniform(0.2,1.5,len(well)),3)
+    ratio = np.round(NO3/EC,2).astype(str).astype(object)
+    ratio[rng.random(len(well)) < 0.05] = '#VALUE!'
+    return pd.DataFrame({'MW#':well,'depth (m)':depth,'NO3-N mg/L':NO3,
+                         'EC dS/m':EC,'NO3/EC':ratio})
+
+
+def well_chemistry(rng,scale=1):
+    """
+    Compiled MW sampling --> MW#, Sampling Date (as datetimes), DTW (feet), pH,
+    Temp C, Eh(mV), NO3-N (mg/L), a few wells missing on each date
+    """
+    dates = pd.date_range('2015-01-01','2022-10-01',freq='90D')
+    wells = np.arange(1,N_WELLS*scale+1)
+    date,well = (a.ravel() for a in np.meshgrid(dates,wells,indexing='ij'))
+    n = len(well)
+    NO3 = rng.gamma(2,8,n)
+    NO3[rng.random(n) < 0.03] = np.nan
+    return pd.DataFrame({'MW#':well,
+                         'Sampling Date':pd.DatetimeIndex(date),
+                         'DTW (feet)':np.round(20 + 10*rng.random(n),2),
+                         'pH':np.round(7 + rng.random(n),2),
+                         'Temp C':np.round(18 + 3*rng.random(n),1),
+                         'Eh(mV)':np.round(100*rng.random(n),1),
+                         'NO3-N (mg/L)':np.round(NO3,2)})
+
+
+def well_coordinates(rng,scale=1):
+    """
+    mw_coordinates.csv --> x, y, z in feet (state plane), one row per well
+    """
+    n = N_WELLS*scale
+    return pd.DataFrame({'x':np.round(6.35e6 + 4600*rng.random(n),1),
+                         'y':np.round(2.13e6 + 3600*rng.random(n),1),
+                         'z':np.round(95 + 10*rng.random(n),1)})
+
+
+def soil(rng,scale=1):
+    """
+    Soil inorganic N --> Date, Block, lbs NH-N/acre-soil, lbs NO3-N/acre-soil
+    """
+    dates = ['06/01/2019','12/01/2020','03/01/2021','02/01/2022','11/01/2022']
+    blocks = np.arange(1,5*scale+1).astype(str)
+    date,block,_ = (a.ravel() for a in np.meshgrid(dates,blocks,range(3),indexing='ij'))
+    return pd.DataFrame({'Date':date,'Block':block,
+                         'lbs NH-N/acre-soil':np.round(rng.gamma(1,3,len(date)),2),
+                         'lbs NO3-N/acre-soil':np.round(rng.gamma(2,10,len(date)),2)})
+
+
+###############################################################################
+############################ Balance sheets ###################################
+###############################################################################
+def main_data(rng,scale=1):
+    """
+    massBalanceMainData --> daily Date (%m/%d/%Y), Precip, <block>_I, <block>_ET
+    and G.season, for 6*scale blocks
+    """
+    dates = pd.date_range('2012-01-01','2022-12-31',freq='D')
+    n = len(dates)
+    wet = (dates.month >= 11) | (dates.month <= 3)
+    precip = np.where(wet & (rng.random(n) < 0.25),rng.gamma(1,0.6,n),0.0)
+    ET0 = 0.05 + _seasonal(dates,0.1)
+    irrigating = (dates.month >= 4) & (dates.month <= 10)
+    cols = {'Date':dates.strftime('%m/%d/%Y'),'Precip':np.round(precip,3)}
+    blocks = replicate_names(BLOCKS,scale)
+    I = np.where(irrigating,rng.gamma(2,0.15,(len(blocks),n)),0.0)
+    ET = ET0*rng.uniform(0.8,1.2,(len(blocks),1))*(1 + 0.1*rng.standard_normal((len(blocks),n)))
+    for b,i,et in zip(blocks,I,ET):
+        cols[f'{b}_I'] = np.round(i,3)
+        cols[f'{b}_ET'] = np.round(et,3)
+    cols['G.season'] = np.where(dates.month >= 11,dates.year+1,dates.year).astype(float)
+    return pd.DataFrame(cols)
+
+
+def block_config(scale=1):
+    """
+    balance_engine config for the blocks of main_data
+    """
+    blocks = replicate_names(BLOCKS,scale)
+    return {'blocks':blocks,
+            'area':{b:1.0 for b in blocks},
+            'exclude':{2022:replicate_names(['NE1','NE2'],scale)}}
+
+
+def n_balance(rng,scale=1):
+    """
+    manual_mass_balance_2022.csv --> block, GS and the N inputs/outputs in kg/ha
+    """
+    years = np.arange(2013,2023)
+    blocks = replicate_names(N_BLOCKS,scale)
+    GS,block = (a.ravel() for a in np.meshgrid(years,blocks,indexing='ij'))
+    n = len(GS)
+    data = pd.DataFrame({'block':block,'GS':GS,
+                         'Fert kg/ha':np.round(rng.uniform(150,280,n),1),
+                         'Min':np.round(rng.uniform(20,60,n),1),
+                         'Dep':np.round(rng.uniform(5,15,n),1),
+                         'Uptake kg/ha':np.round(rng.uniform(120,220,n),1),
+                         'Growth':np.round(rng.uniform(20,50,n),1),
+                         'Denit':np.round(rng.uniform(5,30,n),1)})
+    data['leaching'] = np.round(data[['Fert kg/ha','Min','Dep']].sum(axis=1)
+                                - data[['Uptake kg/ha','Growth','Denit']].sum(axis=1),1)
+    data['NUE'] = np.round(data['Uptake kg/ha']/data['Fert kg/ha'],2)
+    return data
+
+
+###############################################################################
+################################ ET data ######################################
+###############################################################################
+def cimis(rng,scale=1):
+    """
+    cimis_daily.csv --> Stn Id, Stn Name, Date (%m/%d/%Y), ETo (mm) for scale stations
+    """
+    dates = pd.date_range('2012-01-01','2022-12-31',freq='D')
+    frames = []
+    for k in range(scale):
+        frames.append(pd.DataFrame({'Stn Id':206 + k,
+                                    'Stn Name':f'Station {206 + k}',
+                                    'Date':dates.strftime('%m/%d/%Y'),
+                                    'ETo (mm)':np.round(1 + _seasonal(dates,3)
+                                                        + 0.5*rng.standard_normal(len(dates)),2)}))
+    return pd.concat(frames,ignore_index=True)
+
+
+def ranch_systems(rng,scale=1):
+    """
+    widget-graph-export-2.csv --> Date (%Y-%m-%d), Time (HH:MM) every 15 minutes
+    and the station readings, 200*scale days ending on 2022-11-10
+    """
+    end = pd.Timestamp('2022-11-10 23:45')
+    times = pd.date_range(end=end,periods=200*scale*96,freq=RS_FREQ)
+    n = len(times)
+    daily = (1 + _seasonal(times,2.5))/25.4
+    return pd.DataFrame({'Date':times.strftime('%Y-%m-%d'),
+                         'Time':times.strftime('%H:%M'),
+                         'Daily ETo (inch) (294)':np.round(daily*(1 + 0.05*rng.standard_normal(n)),4),
+                         'Air Temperature (F) (294)':np.round(70 + 15*rng.standard_normal(n),1),
+                         'Relative Humidity (%) (294)':np.round(rng.uniform(20,90,n),1)})
+
+
+def flux_tower(rng,scale=1):
+    """
+    BowmanET_daily_2022_11_10.csv --> date (%m/%d/%Y), ETo (mm), Kc, 200*scale
+    days ending on 2022-11-10
+    """
+    dates = pd.date_range(end='2022-11-10',periods=200*scale,freq='D')
+    n = len(dates)
+    return pd.DataFrame({'date':dates.strftime('%m/%d/%Y'),
+                         'ETo':np.round(1 + _seasonal(dates,3) + 0.4*rng.standard_normal(n),2),
+                         'Kc':np.round(0.5 + _seasonal(dates,0.25) + 0.05*rng.standard_normal(n),3)})
+
+
+def openet(rng,scale=1):
+    """
+    OPENET_SE_all_years.csv --> monthly DateTime and Ensemble ET in inches
+    """
+    dates = pd.date_range('2016-01-01','2022-12-01',freq='MS')
+    return pd.DataFrame({'DateTime':dates.strftime('%Y-%m-%d'),
+                         'Ensemble ET':np.round(0.5 + _seasonal(dates,3)
+                                                + 0.2*rng.standard_normal(len(dates)),2)})
+
+
+###############################################################################
+################################# Writer ######################################
+###############################################################################
+def write_datasets(out_dir,scale=1,seed=0):
+    """
+    Write every synthetic file into out_dir and return their paths by name
+
+    The same seed and scale always give the same files
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(out_dir,'N_mass_balance'),exist_ok=True)
+    paths = {name:os.path.join(out_dir,f) for name,f in FILES.items()}
+    pore_water(rng,scale).to_csv(paths['pore_water'],index=False)
+    neutron_probe(rng,scale).to_csv(paths['neutron_probe'],index=False)
+    mls(rng,scale).to_csv(paths['mls'],index=False)
+    ## Same sampling in three files, the date format differs between them
+    wells = well_chemistry(rng,scale)
+    for name,fmt in [('wells','%m/%d/%Y'),('wells_update','%m/%d/%y'),('wells_working','%m/%d/%Y')]:
+        wells.assign(**{'Sampling Date':wells['Sampling Date'].dt.strftime(fmt)}).to_csv(paths[name],index=False)
+    well_coordinates(rng,scale).to_csv(paths['well_coordinates'],index=False)
+    soil(rng,scale).to_csv(paths['soil'],index=False)
+    ## The sheet has a title line above the header
+    with open(paths['main_data'],'w') as f:
+        f.write('Bowman mass balance main data (synthetic)\n')
+        main_data(rng,scale).to_csv(f,index=False)
+    with open(paths['block_config'],'w') as f:
+        json.dump(block_config(scale),f)
+    n_balance(rng,scale).to_csv(paths['n_balance'],index=False)
+    cimis(rng,scale).to_csv(paths['cimis'],index=False)
+    ranch_systems(rng,scale).to_csv(paths['ranch_systems'],index=False)
+    flux_tower(rng,scale).to_csv(paths['flux_tower'],index=False)
+    openet(rng,scale).to_csv(paths['openet'],index=False)
+    return paths
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Write synthetic Bowman data files')
+    parser.add_argument('out_dir')
+    parser.add_argument('--scale',type=int,default=1)
+    parser.add_argument('--seed',type=int,default=0)
+    args = parser.parse_args()
+    for name,path in write_datasets(args.out_dir,args.scale,args.seed).items():
+        print(f'{name:18s} {path}')
@@ -13,8 +13,19 @@ import numpy as np
 import pandas as pd
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
-from scipy.interpolate import UnivariateSpline as spline
 import os
+from balance_engine import (load_block_config, block_columns, block_terms, block_balance,
+                            area_weights, exclusion_mask, orchard_stats, MonthlyTerms)
+from recharge_ensemble import recharge_ensemble, block_recharge
+from probe_storage import ProbeStorage, SITE_DICT
+from incremental_balance import IncrementalBalance
+from dataset_registry import dataset
+from instrument import stage
+from parallel_pool import script_workers
+
+## Blocks, block areas and per-season exclusions for the orchard mean
+## --> pass a JSON file to load_block_config to change them
+blocks = load_block_config()
 
 #%% Loading the main data sheet
 ###############################################################################
@@ -41,44 +52,35 @@ def load_data_atmopsh():
     
     
 
-def apply_ET_mult(mainDat):
+def apply_ET_mult(mainDat,mult=0.92,config=None):
     ##!!! Adding the 0.78ß adjustment factor to the ET --> gained from Ranch System comparison
-    block_keys = ['NE1','NE2','NW','SW1','SW2','SE']
-    for block in block_keys:
-        mainDat[f'{block}_ET'] = mainDat[f'{block}_ET'] * 0.92
+    config = blocks if config is None else config
+    ET_cols = block_columns(config,'ET')
+    mainDat[ET_cols] = mainDat[ET_cols] * mult
     return mainDat
 
-def calculate_balance(mainDat):
-    mainDat['NE1_balance'] = mainDat[['NE1_I','Precip']].sum(axis=1) - mainDat['NE1_ET']
-    mainDat['NE2_balance'] = mainDat[['NE2_I','Precip']].sum(axis=1) - mainDat['NE2_ET']
-    mainDat['NW_balance'] = mainDat[['NW_I','Precip']].sum(axis=1) - mainDat['NW_ET']
-    mainDat['SW1_balance'] = mainDat[['SW1_I','Precip']].sum(axis=1) - mainDat['SW1_ET']
-    mainDat['SW2_balance'] = mainDat[['SW2_I','Precip']].sum(axis=1) - mainDat['SW2_ET']
-    mainDat['SE_balance'] = mainDat[['SE_I','Precip']].sum(axis=1) - mainDat['SE_ET']
-    ##!!! Should think about doing an area weighted average...
-    mainDat['avgBalance'] = mainDat[['NE1_balance','NE2_balance','NW_balance',
-                                     'SW1_balance','SW2_balance','SE_balance']].mean(axis=1)
+def calculate_balance(mainDat,config=None):
+    config = blocks if config is None else config
+    balance_cols = block_columns(config,'balance')
+    ## Every block's balance as one (time x block) array
+    mainDat[balance_cols] = block_balance(*block_terms(mainDat,config))
     mainDat['Date'] = pd.to_datetime(mainDat['Date'])
     mainDat = mainDat.set_index(pd.to_datetime(mainDat['Date']))
     #mainDat = pd.read_csv('~/Documents/bowmanMassBalance/massBalanceMainData.csv',skiprows=1)
     ## Cut to 2013 to 2022 season for Hanni's Paper
     mainDat = mainDat[mainDat.index>=pd.to_datetime('09/01/2012',format='%m/%d/%Y')]
     mainDat = mainDat[mainDat.index<pd.to_datetime('09/01/2022',format='%m/%d/%Y')]
-    mainDat = mainDat.resample('1M').sum()
-    mainDat['stdBalance'] = mainDat[['NE1_balance','NE2_balance','NW_balance',
-                                     'SW1_balance','SW2_balance','SE_balance']].std(axis=1)
-    ## Get 2022 subset where NE plots are not considered
-    sub2022 = mainDat.loc[mainDat['G.season']==2022.0,:]
-    mean2022 = sub2022[['NW_balance','SW1_balance','SW2_balance',
-                            'SE_balance']].mean(axis=1)
-    std2022 = sub2022[['NW_balance','SW1_balance','SW2_balance',
-                            'SE_balance']].std(axis=1)
-    mainDat.loc[mainDat['G.season']==2022.0,'avgBalance'] = mean2022
-    mainDat.loc[mainDat['G.season']==2022.0,'stdBalance'] = std2022
+    season = mainDat[config['season_col']].resample('1M').max()
+    mainDat = mainDat.resample('1M').sum(numeric_only=True)
+    ## Area-weighted orchard mean and std across blocks, with the blocks that are
+    ## not considered in a season (NE in 2022) masked out for those months
+    mask = exclusion_mask(season.values,config)
+    mainDat['avgBalance'],mainDat['stdBalance'] = orchard_stats(mainDat[balance_cols].values,
+                                                                area_weights(config),mask)
     return mainDat
 
 
-def create_figure(mainDat,mainDat_noMult):
+def create_figure(mainDat,avg_noMult):
     fig, ax = plt.subplots(figsize=[15,10])
     ax.bar(mainDat.index,mainDat['avgBalance'],width=30,
            label='Water Balance',
@@ -102,22 +104,50 @@ def create_figure(mainDat,mainDat_noMult):
     mainDat['avgBalance'].cumsum().plot(title='Cumulative Water Balance',
                                         ylabel='cm of water',grid=True,ax=ax2,
                                         label='84% CIMIS ETo')
-    mainDat_noMult['avgBalance'].cumsum().plot(label='Original CIMIS ETo',
+    avg_noMult.cumsum().plot(label='Original CIMIS ETo',
                                         ylabel='cm of Water',grid=True,ax=ax2)
     ax2.legend()
     #plt.savefig('monthlyBalance_cumsum.png',dpi=200)
 
 
 ## Load the data
-mainDat = load_data()
-## Apply the ET multiplier
-mainDat_noMult = mainDat.copy()
-mainDat = apply_ET_mult(mainDat)
-## Calculate the mass balances
-mainDat_noMult = calculate_balance(mainDat_noMult)
-mainDat = calculate_balance(mainDat)
+with stage('load','mass balance sheet') as s:
+    mainDat = load_data()
+    s.count(mainDat)
+## Monthly block sums of the unadjusted sheet --> the balance for any other
+## ET multiplier is a broadcast on these, no copy and re-run needed
+with stage('balance','monthly terms') as s:
+    terms = MonthlyTerms.from_sheet(mainDat,blocks)
+    s.count(mainDat)
+with stage('balance','calculate_balance') as s:
+    ## Apply the ET multiplier
+    mainDat = apply_ET_mult(mainDat)
+    ## Calculate the mass balances
+    mainDat = calculate_balance(mainDat)
+    s.count(mainDat)
+## Orchard mean with the original CIMIS ET
+avg_noMult = pd.Series(terms.sweep([1.0])['mean'][0],index=terms.index)
 ## Create the orchard average monthly mass balance figure
-create_figure(mainDat,mainDat_noMult)
+create_figure(mainDat,avg_noMult)
+
+#%%
+###############################################################################
+##################### ET multiplier sensitivity sweep #########################
+###############################################################################
+## 0.78, 0.84 and 0.92 have all been used --> sweep the whole range in one go
+ET_mults = np.linspace(0.7,1.1,1000)
+with stage('balance','ET multiplier sweep',rows=len(ET_mults)):
+    sweep = terms.sweep(ET_mults)
+## Cumulative orchard mean balance over the whole record for each multiplier
+totalBalance = np.nansum(sweep['mean'],axis=1)
+fig, ax = plt.subplots()
+ax.plot(ET_mults,totalBalance)
+for mult in [0.78,0.84,0.92]:
+    ax.axvline(mult,c='black',ls='--',alpha=0.5)
+ax.grid()
+ax.set_xlabel('ET multiplier')
+ax.set_ylabel('Cumulative water balance [cm]')
+ax.set_title('Sensitivity of the Water Balance to the ET Multiplier')
 
 #%%
 ###############################################################################
@@ -126,9 +156,9 @@ create_figure(mainDat,mainDat_noMult)
 ## Cut data to only includ erelevant years
 mainDat = mainDat[mainDat.index<pd.to_datetime('09/01/2022')]
 fig, ax = plt.subplots()
-irrigation = mainDat[['NE1_I','NE2_I','SW1_I','SW2_I','NW_I','SE_I']].mean(axis=1).resample('12MS').sum()
+irrigation = mainDat[block_columns(blocks,'I')].mean(axis=1).resample('12MS').sum()
 irrigation.name = 'Irrigation'
-ET = mainDat[['NE1_ET','NE2_ET','SW1_ET','SW2_ET','NW_ET','SE_ET']].mean(axis=1).resample('12MS').sum() * -1
+ET = mainDat[block_columns(blocks,'ET')].mean(axis=1).resample('12MS').sum() * -1
 ET.name = 'ET'
 Precip = mainDat['Precip'].resample('12MS').sum()
 Precip.name = 'Precipitation'
@@ -154,20 +184,8 @@ ax.set_xticklabels(labels,rotation=60)
 #%%
 ## Do the same thing but split by block and sum the water balance
 fig, ax = plt.subplots()
-NE1 = mainDat['Precip'] + mainDat['NE1_I'] - mainDat['NE1_ET']
-NE1.name = 'NE1'
-NE2 = mainDat['Precip'] + mainDat['NE2_I'] - mainDat['NE2_ET']
-NE2.name = 'NE2'
-SW1 = mainDat['Precip'] + mainDat['SW1_I'] - mainDat['SW1_ET']
-SW1.name = 'SW1'
-SW2 = mainDat['Precip'] + mainDat['SW2_I'] - mainDat['SW2_ET']
-SW2.name = 'SW2'
-NW = mainDat['Precip'] + mainDat['NW_I'] - mainDat['NW_ET']
-NW.name = 'NW'
-SE = mainDat['Precip'] + mainDat['SE_I'] - mainDat['SE_ET']
-SE.name = 'SE'
-
-dat = pd.concat([NE1,NE2,SW1,SW2,NW,SE],axis=1).resample('12MS').sum()
+dat = pd.DataFrame(block_balance(*block_terms(mainDat,blocks)),
+                   index=mainDat.index,columns=blocks['blocks']).resample('12MS').sum()
 dat.plot(kind='bar',
          width=0.8,
          ax=ax,
@@ -187,8 +205,8 @@ ax.legend(loc='center right',
 
 fig, ax2 = plt.subplots()
 
-std = dat.std(axis=1)
-dat.mean(axis=1).plot(kind='bar',
+mean,std = orchard_stats(dat.values,area_weights(blocks))
+pd.Series(mean,index=dat.index).plot(kind='bar',
          width=0.8,
          ax=ax2,
          edgecolor='black',
@@ -233,17 +251,11 @@ ax.set_xlim([pd.to_datetime('2018/03/06',format='%Y/%m/%d'),
 ###############################################################################
 ## Directory with the Bowman Data
 DIR = '/Users/spencerjordan/Documents/bowman_data_analysis'
-np_data = pd.read_csv(DIR+'/np2018_2022_Spencer_Update.csv')
-## Some data cleaning
-# Fixing some syntaxing
-np_data.loc[np_data['Site']=='AL-1','Site'] = 'Al-1'
-np_data.loc[np_data['Site']=='AL-2','Site'] = 'Al-2'
-# Formatting site names
-for site in range(1,9):
-    np_data.loc[np_data['Site']==str(site),'Site'] = 'Al-'+str(site)
+## Typed load --> categorical Site/Depth, site names to Al-# and dates parsed
+## Shared registry, so the probe file is parsed once per session
+np_data = dataset('neutron_probe',DIR+'/np2018_2022_Spencer_Update.csv')
 sites = np.unique(np_data['Site'])
 depths = np.unique(np_data['Depth'])
-np_data['date'] = pd.to_datetime(np_data['date'])
 ## Concerting water content to a depth of water
 # Relate the station depth to a depth of soil being represented
 ## Could check sensitivity with water content
@@ -256,24 +268,16 @@ depthDict = {30:45,
              90:60,
              180:95,
              280:50}
-## Multiplying the water content value by the depth each value represents
-for depth in depths:
-    np_data.loc[np_data['Depth']==depth,'water content'] = np_data.loc[np_data['Depth']==depth,'water content'] * (depthDict[depth])
-
-## Creating a new DataFrame that holds the information organized by site
-np_data_temp = np_data.copy()
-npSites = pd.DataFrame()
-for idx,site in enumerate(sites):
-    dat = np_data_temp.loc[np_data_temp['Site']==site,:].groupby('date').mean()['water content'].diff()
-    dat[0] = 0
-    npSites[f'{site}'] = dat
-
-## Group by date to get orchard average
-wc = np_data.groupby('date').mean()
-## Difference the data to calculate change in storage
-wcDiff = wc.diff()
-## Changes the first entry to be relative to zero instead of NaN
-wcDiff['water content'][0] = 0
+## Pivot to (date x site x depth) once and weight each depth by the soil it
+## represents --> ΔS for every site, every block and the orchard in one call
+with stage('balance','probe storage',rows=len(np_data)):
+    probes = ProbeStorage(np_data,depth_dict=depthDict)
+    storage = probes.changes()
+## Change in storage organized by site
+npSites = storage['site']
+## Orchard average storage, and its change relative to zero at the first survey
+wc = storage['orchard_storage'].to_frame()
+wcDiff = storage['orchard'].to_frame()
 ## Plot the change in storage
 ax.plot(wcDiff.index,wcDiff['water content'],alpha=1,color='blue',
        label='Neutron Probe Differencing')
@@ -294,28 +298,16 @@ ax.set_title('Monthly Mass Balance and Neutron Probe ΔS',fontsize=22,loc='left'
 ###############################################################################
 ######### Making spline curves and to difference the two curves 
 ###############################################################################
-## mass balance spline
+## mass balance spline and NP spline, both on days since the first probe date
 startDate = wcDiff.index[0]
-mainDat_CS['sequential'] = mainDat_CS.index - startDate
-mainDatSpline = mainDat_CS[mainDat_CS.index>pd.to_datetime('2018/03/06',format='%Y/%m/%d')]
-mainDatSpline = mainDatSpline[mainDatSpline.index<pd.to_datetime('2022/12/08',format='%Y/%m/%d')]
-mainDatSpline['sequential'] = [float(x.days) for x in mainDatSpline['sequential']]
-mbSpline = spline(mainDatSpline['sequential'],mainDatSpline['avgBalance'])
-xs = np.linspace(0,1800,1800)
-## Doing the same for the NP data
-wcDiff['sequential'] = wcDiff.index - startDate
-wcDiff['sequential'] = [float(x.days) for x in wcDiff['sequential']]
-wcSpline = spline(wcDiff['sequential'],wcDiff['water content'])
 
 ###############################################################################
 ######### Calculate recharge by subtracting the two spline curves
 ######### recharge == mass_balance - delta_storage
 ###############################################################################
-predictedRecharge = mbSpline(xs) - wcSpline(xs)
-rechargeIdx = [pd.to_timedelta(x,unit='days')+startDate for x in xs]
-rch = pd.DataFrame({'recharge':predictedRecharge,
-                    'DateTime':rechargeIdx})
-rch = rch.set_index('DateTime').resample('1M').mean()
+with stage('spline','orchard recharge'):
+    rch = block_recharge(mainDat_CS[['avgBalance']],wcDiff[['water content']],startDate)
+rch.columns = ['recharge']
 
 ## Save for the HYDRUS result comparison
 #rch.to_pickle('/Users/spencerjordan/Documents/Hydrus/python_scripts/massBalance_recharge.p')
@@ -351,23 +343,11 @@ plt.xticks(rotation=60, fontsize=8)
 ######### Doing the analysis per site
 ###############################################################################
 
-siteDict = {'NE1':[1],
-            'NE2':[2],
-            'SE':[7,8],
-            'SW1':[],
-            'SW2':[6],
-            'NW':[3,4]}
-## Getting a mean value in npSites for each block
-blockMean = pd.DataFrame()
-blockMean['NE1'] = npSites['Al-1']
-blockMean['NE2'] = npSites['Al-2']
-## Taking the average of sites 7 and 8    
-blockMean['SE'] = [np.mean([x, npSites['Al-8'][idx]]) for idx,x in enumerate(npSites['Al-7'])]
-## Using Al-6 for SW1 since there is no monitoring site there   
-blockMean['SW1'] = npSites['Al-6']    
-blockMean['SW2'] = npSites['Al-6']
-## Taking the average of sites 3 and 4
-blockMean['NW'] = [np.mean([x, npSites['Al-4'][idx]]) for idx,x in enumerate(npSites['Al-3'])]    
+## Probe sites in each block --> Al-6 is used for SW1 since there is no
+## monitoring site there (SITE_FALLBACK)
+siteDict = SITE_DICT
+## Getting a mean value of the site ΔS for each block
+blockMean = storage['block']
  
 ## Initialize the panel figure for each block
 fig, ax = plt.subplots(2,3,figsize=[15,10])
@@ -378,32 +358,15 @@ fig.supxlabel('Date',fontsize=17,y=0.04)
 fig.tight_layout(pad=2.5)
 a,b = 0,0
 
+## Recharge for all the blocks in one call --> (month x block)
+with stage('spline','block recharge',rows=len(siteDict)):
+    blockRecharge = block_recharge(mainDat_CS[[f'{site}_balance' for site in siteDict]],
+                                   blockMean[list(siteDict)].fillna(0),startDate)
+blockRecharge.columns = list(siteDict)
+
 for site in siteDict:
-    ## mass balance spline
-    startDate = wcDiff.index[0]
-    mainDat_CS['sequential'] = mainDat_CS.index - startDate
-    mainDatSpline = mainDat_CS[mainDat_CS.index>pd.to_datetime('2018/03/06',format='%Y/%m/%d')]
-    mainDatSpline = mainDatSpline[mainDatSpline.index<pd.to_datetime('2022/12/08',format='%Y/%m/%d')]
-    mainDatSpline['sequential'] = [float(x.days) for x in mainDatSpline['sequential']]
-    mbSpline = spline(mainDatSpline['sequential'],mainDatSpline[f'{site}_balance'])
-    xs = np.linspace(0,1800,1800)
-    ## Doing the same for the NP data
-    diffSite = pd.DataFrame({'water content':blockMean[f'{site}']})
-    diffSite['sequential'] = diffSite.index - startDate
-    diffSite['sequential'] = [float(x.days) for x in diffSite['sequential']]
-    diffSite = diffSite.fillna(0)
-    wcSpline = spline(diffSite['sequential'],diffSite['water content'])
-    ###########################################################################
-    ######## Calculate recharge
-    ###########################################################################
-    predictedRecharge = mbSpline(xs) - wcSpline(xs)
-    rechargeIdx = [pd.to_timedelta(x,unit='days')+startDate for x in xs]
-    rch = pd.DataFrame({'recharge':predictedRecharge,
-                        'DateTime':rechargeIdx})
-    rch = rch.set_index('DateTime').resample('1M').mean()
-    
     ## Label is weird to convey information about SW1, don't set legend for the other blocks
-    ax[a,b].bar(rch.index,rch['recharge'],label='No Vadose Zone Data\nUsing SW2 Neutron Probe\nTrees Replanted in GS 2018',
+    ax[a,b].bar(blockRecharge.index,blockRecharge[site],label='No Vadose Zone Data\nUsing SW2 Neutron Probe\nTrees Replanted in GS 2018',
             width=25)
     ax[a,b].set_xlim([pd.to_datetime('2018-04',format='%Y-%m'),pd.to_datetime(2022,format='%Y')])
     ax[a,b].set_ylim([-10,15])
@@ -428,6 +391,76 @@ for site in siteDict:
         a = a + 1
 
 
+#%% Nitrate leaching flux --> recharge x deep pore-water NO3-N
+###############################################################################
+## The 180 and 280 cm pore-water samples are interpolated to the month ends of
+## blockRecharge (last sample carried forward for MAX_AGE days), so
+## kg N/ha = 0.1 x cm of recharge x mg/L for every block and month at once.
+## Only the months inside both the balance and the probe record, the spline
+## runs on past them. The complete growing seasons on the N balance blocks go
+## to bowman_Nitrate_Balance
+from leaching_flux import leaching_pipeline, covered_months
+
+pw_data = dataset('pore_water',DIR+'/ALL_PORE_WATER_COMPILED.CSV')
+leaching = leaching_pipeline(covered_months(blockRecharge,mainDat_CS.index,blockMean.index),
+                             pw_data,weights=blocks['area'])
+print(leaching['n_balance'].round(1))
+leaching['n_balance'].to_csv(DIR+'/N_mass_balance/leaching_flux.csv')
+
+
+#%% Monte Carlo uncertainty in the predicted recharge
+###############################################################################
+## Draws the ET multiplier, depthDict thicknesses and probe calibration for each
+## realization and gives monthly recharge quantiles for every block
+## --> add the .precip of MonthlyTerms built from other sheets to precip_sources
+##     to include the precip source in the draws
+###############################################################################
+## Process pool size for the spline fits (None = one per CPU, serial where
+## workers are spawned, e.g. macOS)
+WORKERS = script_workers(None)
+with stage('spline','recharge ensemble',rows=2000):
+    ens = recharge_ensemble(terms,np_data,n=2000,depth_dict=depthDict,seed=0,
+                            workers=WORKERS)
+q = list(ens['q'])
+fig, ax = plt.subplots(2,3,figsize=[15,10],sharey=True)
+fig.suptitle('Monthly Groundwater Recharge by Block, 5-95% Ensemble Range',
+             fontsize=19,y=0.98)
+fig.supylabel('cm of Recharge',fontsize=17)
+fig.supxlabel('Date',fontsize=17,y=0.04)
+fig.tight_layout(pad=2.5)
+for i,site in enumerate(ens['blocks']):
+    axi = ax.ravel()[i]
+    axi.fill_between(ens['months'],ens['quantiles'][q.index(0.05),:,i],
+                     ens['quantiles'][q.index(0.95),:,i],alpha=0.3,label='5-95%')
+    axi.fill_between(ens['months'],ens['quantiles'][q.index(0.25),:,i],
+                     ens['quantiles'][q.index(0.75),:,i],alpha=0.5,label='25-75%')
+    axi.plot(ens['months'],ens['quantiles'][q.index(0.5),:,i],c='black',label='Median')
+    axi.axhline(0,c='black',ls='--')
+    axi.set_xlim([pd.to_datetime('2018-04',format='%Y-%m'),pd.to_datetime(2022,format='%Y')])
+    axi.grid()
+    axi.set_title(f'{site}',fontsize=15)
+    axi.xaxis.set_major_locator(mdates.MonthLocator(bymonth=(1)))
+    axi.xaxis.set_major_formatter(mdates.DateFormatter("%b-%y"))
+ax[0,0].legend()
+
+
+
+#%% Incremental update of the balance, ΔS and recharge
+###############################################################################
+## Keeps the monthly sums, survey sums and windowed spline fits in .bowman_cache
+## next to the sheet --> only rows appended since the last run are read, and
+## only the spline windows they touch are refit
+###############################################################################
+with stage('spline','incremental update'):
+    inc = IncrementalBalance('~/Documents/bowmanMassBalance/massBalanceMainData_92.csv',
+                             DIR+'/np2018_2022_Spencer_Update.csv',
+                             ET_mult=0.92,depth_dict=depthDict).update()
+print(f'Refit {len(inc.refit)} of {len(inc.fits)} spline windows')
+fig, ax = plt.subplots(figsize=[15,10])
+inc.recharge().plot(ax=ax,grid=True)
+ax.set_title('Monthly Groundwater Recharge by Block, Windowed Splines',fontsize=18,loc='left')
+ax.set_ylabel('Recharge [cm]',fontsize=14)
+ax.set_xlabel('Date',fontsize=14)
 
 
 
@@ -459,8 +492,7 @@ annualBalance = mainDat.resample('AS-OCT').sum()
 annualBalance = annualBalance.loc[annualBalance.index<pd.Timestamp('2022/10/01'),:]
 fig, ax = plt.subplots(figsize=[15,10])
 
-annualBalance.plot(y=['NE1_balance','NE2_balance','NW_balance',
-                                 'SW1_balance','SW2_balance','SE_balance'],
+annualBalance.plot(y=block_columns(blocks,'balance'),
                         kind='bar',rot=45,
                         figsize=[13,10],ax=ax,width=0.8)
 
@@ -506,7 +538,7 @@ npYearly = pd.DataFrame()
 npYearly['date'] = np_data['date'].unique()
 
 for site in sites:
-    sub = np_data.loc[np_data['Site']==site].groupby('date').sum()
+    sub = np_data.loc[np_data['Site']==site].groupby('date')[['water content weighted']].sum()
     sub[site] = sub['water content weighted'] * 280
     #sub['date'] = sub.index
     npYearly = pd.merge(npYearly,sub[site],how='outer',on='date')
@@ -541,7 +573,8 @@ ax.legend(fontsize=14,loc=3)
 
 #%% Different Approach for annual balance using NP data
 
-npYearly = np_data.groupby(['date','Site']).sum()
+## Site is categorical --> only the sites measured on each date
+npYearly = np_data.groupby(['date','Site'],observed=True)[['water content weighted']].sum()
 npYearly['water content'] = npYearly['water content weighted'] * 280
 yearlyDiff = npYearly.groupby('date').mean()
 yearlyDiff = yearlyDiff.resample('AS-OCT').sum()